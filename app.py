@@ -1,15 +1,23 @@
+import json
+import threading
+import time
 import uuid
-from flask import Flask, render_template, request, Response, session
+from typing import TYPE_CHECKING, Optional
+from flask import Flask, render_template, request, Response, session, stream_with_context
 
 # --- Prometheus Metrics ---
-from prometheus_client import Counter, generate_latest
+from prometheus_client import Counter, Gauge, generate_latest
 
 # --- Custom Modules ---
+# LangChain, the embedding model and the vector store clients are imported lazily by
+# init_core_services, so the web server binds and answers probes without waiting on them.
 from config.config import AppConfig
-from utils.data_ingestion import DataIngestor
-from chain.rag_chain import create_rag_chain
-from utils.logger import setup_logger
+from utils.logger import sampled, setup_logger
 from utils.custom_exception import CustomException
+from utils.metrics import REQUEST_LATENCY
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
 
 # ==============================================================================
 # 1. INITIAL SETUP
@@ -22,33 +30,146 @@ logger = setup_logger(__name__)
 REQUEST_COUNT = Counter("http_requests_total", "Total number of HTTP requests")
 SUCCESS_COUNT = Counter("http_requests_success_total", "Total number of successful responses")
 ERROR_COUNT = Counter("http_requests_error_total", "Total number of error responses")
+READY_GAUGE = Gauge("app_ready", "1 once the embedding model, index and RAG chain are warm")
+
+# User-facing message returned whenever the chain fails
+ERROR_MESSAGE = "I'm sorry, but I encountered an error while processing your request. Please try again."
+STARTING_MESSAGE = "The assistant is still starting up. Please try again in a moment."
+BATCH_BUSY_MESSAGE = "Another batch is still running. Please try again once it finishes."
+# Per-request log lines carry at most this much of the user's message
+LOGGED_TEXT_CHARS = 200
+
+def format_sse(data: dict, event: str = "") -> str:
+    """Formats one Server-Sent Events frame carrying a JSON payload."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def chain_config(session_id: str) -> dict:
+    """
+    Builds the per-request chain config: the session for chat history plus a fresh
+    trace id that the pipeline metrics handler includes in its trace log line.
+    """
+    return {"configurable": {"session_id": session_id}, "metadata": {"trace_id": uuid.uuid4().hex}}
+
+def init_core_services() -> "Runnable":
+    """
+    Connects to the vector store and builds the conversational RAG chain.
+    Shared by the WSGI (Flask) and ASGI (Quart) applications.
+
+    A warm-up query is run before returning, so the embedding model is loaded and
+    the index pages are resident by the time the first user request arrives.
+
+    Raises:
+        CustomException: If the vector store cannot be initialized or warmed up.
+    """
+    from utils.data_ingestion import DataIngestor
+    from chain.rag_chain import create_rag_chain
+
+    logger.info("Initializing core services...")
+    # We only need to get the vector store connection, not ingest data again.
+    ingestor = DataIngestor()
+    # The local backend is memory-mapped from disk; build the artifact only if none exists yet.
+    if AppConfig.VECTOR_STORE_BACKEND == "local":
+        ingestor.ensure_local_index()
+    vector_store = ingestor.vstore
+    # Hybrid retrieval needs the BM25 index; it is cheap to build from the CSV if missing.
+    if AppConfig.RETRIEVER_MODE == "hybrid":
+        from utils.lexical_index import BM25Index
+        if not BM25Index.is_current(AppConfig.LEXICAL_INDEX_DIR):
+            ingestor.build_lexical_index()
+    # Create the conversational RAG chain
+    rag_chain = create_rag_chain(vector_store)
+
+    try:
+        start_time = time.perf_counter()
+        vector_store.similarity_search("warm up", k=1)
+        logger.info(f"Warm-up query completed in {time.perf_counter() - start_time:.2f}s.")
+    except Exception as e:
+        raise CustomException("Warm-up query against the vector store failed.", e)
+
+    logger.info("Core services (Vector Store, RAG Chain) initialized successfully.")
+    return rag_chain
+
+class CoreServices:
+    """
+    Holds the RAG chain and tracks whether it is ready to serve.
+
+    `start()` builds the chain on a background thread, so the server can answer
+    liveness and readiness probes while the embedding model and index load.
+    """
+    def __init__(self, rag_chain: Optional["Runnable"] = None):
+        self.rag_chain = rag_chain
+        self.error: Optional[Exception] = None
+        self._ready = threading.Event()
+        self._done = threading.Event()  # Set once the warm-up finished, successfully or not
+        if rag_chain is not None:
+            self._mark_ready()
+            self._done.set()
+
+    def _mark_ready(self) -> None:
+        self._ready.set()
+        READY_GAUGE.set(1)
+
+    def start(self) -> None:
+        """Starts the background warm-up unless a chain was injected."""
+        READY_GAUGE.set(1 if self.ready else 0)
+        if not self.ready:
+            threading.Thread(target=self._warm_up, name="core-services-warmup", daemon=True).start()
+
+    def _warm_up(self) -> None:
+        start_time = time.perf_counter()
+        try:
+            self.rag_chain = init_core_services()
+            self._mark_ready()
+            logger.info(f"Service ready after {time.perf_counter() - start_time:.2f}s.")
+        except Exception as e:
+            self.error = e
+            logger.error(f"FATAL: Failed to initialize core services. Application cannot serve. Error: {e}")
+        finally:
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Blocks up to `timeout` seconds for the warm-up to finish; True if the chain is ready."""
+        self._done.wait(timeout)
+        return self.ready
 
 # ==============================================================================
 # 2. APPLICATION FACTORY
 # ==============================================================================
 
-def create_app() -> Flask:
+def create_app(rag_chain: Optional["Runnable"] = None) -> Flask:
     """
     Creates and configures the Flask application.
     This pattern is useful for scaling and testing.
+
+    Args:
+        rag_chain: Optional pre-built chain; by default the core services are built in the background.
     """
     app = Flask(__name__)
     app.config['SECRET_KEY'] = AppConfig.FLASK_SECRET_KEY
     logger.info("Flask application created with secret key.")
 
     # --- Initialize Core Services (Vector Store & RAG Chain) ---
-    # This is done once when the application starts for efficiency.
-    try:
-        logger.info("Initializing core services...")
-        # We only need to get the vector store connection, not ingest data again.
-        vector_store = DataIngestor().vstore
-        # Create the conversational RAG chain
-        rag_chain = create_rag_chain(vector_store)
-        logger.info("Core services (Vector Store, RAG Chain) initialized successfully.")
-    except CustomException as e:
-        logger.error(f"FATAL: Failed to initialize core services. Application cannot start. Error: {e}")
-        # If services fail, the app is non-functional. We exit.
-        exit(1)
+    # Built once per process on a background thread; /ready reports when it is done.
+    services = CoreServices(rag_chain)
+    services.start()
+
+    def unavailable_response() -> Optional[Response]:
+        """Returns a 503 if the chain is not ready within READY_WAIT_SECONDS, else None."""
+        if services.wait_ready(AppConfig.READY_WAIT_SECONDS):
+            return None
+        return Response(STARTING_MESSAGE, status=503, headers={"Retry-After": "5"})
+
+    # Held while a /batch response streams, so batches never stack up on the LLM
+    batch_lock = threading.Lock()
 
     # ==========================================================================
     # 3. DEFINE FLASK ROUTES
@@ -64,7 +185,10 @@ def create_app() -> Flask:
         # If a user doesn't have a session ID, create a new unique one.
         if 'session_id' not in session:
             session['session_id'] = str(uuid.uuid4())
-            logger.info(f"New user session created with ID: {session['session_id']}")
+            logger.info(
+                f"New user session created with ID: {session['session_id']}",
+                extra=sampled(session_id=session['session_id']),
+            )
         return render_template("index.html")
 
     @app.route("/get", methods=["POST"])
@@ -74,21 +198,32 @@ def create_app() -> Flask:
         RAG chain, and returns it.
         """
         session_id = session.get('session_id', 'default_session') # Fallback
+        unavailable = unavailable_response()
+        if unavailable is not None:
+            return unavailable
+
+        start_time = time.perf_counter()
         try:
             user_input = request.form.get("msg")
             if not user_input:
                 logger.warning(f"Received empty message from session {session_id}")
                 return "Please provide a message."
 
-            logger.info(f"Received input from session {session_id}: '{user_input}'")
+            logger.info(
+                f"Received input from session {session_id}: '{user_input[:LOGGED_TEXT_CHARS]}'",
+                extra=sampled(session_id=session_id, input_chars=len(user_input)),
+            )
 
             # Invoke the RAG chain with the user's input and their unique session ID
-            response = rag_chain.invoke(
+            response = services.rag_chain.invoke(
                 {"input": user_input},
-                config={"configurable": {"session_id": session_id}}
+                config=chain_config(session_id)
             )["answer"]
 
-            logger.info(f"Generated response for session {session_id}: '{response[:80]}...'")
+            logger.info(
+                f"Generated response for session {session_id}: '{response[:80]}...'",
+                extra=sampled(session_id=session_id, response_chars=len(response)),
+            )
             SUCCESS_COUNT.inc()
             return response
 
@@ -96,7 +231,135 @@ def create_app() -> Flask:
             logger.error(f"An error occurred handling request for session {session_id}: {e}", exc_info=True)
             ERROR_COUNT.inc()
             # Return a user-friendly error message
-            return "I'm sorry, but I encountered an error while processing your request. Please try again."
+            return ERROR_MESSAGE
+        finally:
+            REQUEST_LATENCY.labels(endpoint="/get").observe(time.perf_counter() - start_time)
+
+    @app.route("/stream", methods=["POST"])
+    def stream_response() -> Response:
+        """
+        Streams the RAG chain's answer token by token as Server-Sent Events.
+
+        Each token is sent as a `data:` event holding {"token": ...}; the stream ends
+        with an `event: done` (or `event: error`) message. Chat history is persisted by
+        the chain once the stream completes, exactly as for /get.
+        """
+        session_id = session.get('session_id', 'default_session') # Fallback
+        user_input = request.form.get("msg")
+        unavailable = unavailable_response()
+        if unavailable is not None:
+            return unavailable
+
+        def generate():
+            if not user_input:
+                logger.warning(f"Received empty message from session {session_id}")
+                yield format_sse({"token": "Please provide a message."})
+                yield format_sse({}, event="done")
+                return
+
+            logger.info(
+                f"Received streaming input from session {session_id}: '{user_input[:LOGGED_TEXT_CHARS]}'",
+                extra=sampled(session_id=session_id, input_chars=len(user_input)),
+            )
+            start_time = time.perf_counter()
+            try:
+                answer_parts = []
+                for chunk in services.rag_chain.stream(
+                    {"input": user_input},
+                    config=chain_config(session_id)
+                ):
+                    token = chunk.get("answer")
+                    if token:
+                        answer_parts.append(token)
+                        yield format_sse({"token": token})
+
+                response = "".join(answer_parts)
+                logger.info(
+                    f"Streamed response for session {session_id}: '{response[:80]}...'",
+                    extra=sampled(session_id=session_id, response_chars=len(response)),
+                )
+                SUCCESS_COUNT.inc()
+                yield format_sse({}, event="done")
+
+            except Exception as e:
+                logger.error(f"An error occurred streaming a response for session {session_id}: {e}", exc_info=True)
+                ERROR_COUNT.inc()
+                yield format_sse({"message": ERROR_MESSAGE}, event="error")
+            finally:
+                REQUEST_LATENCY.labels(endpoint="/stream").observe(time.perf_counter() - start_time)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    @app.route("/batch", methods=["POST"])
+    def batch_response() -> Response:
+        """
+        Answers a JSONL batch of questions and streams one JSON result per line.
+
+        The body (or a "file" upload) holds one {"id", "question", "session"} object per
+        line, as read by `shopsmart-batch-qa`. Results stream back as their chunk of
+        questions finishes, so a client that loses the connection can resubmit only
+        the ids it has not received. One batch runs at a time; another gets a 503.
+        """
+        from chain.batch_qa import BatchQARunner, parse_batch_lines
+
+        REQUEST_COUNT.inc()
+        unavailable = unavailable_response()
+        if unavailable is not None:
+            return unavailable
+
+        upload = request.files.get("file")
+        body = upload.read() if upload else request.get_data()
+        try:
+            items = parse_batch_lines(body.decode("utf-8").splitlines())
+        except (UnicodeDecodeError, ValueError) as e:
+            return Response(f"Invalid batch: {e}", status=400)
+        if not items:
+            return Response("Invalid batch: no questions.", status=400)
+        if len(items) > AppConfig.BATCH_MAX_QUESTIONS:
+            return Response(f"A batch may hold at most {AppConfig.BATCH_MAX_QUESTIONS} questions.", status=413)
+        if not batch_lock.acquire(blocking=False):
+            return Response(BATCH_BUSY_MESSAGE, status=503, headers={"Retry-After": "60"})
+        logger.info(f"Received a batch of {len(items)} questions.")
+
+        def generate():
+            start_time = time.perf_counter()
+            try:
+                for record in BatchQARunner.from_config(services.rag_chain).run(items):
+                    yield json.dumps(record, ensure_ascii=False) + "\n"
+                SUCCESS_COUNT.inc()
+            except Exception as e:
+                logger.error(f"An error occurred processing a batch: {e}", exc_info=True)
+                ERROR_COUNT.inc()
+                yield json.dumps({"status": "error", "error": ERROR_MESSAGE}) + "\n"
+            finally:
+                REQUEST_LATENCY.labels(endpoint="/batch").observe(time.perf_counter() - start_time)
+
+        response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+        response.call_on_close(batch_lock.release)  # Runs even if the client leaves before the first line
+        return response
+
+    @app.route("/health")
+    def health() -> Response:
+        """
+        Liveness probe: the process is up. Fails only if the warm-up failed for good,
+        so Kubernetes restarts the container.
+        """
+        if services.failed:
+            return Response("failed", status=503)
+        return Response("ok", mimetype="text/plain")
+
+    @app.route("/ready")
+    def ready() -> Response:
+        """
+        Readiness probe: 200 once the embedding model, index and chain are warm.
+        """
+        if services.ready:
+            return Response("ready", mimetype="text/plain")
+        return Response("failed" if services.failed else "starting", status=503)
 
     @app.route("/metrics")
     def metrics() -> Response:
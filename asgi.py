@@ -0,0 +1,329 @@
+import asyncio
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Optional
+from quart import Quart, render_template, request, Response, session
+
+# --- Prometheus Metrics ---
+from prometheus_client import Counter, generate_latest
+
+# --- Custom Modules ---
+from app import (
+    BATCH_BUSY_MESSAGE, ERROR_COUNT, ERROR_MESSAGE, LOGGED_TEXT_CHARS, REQUEST_COUNT, STARTING_MESSAGE, SUCCESS_COUNT,
+    CoreServices, chain_config, format_sse,
+)
+from config.config import AppConfig
+from utils.logger import sampled, setup_logger
+from utils.metrics import REQUEST_LATENCY
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
+# ==============================================================================
+# 1. INITIAL SETUP
+# ==============================================================================
+
+logger = setup_logger(__name__)
+
+# Requests turned away because the LLM concurrency limit stayed saturated
+REJECTED_COUNT = Counter("http_requests_rejected_total", "Requests rejected by LLM backpressure")
+
+BUSY_MESSAGE = "The assistant is busy right now. Please try again in a moment."
+
+# ==============================================================================
+# 2. APPLICATION FACTORY
+# ==============================================================================
+
+def create_asgi_app(rag_chain: Optional["Runnable"] = None) -> Quart:
+    """
+    Creates the async (ASGI) variant of the application.
+
+    Routes mirror the Flask app in app.py but await `rag_chain.ainvoke` / `astream`,
+    so a single worker can keep many LLM requests in flight. An asyncio semaphore
+    caps concurrent chain calls at AppConfig.LLM_MAX_CONCURRENCY; requests that cannot
+    get a slot within AppConfig.LLM_QUEUE_TIMEOUT_SECONDS receive a 503 instead of
+    piling more load onto the LLM provider.
+
+    Args:
+        rag_chain: Optional pre-built chain; by default the core services are built in the background.
+    """
+    app = Quart(__name__)
+    app.config['SECRET_KEY'] = AppConfig.FLASK_SECRET_KEY
+    logger.info("Quart (ASGI) application created with secret key.")
+
+    # Warm-up runs on a background thread, so the event loop serves probes meanwhile
+    services = CoreServices(rag_chain)
+    services.start()
+
+    async def wait_ready() -> bool:
+        """Waits without blocking the event loop for the warm-up, up to READY_WAIT_SECONDS."""
+        deadline = time.monotonic() + AppConfig.READY_WAIT_SECONDS
+        while not services.ready:
+            if services.failed or time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.1)
+        return True
+
+    def starting_response() -> Response:
+        return Response(STARTING_MESSAGE, status=503, headers={"Retry-After": "5"})
+
+    # Created lazily so it binds to the server's running event loop; also flags a running /batch
+    limiter = {}
+
+    def get_limiter() -> asyncio.Semaphore:
+        if "semaphore" not in limiter:
+            limiter["semaphore"] = asyncio.Semaphore(AppConfig.LLM_MAX_CONCURRENCY)
+        return limiter["semaphore"]
+
+    async def acquire_slot() -> bool:
+        """Waits for a free LLM slot, giving up after the configured queue timeout."""
+        try:
+            await asyncio.wait_for(get_limiter().acquire(), timeout=AppConfig.LLM_QUEUE_TIMEOUT_SECONDS)
+            return True
+        except asyncio.TimeoutError:
+            REJECTED_COUNT.inc()
+            return False
+
+    def busy_response() -> Response:
+        return Response(BUSY_MESSAGE, status=503, headers={"Retry-After": "2"})
+
+    # ==========================================================================
+    # 3. DEFINE ROUTES
+    # ==========================================================================
+
+    @app.route("/")
+    async def index() -> str:
+        """
+        Renders the main chat page.
+        Initializes a unique session ID for each user.
+        """
+        REQUEST_COUNT.inc()
+        if 'session_id' not in session:
+            session['session_id'] = str(uuid.uuid4())
+            logger.info(
+                f"New user session created with ID: {session['session_id']}",
+                extra=sampled(session_id=session['session_id']),
+            )
+        return await render_template("index.html")
+
+    @app.route("/get", methods=["POST"])
+    async def get_response():
+        """
+        Handles POST requests from the chat interface with a non-blocking chain call.
+        """
+        session_id = session.get('session_id', 'default_session') # Fallback
+        form = await request.form
+        user_input = form.get("msg")
+        if not user_input:
+            logger.warning(f"Received empty message from session {session_id}")
+            return "Please provide a message."
+
+        if not await wait_ready():
+            return starting_response()
+
+        if not await acquire_slot():
+            logger.warning(f"Rejected request from session {session_id}: LLM concurrency limit reached.")
+            return busy_response()
+
+        start_time = time.perf_counter()
+        try:
+            logger.info(
+                f"Received input from session {session_id}: '{user_input[:LOGGED_TEXT_CHARS]}'",
+                extra=sampled(session_id=session_id, input_chars=len(user_input)),
+            )
+            result = await services.rag_chain.ainvoke(
+                {"input": user_input},
+                config=chain_config(session_id)
+            )
+            response = result["answer"]
+            logger.info(
+                f"Generated response for session {session_id}: '{response[:80]}...'",
+                extra=sampled(session_id=session_id, response_chars=len(response)),
+            )
+            SUCCESS_COUNT.inc()
+            return response
+
+        except Exception as e:
+            logger.error(f"An error occurred handling request for session {session_id}: {e}", exc_info=True)
+            ERROR_COUNT.inc()
+            return ERROR_MESSAGE
+        finally:
+            get_limiter().release()
+            REQUEST_LATENCY.labels(endpoint="/get").observe(time.perf_counter() - start_time)
+
+    @app.route("/stream", methods=["POST"])
+    async def stream_response():
+        """
+        Streams the answer token by token as Server-Sent Events (see app.py).
+        """
+        session_id = session.get('session_id', 'default_session') # Fallback
+        form = await request.form
+        user_input = form.get("msg")
+        if user_input and not await wait_ready():
+            return starting_response()
+
+        async def generate():
+            if not user_input:
+                logger.warning(f"Received empty message from session {session_id}")
+                yield format_sse({"token": "Please provide a message."})
+                yield format_sse({}, event="done")
+                return
+
+            # The slot is taken inside the generator so it is always released with it
+            if not await acquire_slot():
+                logger.warning(f"Rejected stream from session {session_id}: LLM concurrency limit reached.")
+                yield format_sse({"message": BUSY_MESSAGE}, event="error")
+                return
+
+            logger.info(
+                f"Received streaming input from session {session_id}: '{user_input[:LOGGED_TEXT_CHARS]}'",
+                extra=sampled(session_id=session_id, input_chars=len(user_input)),
+            )
+            start_time = time.perf_counter()
+            try:
+                answer_parts = []
+                async for chunk in services.rag_chain.astream(
+                    {"input": user_input},
+                    config=chain_config(session_id)
+                ):
+                    token = chunk.get("answer")
+                    if token:
+                        answer_parts.append(token)
+                        yield format_sse({"token": token})
+
+                response = "".join(answer_parts)
+                logger.info(
+                    f"Streamed response for session {session_id}: '{response[:80]}...'",
+                    extra=sampled(session_id=session_id, response_chars=len(response)),
+                )
+                SUCCESS_COUNT.inc()
+                yield format_sse({}, event="done")
+
+            except Exception as e:
+                logger.error(f"An error occurred streaming a response for session {session_id}: {e}", exc_info=True)
+                ERROR_COUNT.inc()
+                yield format_sse({"message": ERROR_MESSAGE}, event="error")
+            finally:
+                get_limiter().release()
+                REQUEST_LATENCY.labels(endpoint="/stream").observe(time.perf_counter() - start_time)
+
+        response = Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+        # Quart otherwise cuts the stream off silently after RESPONSE_TIMEOUT (60 s)
+        response.timeout = None
+        return response
+
+    @app.route("/batch", methods=["POST"])
+    async def batch_response():
+        """
+        Answers a JSONL batch of questions and streams one JSON result per line (see app.py).
+
+        The batch runs on a worker thread, so it does not hold the event loop. Each of its
+        chain calls waits for one of the shared LLM slots, so interactive requests keep
+        their share of LLM_MAX_CONCURRENCY; a second batch gets a 503 until the first ends.
+        """
+        from chain.batch_qa import BatchQARunner, parse_batch_lines
+
+        REQUEST_COUNT.inc()
+        if not await wait_ready():
+            return starting_response()
+
+        files = await request.files
+        upload = files.get("file")
+        body = upload.read() if upload else await request.get_data()
+        try:
+            items = parse_batch_lines(body.decode("utf-8").splitlines())
+        except (UnicodeDecodeError, ValueError) as e:
+            return Response(f"Invalid batch: {e}", status=400)
+        if not items:
+            return Response("Invalid batch: no questions.", status=400)
+        if len(items) > AppConfig.BATCH_MAX_QUESTIONS:
+            return Response(f"A batch may hold at most {AppConfig.BATCH_MAX_QUESTIONS} questions.", status=413)
+        if limiter.get("batch_running"):
+            return Response(BATCH_BUSY_MESSAGE, status=503, headers={"Retry-After": "60"})
+        logger.info(f"Received a batch of {len(items)} questions.")
+
+        async def generate():
+            # Claimed here, with no await since the check, so only a started body holds the
+            # flag and its finally always clears it; a batch that won a race since the
+            # check above turns this one away
+            if limiter.get("batch_running"):
+                yield json.dumps({"status": "error", "error": BATCH_BUSY_MESSAGE}) + "\n"
+                return
+            limiter["batch_running"] = True
+
+            start_time = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            semaphore = get_limiter()
+
+            @contextmanager
+            def llm_slot():
+                # Called on the worker thread; the semaphore belongs to the event loop
+                asyncio.run_coroutine_threadsafe(semaphore.acquire(), loop).result()
+                try:
+                    yield
+                finally:
+                    loop.call_soon_threadsafe(semaphore.release)
+
+            runner = BatchQARunner.from_config(services.rag_chain, admission=llm_slot)
+            results = runner.run(items)
+            pending = None
+            try:
+                while True:
+                    # Shielded, so a disconnect leaves the worker's call for the finally to drain
+                    pending = loop.run_in_executor(None, next, results, None)
+                    record = await asyncio.shield(pending)
+                    if record is None:
+                        break
+                    yield json.dumps(record, ensure_ascii=False) + "\n"
+                SUCCESS_COUNT.inc()
+            except Exception as e:
+                logger.error(f"An error occurred processing a batch: {e}", exc_info=True)
+                ERROR_COUNT.inc()
+                yield json.dumps({"status": "error", "error": ERROR_MESSAGE}) + "\n"
+            finally:
+                # A cancelled or closed body stops the runner and waits for the calls in
+                # flight, so the next batch never overlaps this one's LLM slots
+                runner.stop()
+                if pending is not None and not pending.done():
+                    logger.warning("Batch client went away; stopping the batch.")
+                    await asyncio.wait([pending])
+                limiter["batch_running"] = False
+                REQUEST_LATENCY.labels(endpoint="/batch").observe(time.perf_counter() - start_time)
+
+        response = Response(generate(), mimetype="application/x-ndjson")
+        # A nightly batch runs far longer than Quart's RESPONSE_TIMEOUT (60 s)
+        response.timeout = None
+        return response
+
+    @app.route("/health")
+    async def health() -> Response:
+        """
+        Liveness probe (see app.py).
+        """
+        if services.failed:
+            return Response("failed", status=503)
+        return Response("ok", mimetype="text/plain")
+
+    @app.route("/ready")
+    async def ready() -> Response:
+        """
+        Readiness probe: 200 once the embedding model, index and chain are warm.
+        """
+        if services.ready:
+            return Response("ready", mimetype="text/plain")
+        return Response("failed" if services.failed else "starting", status=503)
+
+    @app.route("/metrics")
+    async def metrics() -> Response:
+        """
+        Exposes Prometheus metrics for scraping.
+        """
+        return Response(generate_latest(), mimetype="text/plain")
+
+    return app
@@ -0,0 +1,96 @@
+# In benchmarks/common.py
+
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence
+
+# Secrets are only read when the service that needs them is built. Benchmarks never
+# build the Groq or Astra clients, so the Flask session key is the only one required.
+os.environ.setdefault("FLASK_SECRET_KEY", "benchmark")
+
+# Make the project root importable when a benchmark is run as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from utils.logger import set_console_level  # noqa: E402
+
+def quiet_console_logs(level: int = logging.WARNING) -> None:
+    """
+    Raises the console threshold of the project's logging so per-request INFO lines do
+    not drown the report. The log file under logs/ still receives everything.
+    """
+    set_console_level(level)
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize_latencies(latencies: List[float], wall_seconds: float) -> Dict[str, float]:
+    """
+    Summarizes per-request latencies (in seconds) as milliseconds plus throughput.
+
+    Returns:
+        Dict[str, float]: count, rps, mean/p50/p95/p99/max latency in ms.
+    """
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "count": count,
+        "rps": count / wall_seconds if wall_seconds > 0 else 0.0,
+        "mean_ms": sum(values) / count * 1000 if count else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000 if count else 0.0,
+    }
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+@contextmanager
+def measure(trace_memory: bool = False) -> Iterator[Dict[str, float]]:
+    """
+    Times a block and records the process's peak RSS afterwards.
+
+    Yields a dict that is filled with "seconds" and "peak_rss_mb" once the block
+    exits. With `trace_memory`, "peak_alloc_mb" (peak Python heap allocated inside the
+    block) is added too; tracemalloc slows allocation-heavy code, so only use it for
+    memory runs, not timing runs.
+    """
+    result: Dict[str, float] = {}
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["peak_alloc_mb"] = peak / (1024 * 1024)
+        result["peak_rss_mb"] = peak_rss_mb()
+
+def print_table(title: str, rows: List[Dict[str, object]]) -> None:
+    """Prints a list of result dicts as an aligned plain-text table."""
+    print(f"\n{title}")
+    if not rows:
+        print("  (no results)")
+        return
+    columns = list(rows[0].keys())
+    cells = [[f"{row[c]:.2f}" if isinstance(row[c], float) else str(row[c]) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    print("  " + "  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print("  " + "  ".join(v.rjust(w) for v, w in zip(r, widths)))
@@ -0,0 +1,135 @@
+# In benchmarks/fakes.py
+
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from utils.local_vector_store import LocalVectorStore
+
+_WORD_RE = re.compile(r"\w+")
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embeddings built with the hashing trick.
+
+    Texts that share words get similar vectors, so retrieval and the semantic answer
+    cache behave realistically without downloading a model. `call_latency` simulates
+    the fixed cost of one forward pass, which is what batching queries amortizes.
+    Simulated passes run one at a time, like a CPU-bound model saturating its cores.
+    """
+    def __init__(self, size: int = 384, call_latency: float = 0.0):
+        self.size = size
+        self.call_latency = call_latency
+        self._forward_lock = threading.Lock()
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in _WORD_RE.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.call_latency:
+            with self._forward_lock:
+                time.sleep(self.call_latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+class FakeChatModel(BaseChatModel):
+    """
+    A deterministic stand-in for ChatGroq with configurable, simulated latency.
+
+    The reply is derived from the last message, so identical prompts always give
+    identical answers. `latency` is the time to first token and `token_latency` the
+    delay between streamed tokens, which lets benchmarks model a remote LLM.
+    """
+    latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        prompt = messages[-1].content if messages else ""
+        digest = hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()[:8]
+        return f"Based on customer reviews, this product is well liked for its sound and battery (ref {digest})."
+
+    def _usage(self, messages: List[BaseMessage], reply: str) -> dict:
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": len(reply) // 4}
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any,
+    ) -> ChatResult:
+        reply = self._reply(messages)
+        time.sleep(self.latency + self.token_latency * len(reply.split()))
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=reply))],
+            llm_output={"token_usage": self._usage(messages, reply)},
+        )
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any,
+    ) -> ChatResult:
+        reply = self._reply(messages)
+        await asyncio.sleep(self.latency + self.token_latency * len(reply.split()))
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=reply))],
+            llm_output={"token_usage": self._usage(messages, reply)},
+        )
+
+    def _stream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for token in re.findall(r"\S+\s*", self._reply(messages)):
+            time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for token in re.findall(r"\S+\s*", self._reply(messages)):
+            await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+class FakeRemoteVectorStore(LocalVectorStore):
+    """
+    A LocalVectorStore that adds a fixed delay to every search, standing in for the
+    network round-trip of a managed store such as Astra DB.
+    """
+    def __init__(self, embedding: Embeddings, search_latency: float = 0.0, **kwargs: Any):
+        super().__init__(embedding=embedding, **kwargs)
+        self.search_latency = search_latency
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any):
+        if self.search_latency:
+            time.sleep(self.search_latency)
+        return super().similarity_search_with_score_by_vector(embedding, k, **kwargs)
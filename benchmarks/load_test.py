@@ -0,0 +1,181 @@
+# In benchmarks/load_test.py
+"""
+Replays a JSONL workload against the Flask app with local stand-ins for Groq and Astra.
+
+Examples:
+    python -m benchmarks.load_test --concurrency 8 --requests 200
+    python -m benchmarks.load_test --endpoint /stream --llm-latency 0.2 --token-latency 0.01
+    python -m benchmarks.load_test --json out.json --baseline main.json --max-regression 0.2
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from typing import Dict, List
+
+# Imported first: benchmarks.common sets the benchmark Flask session key and puts the project root on sys.path
+from benchmarks.common import PROJECT_ROOT, peak_rss_mb, print_table, quiet_console_logs, summarize_latencies
+from benchmarks.fakes import FakeChatModel, FakeRemoteVectorStore, HashingEmbeddings
+
+from app import create_app
+from chain.rag_chain import create_rag_chain
+from config.config import AppConfig
+from utils.data_converter import DataConverter
+from utils.lexical_index import BM25Index
+from utils.query_batcher import BatchingEmbeddings
+
+DEFAULT_WORKLOAD = os.path.join(PROJECT_ROOT, "benchmarks", "workload.jsonl")
+QUESTION_KEYS = ("question", "input", "msg", "title", "body")
+
+# --- 1. Workload ---
+
+def load_workload(path: str) -> List[Dict[str, str]]:
+    """
+    Reads a JSONL workload. Each line is an object whose question is taken from the
+    first present key of QUESTION_KEYS; an optional "session" groups lines into one
+    conversation so follow-up questions exercise the chat history.
+    """
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            question = next((record[k] for k in QUESTION_KEYS if record.get(k)), None)
+            if question is None:
+                raise ValueError(f"{path}:{line_no} has none of the keys {QUESTION_KEYS}")
+            items.append({"question": str(question), "session": str(record.get("session", line_no))})
+    if not items:
+        raise ValueError(f"Workload {path} is empty.")
+    return items
+
+# --- 2. Offline App ---
+
+def build_offline_app(args: argparse.Namespace):
+    """Builds the real Flask app around a fake LLM and an in-process vector store."""
+    AppConfig.ANSWER_CACHE_ENABLED = not args.no_answer_cache
+    AppConfig.RETRIEVER_MODE = args.retriever
+    AppConfig.QUERY_BATCHING_ENABLED = not args.no_query_batching
+    embedding = HashingEmbeddings(call_latency=args.embed_latency)
+    if AppConfig.QUERY_BATCHING_ENABLED:
+        embedding = BatchingEmbeddings(
+            embedding, max_batch_size=AppConfig.QUERY_BATCH_MAX_SIZE,
+            max_wait_ms=AppConfig.QUERY_BATCH_WAIT_MS, cache_size=AppConfig.QUERY_EMBED_CACHE_SIZE,
+        )
+    store = FakeRemoteVectorStore(embedding, search_latency=args.search_latency, index_type=args.index_type)
+    documents = DataConverter(AppConfig.DATA_FILE_PATH).to_documents()
+    store.add_documents(documents, ids=[d.metadata["content_hash"] for d in documents])
+    if args.retriever == "hybrid":
+        AppConfig.LEXICAL_INDEX_DIR = tempfile.mkdtemp(prefix="bm25-")
+        BM25Index.build(((d.metadata["content_hash"], d) for d in documents), AppConfig.LEXICAL_INDEX_DIR)
+    llm = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency)
+    return create_app(rag_chain=create_rag_chain(store, llm=llm)), len(documents)
+
+# --- 3. Replay ---
+
+def run_load_test(app, workload: List[Dict[str, str]], args: argparse.Namespace) -> Dict[str, float]:
+    """
+    Sends `args.requests` requests at `args.concurrency` and summarizes the latencies.
+
+    Every workload session gets its own test client, so its cookie-based chat session
+    carries over between its questions just like a browser's would.
+    """
+    clients: Dict[str, object] = {}
+    clients_lock = threading.Lock()
+    latencies: List[float] = []
+    errors = 0
+
+    def client_for(session: str):
+        with clients_lock:
+            if session not in clients:
+                clients[session] = app.test_client()
+                clients[session].get("/")
+            return clients[session]
+
+    def send(item: Dict[str, str]) -> tuple:
+        client = client_for(item["session"])
+        start = time.perf_counter()
+        response = client.post(args.endpoint, data={"msg": item["question"]})
+        body = response.get_data(as_text=True)  # Drains the stream for /stream
+        elapsed = time.perf_counter() - start
+        failed = response.status_code != 200 or "event: error" in body or "encountered an error" in body
+        return elapsed, failed
+
+    requests_to_send = list(islice(cycle(workload), args.requests))
+    for item in requests_to_send[:args.warmup]:
+        send(item)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for elapsed, failed in pool.map(send, requests_to_send):
+            latencies.append(elapsed)
+            errors += failed
+    wall = time.perf_counter() - start
+
+    summary = summarize_latencies(latencies, wall)
+    summary.update({"errors": errors, "concurrency": args.concurrency, "peak_rss_mb": peak_rss_mb()})
+    return summary
+
+# --- 4. Regression Check ---
+
+def check_regression(summary: Dict[str, float], baseline_path: str, max_regression: float) -> List[str]:
+    """Lists the latency/throughput figures that got worse than the baseline by more than `max_regression`."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = []
+    for key in ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"):
+        if baseline.get(key) and summary[key] > baseline[key] * (1 + max_regression):
+            failures.append(f"{key}: {summary[key]:.2f} vs baseline {baseline[key]:.2f}")
+    if baseline.get("rps") and summary["rps"] < baseline["rps"] * (1 - max_regression):
+        failures.append(f"rps: {summary['rps']:.2f} vs baseline {baseline['rps']:.2f}")
+    return failures
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD, help="JSONL file of questions to replay.")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests to send (the workload is cycled).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads.")
+    parser.add_argument("--warmup", type=int, default=5, help="Requests sent before timing starts.")
+    parser.add_argument("--endpoint", choices=["/get", "/stream"], default="/get")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated LLM time to first token (s).")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Simulated delay per generated token (s).")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Simulated query embedding forward pass (s).")
+    parser.add_argument("--search-latency", type=float, default=0.01, help="Simulated vector store round-trip (s).")
+    parser.add_argument("--index-type", choices=["exact", "ivf"], default="exact")
+    parser.add_argument("--retriever", choices=["vector", "hybrid"], default="hybrid")
+    parser.add_argument("--no-query-batching", action="store_true", help="Embed each query on its own.")
+    parser.add_argument("--no-answer-cache", action="store_true", help="Disable the semantic answer cache.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the application's INFO logs on the console.")
+    parser.add_argument("--json", dest="json_path", help="Write the summary to this JSON file.")
+    parser.add_argument("--baseline", help="JSON summary of a previous run to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative slowdown vs the baseline.")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.verbose:
+        quiet_console_logs()
+    workload = load_workload(args.workload)
+    app, corpus_size = build_offline_app(args)
+    summary = run_load_test(app, workload, args)
+    summary.update({"endpoint": args.endpoint, "corpus_size": corpus_size})
+    print_table(f"Load test: {args.requests} requests to {args.endpoint}", [summary])
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    if args.baseline:
+        failures = check_regression(summary, args.baseline, args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
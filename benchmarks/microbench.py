@@ -0,0 +1,265 @@
+# In benchmarks/microbench.py
+"""
+Microbenchmarks for the ingestion and retrieval building blocks.
+
+Examples:
+    python -m benchmarks.microbench                      # all benchmarks
+    python -m benchmarks.microbench convert --scale 50   # CSV -> Documents on a 50x copy of the data
+    python -m benchmarks.microbench retrieval --num-vectors 200000 --dim 768
+    python -m benchmarks.microbench embed --real-embeddings
+    python -m benchmarks.microbench lexical --scale 200
+    python -m benchmarks.microbench batching --threads 32 --real-embeddings
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from langchain_core.embeddings import Embeddings
+
+# Imported first: benchmarks.common sets the benchmark Flask session key and puts the project root on sys.path
+from benchmarks.common import measure, print_table, quiet_console_logs, summarize_latencies
+from benchmarks.fakes import HashingEmbeddings
+
+from config.config import AppConfig
+from utils.data_converter import DataConverter
+from utils.lexical_index import BM25Index
+from utils.local_vector_store import LocalVectorStore
+from utils.query_batcher import BatchingEmbeddings
+
+# --- 1. CSV -> Documents ---
+
+def bench_convert(args: argparse.Namespace) -> List[Dict[str, object]]:
+    """Times `to_documents` and `iter_documents` on the dataset replicated `args.scale` times."""
+    frame = pd.read_csv(AppConfig.DATA_FILE_PATH)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "reviews.csv")
+        pd.concat([frame] * args.scale, ignore_index=True).to_csv(path, index=False)
+        converter = DataConverter(path)
+
+        rows = []
+        for name, run in (
+            ("to_documents", lambda: len(converter.to_documents())),
+            ("iter_documents", lambda: sum(1 for _ in converter.iter_documents(AppConfig.DATA_CHUNK_SIZE))),
+        ):
+            with measure() as timing:
+                count = run()
+            with measure(trace_memory=True) as memory:
+                run()
+            rows.append({
+                "method": name,
+                "documents": count,
+                "seconds": timing["seconds"],
+                "docs_per_sec": count / timing["seconds"],
+                "peak_alloc_mb": memory["peak_alloc_mb"],
+            })
+    return rows
+
+# --- 2. Embedding ---
+
+def _embedding_model(args: argparse.Namespace, call_latency: float = 0.0) -> Tuple[Embeddings, str]:
+    """Returns the configured HuggingFace model with --real-embeddings, else the offline hashing model."""
+    if args.real_embeddings:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embedding = HuggingFaceEmbeddings(
+            model_name=AppConfig.EMBEDDING_MODEL,
+            encode_kwargs={"batch_size": AppConfig.EMBEDDING_BATCH_SIZE},
+        )
+        return embedding, AppConfig.EMBEDDING_MODEL
+    return HashingEmbeddings(call_latency=call_latency), "hashing (offline)"
+
+def bench_embed(args: argparse.Namespace) -> List[Dict[str, object]]:
+    """Measures document and query embedding throughput."""
+    embedding, name = _embedding_model(args)
+
+    texts = [d.page_content for d in DataConverter(AppConfig.DATA_FILE_PATH).to_documents()][:args.num_texts]
+    with measure() as docs:
+        embedding.embed_documents(texts)
+
+    latencies = []
+    for text in texts[:args.num_queries]:
+        start = time.perf_counter()
+        embedding.embed_query(text[:200])
+        latencies.append(time.perf_counter() - start)
+    query = summarize_latencies(latencies, sum(latencies))
+
+    return [{
+        "model": name,
+        "documents": len(texts),
+        "docs_per_sec": len(texts) / docs["seconds"],
+        "query_p50_ms": query["p50_ms"],
+        "query_p95_ms": query["p95_ms"],
+    }]
+
+# --- 3. Retrieval ---
+
+def _clustered_vectors(rng: np.random.Generator, count: int, dim: int, clusters: int) -> np.ndarray:
+    """Unit vectors drawn around random centers, which resembles real embeddings better than pure noise."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def bench_retrieval(args: argparse.Namespace) -> List[Dict[str, object]]:
+    """
+    Compares exact, IVF and product-filtered search latency on synthetic vectors,
+    with recall@k against exact search (filtered search answers a narrower question,
+    so it has no recall figure).
+    """
+    rng = np.random.default_rng(0)
+    vectors = _clustered_vectors(rng, args.num_vectors, args.dim, clusters=max(8, args.num_vectors // 500))
+    queries = _clustered_vectors(rng, args.num_queries, args.dim, clusters=8).tolist()
+    ids = [str(i) for i in range(args.num_vectors)]
+    texts = [f"review {i}" for i in ids]
+    metadatas = [{"product_name": f"product {i % args.num_products}"} for i in range(args.num_vectors)]
+
+    rows, exact_hits = [], None
+    for index_type, filtered in (("exact", False), ("ivf", False), ("exact", True)):
+        store = LocalVectorStore(
+            HashingEmbeddings(args.dim), index_type=index_type,
+            nlist=AppConfig.LOCAL_IVF_NLIST, nprobe=AppConfig.LOCAL_IVF_NPROBE,
+        )
+        store.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
+        search_kwargs = {"filter": {"product_name": {"$in": ["product 0"]}}} if filtered else {}
+
+        with measure() as build:
+            # Builds the IVF lists / metadata map lazily
+            store.similarity_search_with_score_by_vector(queries[0], k=args.k, **search_kwargs)
+        latencies, hits = [], []
+        for query in queries:
+            start = time.perf_counter()
+            results = store.similarity_search_with_score_by_vector(query, k=args.k, **search_kwargs)
+            latencies.append(time.perf_counter() - start)
+            hits.append({doc.page_content for doc, _ in results})
+        summary = summarize_latencies(latencies, sum(latencies))
+
+        if exact_hits is None:
+            exact_hits = hits
+        recall = "n/a" if filtered else float(np.mean([len(h & e) / len(e) for h, e in zip(hits, exact_hits)]))
+        rows.append({
+            "index": index_type + ("+filter" if filtered else ""),
+            "vectors": args.num_vectors,
+            "dim": args.dim,
+            "first_query_ms": build["seconds"] * 1000,
+            "qps": summary["rps"],
+            "p50_ms": summary["p50_ms"],
+            "p95_ms": summary["p95_ms"],
+            f"recall@{args.k}": recall,
+        })
+    return rows
+
+# --- 4. Lexical (BM25) Search ---
+
+def bench_lexical(args: argparse.Namespace) -> List[Dict[str, object]]:
+    """Times building the BM25 index over the dataset replicated `args.scale` times, then querying it."""
+    documents = DataConverter(AppConfig.DATA_FILE_PATH).to_documents()
+    corpus = ((f"{copy}-{i}", doc) for copy in range(args.scale) for i, doc in enumerate(documents))
+    questions = [doc.page_content[:80] for doc in documents]
+    latencies = []
+    with tempfile.TemporaryDirectory(prefix="bm25-") as directory:
+        with measure() as build:
+            index = BM25Index.build(corpus, directory)
+        for question in (questions * (args.num_queries // len(questions) + 1))[:args.num_queries]:
+            start = time.perf_counter()
+            index.search(question, k=AppConfig.HYBRID_FETCH_K)
+            latencies.append(time.perf_counter() - start)
+    summary = summarize_latencies(latencies, sum(latencies))
+    return [{
+        "documents": len(index),
+        "terms": len(index.vocabulary),
+        "postings": len(index.doc_rows),
+        "build_seconds": build["seconds"],
+        "qps": summary["rps"],
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+    }]
+
+# --- 5. Concurrent Query Embedding ---
+
+def bench_batching(args: argparse.Namespace) -> List[Dict[str, object]]:
+    """
+    Embeds distinct queries from `args.threads` concurrent callers, once straight
+    through the model and once through BatchingEmbeddings (LRU cache disabled, so
+    only coalescing into batched forward passes is measured).
+    """
+    base, name = _embedding_model(args, call_latency=args.embed_call_latency)
+    texts = [d.page_content[:200] for d in DataConverter(AppConfig.DATA_FILE_PATH).to_documents()]
+    queries = [f"{texts[i % len(texts)]} #{i}" for i in range(args.num_queries)]
+
+    rows = []
+    for mode in ("direct", "batched"):
+        embedding = base if mode == "direct" else BatchingEmbeddings(
+            base, max_batch_size=AppConfig.QUERY_BATCH_MAX_SIZE,
+            max_wait_ms=AppConfig.QUERY_BATCH_WAIT_MS, cache_size=0,
+        )
+
+        def embed(query: str) -> float:
+            start = time.perf_counter()
+            embedding.embed_query(query)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            latencies = list(pool.map(embed, queries))
+        summary = summarize_latencies(latencies, time.perf_counter() - start)
+        if isinstance(embedding, BatchingEmbeddings):
+            embedding.close()
+        rows.append({
+            "model": name,
+            "mode": mode,
+            "threads": args.threads,
+            "queries": len(queries),
+            "qps": summary["rps"],
+            "p50_ms": summary["p50_ms"],
+            "p95_ms": summary["p95_ms"],
+        })
+    return rows
+
+BENCHMARKS = {
+    "convert": bench_convert, "embed": bench_embed, "retrieval": bench_retrieval,
+    "lexical": bench_lexical, "batching": bench_batching,
+}
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmarks", nargs="*", help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all).")
+    parser.add_argument("--scale", type=int, default=20, help="convert/lexical: times to replicate the dataset.")
+    parser.add_argument("--real-embeddings", action="store_true", help="embed: use the configured HuggingFace model.")
+    parser.add_argument("--embed-call-latency", type=float, default=0.005,
+                        help="batching: simulated cost of one offline forward pass (s).")
+    parser.add_argument("--threads", type=int, default=16, help="batching: concurrent callers.")
+    parser.add_argument("--num-texts", type=int, default=450, help="embed: documents to embed.")
+    parser.add_argument("--num-vectors", type=int, default=50_000, help="retrieval: synthetic index size.")
+    parser.add_argument("--dim", type=int, default=768, help="retrieval: embedding dimension.")
+    parser.add_argument("--num-products", type=int, default=100, help="retrieval: distinct products for the filter.")
+    parser.add_argument("--num-queries", type=int, default=200, help="embed/retrieval/batching: queries to time.")
+    parser.add_argument("--k", type=int, default=AppConfig.RAG_RETRIEVER_K, help="retrieval: results per query.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the application's INFO logs on the console.")
+    parser.add_argument("--json", dest="json_path", help="Write all results to this JSON file.")
+    args = parser.parse_args(argv)
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    return args
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.verbose:
+        quiet_console_logs()
+    results = {}
+    for name in args.benchmarks or list(BENCHMARKS):
+        results[name] = BENCHMARKS[name](args)
+        print_table(name, results[name])
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable, RunnableBranch, RunnableGenerator, RunnableLambda
+from prometheus_client import Counter, Gauge
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# --- Prometheus Metrics (exported through the app's /metrics endpoint) ---
+CACHE_HITS = Counter("rag_answer_cache_hits_total", "Answers served from the semantic answer cache")
+CACHE_MISSES = Counter("rag_answer_cache_misses_total", "Questions that missed the semantic answer cache")
+CACHE_EVICTIONS = Counter("rag_answer_cache_evictions_total", "Cache entries evicted (LRU, TTL or index change)")
+CACHE_ENTRIES = Gauge("rag_answer_cache_entries", "Current number of entries in the semantic answer cache")
+
+# Chain key carrying the question embedding from the lookup to the store on a miss
+EMBEDDING_KEY = "question_embedding"
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def _without_embedding(chunk: dict) -> dict:
+    return {key: value for key, value in chunk.items() if key != EMBEDDING_KEY}
+
+class SemanticAnswerCache:
+    """
+    An in-memory answer cache keyed on the embedding of the standalone question.
+
+    A question hits the cache when its cosine similarity to a cached question is at
+    least `similarity_threshold`. Entries expire after `ttl_seconds`, the least recently
+    used entry is evicted once `max_entries` is reached, and the whole cache is cleared
+    whenever the vector index version reported by `index_version_fn` changes.
+    """
+    def __init__(
+        self,
+        embedding: Embeddings,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1024,
+        index_version_fn: Optional[Callable[[], Optional[str]]] = None,
+    ):
+        """
+        Initializes the SemanticAnswerCache.
+
+        Args:
+            embedding (Embeddings): Model used to embed standalone questions.
+            similarity_threshold (float): Minimum cosine similarity for a hit.
+            ttl_seconds (float): Lifetime of an entry.
+            max_entries (int): Maximum number of cached answers.
+            index_version_fn: Returns the current index version; a change clears the cache.
+        """
+        self.embedding = embedding
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.index_version_fn = index_version_fn
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim), allocated on first store
+        self._valid = np.zeros(max_entries, dtype=bool)
+        # slot -> (normalized question, answer, expires_at), in LRU order
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._exact: Dict[str, int] = {}  # normalized question -> slot
+        self._index_version = index_version_fn() if index_version_fn else None
+
+    # --- 1. Bookkeeping ---
+
+    def _evict(self, slot: int) -> None:
+        question, _, _ = self._entries.pop(slot)
+        self._exact.pop(question, None)
+        self._valid[slot] = False
+        CACHE_EVICTIONS.inc()
+
+    def _check_index_version(self) -> None:
+        if self.index_version_fn is None:
+            return
+        version = self.index_version_fn()
+        if version != self._index_version:
+            logger.info(f"Index version changed ({self._index_version} -> {version}); clearing answer cache.")
+            self._index_version = version
+            for slot in list(self._entries):
+                self._evict(slot)
+            CACHE_ENTRIES.set(0)
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embedding.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _hit(self, slot: int, now: float) -> Optional[str]:
+        _, answer, expires_at = self._entries[slot]
+        if expires_at < now:
+            self._evict(slot)
+            CACHE_ENTRIES.set(len(self._entries))
+            return None
+        self._entries.move_to_end(slot)
+        return answer
+
+    # --- 2. Public API ---
+
+    def lookup(self, question: str) -> Optional[str]:
+        """Returns a cached answer for a semantically equivalent question, or None."""
+        return self.lookup_with_embedding(question)[0]
+
+    def lookup_with_embedding(self, question: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Like `lookup`, but also returns the question's normalized embedding when one was
+        computed, so a miss can pass it to `store` instead of embedding the question again.
+        """
+        now = time.time()
+        key = _normalize_text(question)
+        with self._lock:
+            self._check_index_version()
+            if not self._entries:
+                CACHE_MISSES.inc()
+                return None, None
+            # Fast path: an exact repeat does not need an embedding at all
+            if key in self._exact:
+                answer = self._hit(self._exact[key], now)
+                if answer is not None:
+                    CACHE_HITS.inc()
+                    return answer, None
+
+        vector = self._embed(question)
+        with self._lock:
+            if self._vectors is not None and self._valid.any():
+                scores = self._vectors @ vector
+                scores[~self._valid] = -np.inf
+                slot = int(np.argmax(scores))
+                if scores[slot] >= self.similarity_threshold:
+                    answer = self._hit(slot, now)
+                    if answer is not None:
+                        CACHE_HITS.inc()
+                        return answer, vector
+        CACHE_MISSES.inc()
+        return None, vector
+
+    def store(self, question: str, answer: str, vector: Optional[np.ndarray] = None) -> None:
+        """
+        Caches `answer` for `question`, evicting the least recently used entry if full.
+
+        `vector` is the question's embedding from `lookup_with_embedding`; the question
+        is only embedded when it is not given.
+        """
+        if not answer:
+            return
+        if vector is None:
+            vector = self._embed(question)
+        key = _normalize_text(question)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+
+            if key in self._exact:
+                slot = self._exact[key]
+            elif len(self._entries) >= self.max_entries:
+                slot = next(iter(self._entries))
+                self._evict(slot)
+            else:
+                slot = int(np.flatnonzero(~self._valid)[0])
+
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = (key, answer, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(slot)
+            self._exact[key] = slot
+            CACHE_ENTRIES.set(len(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            for slot in list(self._entries):
+                self._evict(slot)
+            CACHE_ENTRIES.set(0)
+
+    # --- 3. Chain Integration ---
+
+    def wrap(self, answer_chain: Runnable, question_key: str = "standalone_question") -> Runnable:
+        """
+        Puts the cache in front of `answer_chain`.
+
+        On a hit, retrieval and generation are skipped entirely. On a miss, the chain's
+        output chunks are passed through (so streaming still works) and the final answer
+        is stored under the embedding the lookup already computed, carried in the chain
+        input as EMBEDDING_KEY and removed from the output.
+        """
+        def store_answer(chunks: Iterator[dict]) -> Iterator[dict]:
+            parts, question, vector = [], None, None
+            for chunk in chunks:
+                question = chunk.get(question_key, question)
+                if EMBEDDING_KEY in chunk:
+                    vector, chunk = chunk[EMBEDDING_KEY], _without_embedding(chunk)
+                if "answer" in chunk:
+                    parts.append(chunk["answer"])
+                if chunk:
+                    yield chunk
+            if question:
+                self.store(question, "".join(parts), vector)
+
+        async def astore_answer(chunks: AsyncIterator[dict]) -> AsyncIterator[dict]:
+            parts, question, vector = [], None, None
+            async for chunk in chunks:
+                question = chunk.get(question_key, question)
+                if EMBEDDING_KEY in chunk:
+                    vector, chunk = chunk[EMBEDDING_KEY], _without_embedding(chunk)
+                if "answer" in chunk:
+                    parts.append(chunk["answer"])
+                if chunk:
+                    yield chunk
+            if question:
+                if vector is None:
+                    # Embedding is a CPU forward pass; keep it off the event loop
+                    await asyncio.to_thread(self.store, question, "".join(parts))
+                else:
+                    self.store(question, "".join(parts), vector)
+
+        def _lookup(x: dict) -> dict:
+            answer, vector = self.lookup_with_embedding(x[question_key])
+            return {**x, "cached_answer": answer, EMBEDDING_KEY: vector}
+
+        def _cached(x: dict) -> dict:
+            return {**_without_embedding(x), "context": [], "answer": x["cached_answer"]}
+
+        lookup = RunnableLambda(_lookup).with_config(run_name="answer_cache_lookup")
+
+        return lookup | RunnableBranch(
+            (
+                lambda x: x["cached_answer"] is not None,
+                RunnableLambda(_cached),
+            ),
+            answer_chain | RunnableGenerator(store_answer, astore_answer),
+        ).with_config(run_name="semantic_answer_cache")
@@ -0,0 +1,319 @@
+"""
+Batch question answering for nightly jobs: a JSONL file of questions in, a JSONL
+file of answers out.
+
+Each input line is an object whose question is taken from the first present key of
+QUESTION_KEYS and whose id from ID_KEYS (the line number by default). Lines sharing
+an optional "session" form one conversation and are answered in order, so follow-up
+questions see the earlier turns; other lines are answered independently, without
+reading or writing the shared chat history store.
+
+Results are appended to the output as they finish, and a rerun with the same output
+skips the questions already answered, so a crashed job resumes where it stopped.
+
+Usage:
+    shopsmart-batch-qa questions.jsonl --output answers.jsonl
+    python -m chain.batch_qa questions.jsonl -o answers.jsonl --concurrency 8
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, ContextManager, Deque, Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import get_executor_for_config
+from prometheus_client import Counter
+
+from chain.rag_chain import EPHEMERAL_SESSION_PREFIX, get_session_history
+from config.config import AppConfig
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# --- Prometheus Metrics ---
+BATCH_QUESTIONS = Counter("rag_batch_questions_total", "Batch questions answered, by final status", ["status"])
+BATCH_RETRIES = Counter("rag_batch_retries_total", "Batch chain calls retried after the LLM provider rate-limited them")
+
+QUESTION_KEYS = ("question", "input", "msg", "title", "body")
+ID_KEYS = ("id", "request_id")
+
+# --- 1. Input and Output ---
+
+def parse_batch_lines(lines: Iterable[str], source: str = "<input>") -> List[dict]:
+    """
+    Parses JSONL lines into {"id", "question", "session"} items.
+
+    Raises:
+        ValueError: If a line is not JSON, has no question, or repeats an id.
+    """
+    items, seen = [], set()
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{source}:{line_no} is not valid JSON: {e}") from e
+        question = next((record[k] for k in QUESTION_KEYS if record.get(k)), None) if isinstance(record, dict) else None
+        if question is None:
+            raise ValueError(f"{source}:{line_no} has none of the keys {QUESTION_KEYS}")
+        item_id = str(next((record[k] for k in ID_KEYS if record.get(k) is not None), line_no))
+        if item_id in seen:
+            raise ValueError(f"{source}:{line_no} repeats the id '{item_id}'")
+        seen.add(item_id)
+        session = record.get("session")
+        items.append({"id": item_id, "question": str(question), "session": None if session is None else str(session)})
+    return items
+
+def load_batch_file(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return parse_batch_lines(f, source=path)
+
+def read_completed(path: str) -> Dict[str, dict]:
+    """
+    Returns the successful results already in an output file, by id.
+
+    A line cut short by a crash is ignored, so its question is answered again.
+    """
+    completed: Dict[str, dict] = {}
+    if not os.path.exists(path):
+        return completed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and record.get("status") == "ok":
+                completed[str(record.get("id"))] = record
+    return completed
+
+# --- 2. Rate Limits ---
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for HTTP 429 errors from the LLM client (e.g. groq.RateLimitError)."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "ratelimit" in type(error).__name__.lower()
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """The provider's Retry-After header, if the error carries one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+# --- 3. Runner ---
+
+class BatchQARunner:
+    """
+    Answers many questions with `rag_chain`, at most `max_concurrency` at a time.
+
+    Questions go to the chain in chunks of `chunk_size`, and each chunk's results are
+    yielded as soon as it finishes. Concurrent calls share embedding forward passes
+    through the query batcher (see utils/query_batcher.py). A question that is
+    rate-limited is retried up to `max_retries` times, after the provider's Retry-After
+    or an exponential backoff from `retry_base_seconds`; other errors are reported in
+    its result. A conversation's questions are sent one per wave, in input order.
+
+    Each chain call runs inside `admission()`, which a server uses to take one of its
+    shared LLM slots, so a batch waits its turn with the interactive requests. `stop()`
+    ends a run early, e.g. when the client that asked for it has gone.
+    """
+    def __init__(
+        self,
+        rag_chain: Runnable,
+        max_concurrency: int = 4,
+        chunk_size: int = 16,
+        max_retries: int = 5,
+        retry_base_seconds: float = 2.0,
+        admission: Optional[Callable[[], ContextManager]] = None,
+    ):
+        self.rag_chain = rag_chain
+        self.max_concurrency = max_concurrency
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.admission = admission or contextlib.nullcontext
+        self._stopped = threading.Event()
+        # Namespaces this run's conversations, so a rerun never sees an earlier run's turns
+        self.run_id = uuid.uuid4().hex[:12]
+
+    @classmethod
+    def from_config(
+        cls, rag_chain: Runnable, admission: Optional[Callable[[], ContextManager]] = None
+    ) -> "BatchQARunner":
+        return cls(
+            rag_chain,
+            admission=admission,
+            max_concurrency=AppConfig.BATCH_MAX_CONCURRENCY,
+            chunk_size=AppConfig.BATCH_CHUNK_SIZE,
+            max_retries=AppConfig.BATCH_MAX_RETRIES,
+            retry_base_seconds=AppConfig.BATCH_RETRY_BASE_SECONDS,
+        )
+
+    def _session_id(self, item: dict) -> str:
+        if item["session"] is not None:
+            return f"batch-{self.run_id}-session-{item['session']}"
+        # Only conversations are kept in the shared history store; a sessionless
+        # question gets a throwaway history, so it evicts no user's session
+        return f"{EPHEMERAL_SESSION_PREFIX}batch-{self.run_id}-question-{item['id']}"
+
+    def _seed_history(self, items: List[dict], completed: Dict[str, dict]) -> None:
+        """Replays answered turns into the chat history, so resumed follow-ups keep their context."""
+        for item in items:
+            record = completed.get(item["id"])
+            if item["session"] is not None and record is not None:
+                get_session_history(self._session_id(item)).add_messages(
+                    [HumanMessage(content=item["question"]), AIMessage(content=record.get("answer", ""))]
+                )
+
+    def stop(self) -> None:
+        """
+        Stops the run: calls already in flight finish, no further question is sent, and
+        `run` returns without yielding the rest of the current chunk.
+        """
+        self._stopped.set()
+
+    def _answer_one(self, item: dict, config: dict):
+        """Returns the chain's output for one question, the exception it raised, or None once stopped."""
+        try:
+            with self.admission():
+                if self._stopped.is_set():
+                    return None
+                return self.rag_chain.invoke({"input": item["question"]}, config)
+        except Exception as e:
+            return e
+
+    def _answer_chunk(self, chunk: List[dict]) -> Iterator[dict]:
+        attempts = {item["id"]: 0 for item in chunk}
+        pending = chunk
+        while pending:
+            configs = [
+                {
+                    "configurable": {"session_id": self._session_id(item)},
+                    "metadata": {"trace_id": uuid.uuid4().hex, "batch_id": item["id"]},
+                }
+                for item in pending
+            ]
+            with get_executor_for_config({"max_concurrency": self.max_concurrency}) as executor:
+                outputs = list(executor.map(self._answer_one, pending, configs))
+            if self._stopped.is_set():
+                return
+
+            retry, wait = [], 0.0
+            for item, output in zip(pending, outputs):
+                attempts[item["id"]] += 1
+                record = {"id": item["id"], "session": item["session"], "question": item["question"]}
+                if isinstance(output, Exception):
+                    if is_rate_limit_error(output) and attempts[item["id"]] <= self.max_retries:
+                        retry.append(item)
+                        backoff = self.retry_base_seconds * 2 ** (attempts[item["id"]] - 1)
+                        wait = max(wait, retry_after_seconds(output) or backoff)
+                        continue
+                    logger.error(f"Batch question '{item['id']}' failed: {output}")
+                    record.update(status="error", error=f"{type(output).__name__}: {output}")
+                else:
+                    record.update(status="ok", answer=output["answer"])
+                record["attempts"] = attempts[item["id"]]
+                BATCH_QUESTIONS.labels(status=record["status"]).inc()
+                yield record
+
+            if retry:
+                BATCH_RETRIES.inc(len(retry))
+                logger.warning(f"Rate-limited on {len(retry)} batch question(s); retrying in {wait:.1f}s.")
+                self._stopped.wait(wait * random.uniform(1.0, 1.25))  # Jitter, so parallel jobs do not retry in lockstep
+            pending = retry
+
+    def run(self, items: List[dict], completed: Optional[Dict[str, dict]] = None) -> Iterator[dict]:
+        """
+        Yields one result per item whose id is not in `completed`, as the results finish.
+
+        Each result holds "id", "session", "question", "status" ("ok" or "error"),
+        "answer" or "error", and "attempts".
+        """
+        completed = completed or {}
+        self._seed_history(items, completed)
+        # One queue per conversation; a wave takes the next question from each
+        queues: "OrderedDict[str, Deque[dict]]" = OrderedDict()
+        for item in items:
+            if item["id"] not in completed:
+                queues.setdefault(self._session_id(item), deque()).append(item)
+
+        total, done = sum(len(q) for q in queues.values()), 0
+        while queues:
+            wave = [q.popleft() for q in queues.values()]
+            queues = OrderedDict((key, q) for key, q in queues.items() if q)
+            for start in range(0, len(wave), self.chunk_size):
+                if self._stopped.is_set():
+                    logger.warning(f"Batch stopped after {done}/{total} questions.")
+                    return
+                for record in self._answer_chunk(wave[start:start + self.chunk_size]):
+                    done += 1
+                    yield record
+                logger.info(f"Batch progress: {done}/{total} questions answered.")
+
+# --- 4. CLI ---
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of questions.")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file the results are appended to (default: stdout).")
+    parser.add_argument("--concurrency", type=int, default=AppConfig.BATCH_MAX_CONCURRENCY, help="Chain calls in flight.")
+    parser.add_argument("--chunk-size", type=int, default=AppConfig.BATCH_CHUNK_SIZE, help="Questions per batch call.")
+    parser.add_argument("--max-retries", type=int, default=AppConfig.BATCH_MAX_RETRIES, help="Retries when rate-limited.")
+    parser.add_argument("--restart", action="store_true", help="Discard the existing output instead of resuming.")
+    args = parser.parse_args(argv)
+
+    items = load_batch_file(args.input)
+    to_stdout = args.output == "-"
+    completed = {} if to_stdout or args.restart else read_completed(args.output)
+    if completed:
+        logger.info(f"Resuming: {len(completed)} of {len(items)} questions already answered in {args.output}.")
+
+    # Builds the same chain as the web app (vector store, retriever, LLM)
+    from app import init_core_services
+
+    runner = BatchQARunner(
+        init_core_services(),
+        max_concurrency=args.concurrency,
+        chunk_size=args.chunk_size,
+        max_retries=args.max_retries,
+        retry_base_seconds=AppConfig.BATCH_RETRY_BASE_SECONDS,
+    )
+
+    out = sys.stdout if to_stdout else open(args.output, "w" if args.restart else "a", encoding="utf-8")
+    stats = {"ok": 0, "error": 0}
+    try:
+        # Any existing output may end in a line a crash cut short, even one without an answered id
+        if not to_stdout and not args.restart and not _ends_with_newline(args.output):
+            out.write("\n")  # Terminate the line a crash left incomplete before appending
+        for record in runner.run(items, completed):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            stats[record["status"]] += 1
+    finally:
+        if not to_stdout:
+            out.close()
+
+    logger.info(f"Batch finished: {stats['ok']} answered, {stats['error']} failed, {len(completed)} skipped.")
+    return 1 if stats["error"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
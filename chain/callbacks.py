@@ -0,0 +1,162 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.outputs import LLMResult
+
+from utils.logger import sampled, setup_logger
+from utils.metrics import LLM_TOKENS, RETRIEVED_DOCUMENTS, STAGE_LATENCY
+
+logger = setup_logger(__name__)
+
+STAGE_TAG_PREFIX = "stage:"
+
+def stage_tag(stage: str) -> str:
+    """Returns the run tag that marks every LLM call beneath a runnable as `stage`."""
+    return f"{STAGE_TAG_PREFIX}{stage}"
+
+class PipelineMetricsHandler(BaseCallbackHandler):
+    """
+    A LangChain callback handler that turns pipeline events into Prometheus metrics.
+
+    - LLM calls are timed per stage, taken from the "stage:<name>" tag of the runnable
+      that issued them (contextualize, qa), and their token usage is counted.
+    - Retriever calls are timed as the "retrieval" stage and their hit count recorded.
+    - When `trace_logging` is on, one log line per request lists the stage timings
+      together with the "trace_id" passed in the run metadata.
+    """
+    def __init__(self, trace_logging: bool = False):
+        self.trace_logging = trace_logging
+        self._lock = threading.Lock()
+        self._starts: Dict[UUID, tuple] = {}  # run_id -> (stage, start time)
+        self._roots: Dict[UUID, UUID] = {}  # run_id -> root run_id
+        self._children: Dict[UUID, List[UUID]] = {}  # root run_id -> every run beneath it
+        self._traces: Dict[UUID, dict] = {}  # root run_id -> {"trace_id", "start", "stages"}
+
+    # --- 1. Bookkeeping ---
+
+    @staticmethod
+    def _stage_from_tags(tags: Optional[List[str]], default: str) -> str:
+        for tag in tags or []:
+            if tag.startswith(STAGE_TAG_PREFIX):
+                return tag[len(STAGE_TAG_PREFIX):]
+        return default
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], stage: Optional[str]) -> None:
+        with self._lock:
+            # A parent always starts before its children, so its root is already known
+            root = run_id if parent_run_id is None else self._roots.get(parent_run_id, parent_run_id)
+            self._roots[run_id] = root
+            self._children.setdefault(root, []).append(run_id)
+            self._starts[run_id] = (stage, time.perf_counter())
+
+    def _finish(self, run_id: UUID) -> Optional[str]:
+        with self._lock:
+            stage, start = self._starts.pop(run_id, (None, None))
+            if start is None:
+                return None
+            elapsed = time.perf_counter() - start
+            trace = self._traces.get(self._roots.get(run_id))
+            if stage and trace is not None:
+                trace["stages"][stage] = trace["stages"].get(stage, 0.0) + elapsed
+        if stage:
+            STAGE_LATENCY.labels(stage=stage).observe(elapsed)
+        return stage
+
+    # --- 2. Chain Events (trace boundaries) ---
+
+    def on_chain_start(
+        self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID,
+        parent_run_id: Optional[UUID] = None, tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, Any]] = None, **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, None)
+        if parent_run_id is None:
+            with self._lock:
+                self._traces[run_id] = {
+                    "trace_id": (metadata or {}).get("trace_id"),
+                    "start": time.perf_counter(),
+                    "stages": {},
+                }
+
+    def _end_chain(self, run_id: UUID, error: Optional[BaseException] = None) -> None:
+        self._finish(run_id)
+        with self._lock:
+            trace = self._traces.pop(run_id, None)
+            if trace is None:
+                return
+            # The root run is done: forget every run that belonged to it
+            for child in self._children.pop(run_id, ()):
+                self._roots.pop(child, None)
+                self._starts.pop(child, None)
+        if self.trace_logging:
+            total = time.perf_counter() - trace["start"]
+            stages = " ".join(f"{name}={secs * 1000:.1f}ms" for name, secs in trace["stages"].items())
+            status = f"error={type(error).__name__}" if error else "ok"
+            logger.info(
+                f"trace_id={trace['trace_id']} total={total * 1000:.1f}ms {stages} status={status}",
+                extra=sampled(
+                    trace_id=trace["trace_id"],
+                    total_ms=round(total * 1000, 1),
+                    stages_ms={name: round(secs * 1000, 1) for name, secs in trace["stages"].items()},
+                    status=status,
+                ),
+            )
+
+    def on_chain_end(self, outputs: Dict[str, Any], *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_chain(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_chain(run_id, error)
+
+    # --- 3. LLM Events ---
+
+    def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+        parent_run_id: Optional[UUID] = None, tags: Optional[List[str]] = None, **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, self._stage_from_tags(tags, "llm"))
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID,
+        parent_run_id: Optional[UUID] = None, tags: Optional[List[str]] = None, **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, self._stage_from_tags(tags, "llm"))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        stage = self._finish(run_id) or "llm"
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        if not usage:
+            # Streaming responses report usage on the message instead of llm_output
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens += metadata.get("input_tokens", 0)
+                    completion_tokens += metadata.get("output_tokens", 0)
+        if prompt_tokens:
+            LLM_TOKENS.labels(stage=stage, kind="prompt").inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(stage=stage, kind="completion").inc(completion_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    # --- 4. Retriever Events ---
+
+    def on_retriever_start(
+        self, serialized: Dict[str, Any], query: str, *, run_id: UUID,
+        parent_run_id: Optional[UUID] = None, **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, "retrieval")
+
+    def on_retriever_end(self, documents: Sequence[Document], *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+        RETRIEVED_DOCUMENTS.observe(len(documents))
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
@@ -0,0 +1,157 @@
+import math
+import re
+from typing import Dict, List, Sequence, Set
+
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+from prometheus_client import Counter
+
+from chain.history_store import estimate_tokens, trim_messages_to_budget
+from utils.lexical_index import tokenize_for_search
+from utils.logger import setup_logger
+from utils.product_summaries import SUMMARY_SOURCE
+
+logger = setup_logger(__name__)
+
+# --- Prometheus Metrics ---
+CONTEXT_TOKENS = Counter(
+    "rag_context_assembly_tokens_total",
+    "Estimated context + history tokens entering and leaving context assembly",
+    ["stage"],
+)
+CONTEXT_DUPLICATES = Counter("rag_context_duplicates_total", "Retrieved reviews dropped as near-duplicates")
+
+# Sentence ends, "..." runs, and the "2-bass is ..." numbered lists common in reviews
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\.{2,}\s*|\n+|\s+(?=\d+\s*[-)]\s*[A-Za-z])|(?<=[a-z])(?=\d+-[A-Za-z])")
+
+def estimate_text_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), as used for chat history."""
+    return len(text) // 4 + 1
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip(" .-") for s in _SENTENCE_SPLIT_RE.split(text) if s and len(s.strip(" .-")) > 1]
+
+class ContextAssembler:
+    """
+    Fits the retrieved reviews and the chat history into one token budget before the QA prompt.
+
+    1. Near-duplicate reviews (word-set Jaccard similarity above `dedup_similarity`)
+       are dropped, keeping the higher-ranked one.
+    2. Reviews longer than `max_review_tokens` are cut down to their `max_sentences`
+       sentences sharing the most (IDF-weighted) words with the question, kept in
+       their original order. Reviews that share no words keep their opening sentences.
+       Precomputed product summaries are already condensed and are kept whole.
+    3. History is guaranteed `history_share` of `token_budget` (when it needs it),
+       context fills the rest in retrieval order, and history then takes whatever
+       context left unused, dropping its oldest turns first.
+    """
+    def __init__(
+        self,
+        token_budget: int = 1200,
+        history_share: float = 0.35,
+        max_sentences: int = 3,
+        max_review_tokens: int = 40,
+        dedup_similarity: float = 0.8,
+    ):
+        self.token_budget = token_budget
+        self.history_share = history_share
+        self.max_sentences = max_sentences
+        self.max_review_tokens = max_review_tokens
+        self.dedup_similarity = dedup_similarity
+
+    # --- 1. Deduplication ---
+
+    def deduplicate(self, documents: Sequence[Document]) -> List[Document]:
+        kept: List[Document] = []
+        kept_words: List[Set[str]] = []
+        for doc in documents:
+            words = set(tokenize_for_search(doc.page_content)) or {doc.page_content.strip().lower()}
+            if any(len(words & other) / len(words | other) >= self.dedup_similarity for other in kept_words):
+                CONTEXT_DUPLICATES.inc()
+                continue
+            kept.append(doc)
+            kept_words.append(words)
+        return kept
+
+    # --- 2. Sentence Extraction ---
+
+    def extract(self, documents: Sequence[Document], question: str) -> List[Document]:
+        """Replaces each long review with its most question-relevant sentences."""
+        sentences = {id(doc): split_sentences(doc.page_content) for doc in documents}
+        # IDF over every candidate sentence, so words found everywhere ("good") count for little
+        document_frequency: Dict[str, int] = {}
+        total = 0
+        for parts in sentences.values():
+            for sentence in parts:
+                total += 1
+                for word in set(tokenize_for_search(sentence)):
+                    document_frequency[word] = document_frequency.get(word, 0) + 1
+        query_words = set(tokenize_for_search(question))
+
+        extracted = []
+        for doc in documents:
+            parts = sentences[id(doc)]
+            if (doc.metadata.get("source") == SUMMARY_SOURCE
+                    or estimate_text_tokens(doc.page_content) <= self.max_review_tokens or len(parts) <= 1):
+                extracted.append(doc)
+                continue
+            scores = [
+                sum(math.log(1 + total / document_frequency[w]) for w in query_words & set(tokenize_for_search(s)))
+                for s in parts
+            ]
+            ranked = sorted(range(len(parts)), key=lambda i: -scores[i])
+            chosen = [i for i in ranked[:self.max_sentences] if scores[i] > 0] or list(range(self.max_sentences))
+            text = " ... ".join(parts[i] for i in sorted(chosen) if i < len(parts))
+            extracted.append(Document(page_content=text, metadata=doc.metadata))
+        return extracted
+
+    # --- 3. Token Budget ---
+
+    def _fit_context(self, documents: Sequence[Document], budget: int) -> List[Document]:
+        fitted, used = [], 0
+        for doc in documents:
+            cost = estimate_text_tokens(doc.page_content)
+            if used + cost > budget:
+                remaining = budget - used
+                if remaining > self.max_review_tokens // 2:
+                    # Keep the whole sentences of this review that still fit
+                    text = ""
+                    for sentence in split_sentences(doc.page_content):
+                        candidate = f"{text} {sentence}".strip()
+                        if estimate_text_tokens(candidate) > remaining:
+                            break
+                        text = candidate
+                    if text:
+                        fitted.append(Document(page_content=text, metadata=doc.metadata))
+                break
+            fitted.append(doc)
+            used += cost
+        return fitted
+
+    def assemble(self, inputs: dict) -> dict:
+        """
+        Returns `inputs` with "context" and "chat_history" fitted to the token budget.
+
+        The question is taken from "standalone_question" when present, else "input".
+        """
+        question = inputs.get("standalone_question") or inputs.get("input", "")
+        documents: List[Document] = list(inputs.get("context") or [])
+        history: List[BaseMessage] = list(inputs.get("chat_history") or [])
+
+        history_tokens = sum(estimate_tokens(m) for m in history)
+        raw_tokens = history_tokens + sum(estimate_text_tokens(d.page_content) for d in documents)
+
+        documents = self.extract(self.deduplicate(documents), question)
+        reserved = min(history_tokens, int(self.token_budget * self.history_share))
+        documents = self._fit_context(documents, self.token_budget - reserved)
+        context_tokens = sum(estimate_text_tokens(d.page_content) for d in documents)
+        if history:
+            history = trim_messages_to_budget(history, 0, max(self.token_budget - context_tokens, 1))
+
+        CONTEXT_TOKENS.labels(stage="input").inc(raw_tokens)
+        CONTEXT_TOKENS.labels(stage="output").inc(context_tokens + sum(estimate_tokens(m) for m in history))
+        return {**inputs, "context": documents, "chat_history": history}
+
+    def as_runnable(self) -> Runnable:
+        return RunnableLambda(self.assemble).with_config(run_name="assemble_context")
@@ -0,0 +1,247 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, List, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, message_to_dict, messages_from_dict
+
+from config.config import AppConfig
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# --- 1. Windowing Helpers ---
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """Rough token count (~4 characters per token plus per-message overhead)."""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    return len(content) // 4 + 4
+
+def trim_messages_to_budget(messages: Sequence[BaseMessage], max_messages: int, token_budget: int) -> List[BaseMessage]:
+    """
+    Keeps the most recent messages that fit in both the message window and the token budget.
+
+    The window never starts with an AI reply, so the LLM always sees whole turns.
+    """
+    window = list(messages[-max_messages:]) if max_messages > 0 else list(messages)
+    if token_budget > 0:
+        kept, used = [], 0
+        for message in reversed(window):
+            used += estimate_tokens(message)
+            if used > token_budget:
+                break
+            kept.append(message)
+        window = kept[::-1]
+    while window and not isinstance(window[0], HumanMessage):
+        window.pop(0)
+    return window
+
+# --- 2. In-Memory Backend ---
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """
+    An in-memory chat history that stores at most `max_stored` messages and only
+    exposes the recent window (`max_messages` / `token_budget`) to the chain.
+    """
+    def __init__(self, max_messages: int, token_budget: int, max_stored: int):
+        self._messages: List[BaseMessage] = []
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.max_stored = max_stored
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return trim_messages_to_budget(self._messages, self.max_messages, self.token_budget)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self._messages.extend(messages)
+        if len(self._messages) > self.max_stored:
+            del self._messages[:-self.max_stored]
+
+    def clear(self) -> None:
+        self._messages = []
+
+class InMemoryHistoryStore:
+    """
+    Per-process session store with a per-session TTL and an LRU cap on the number of sessions.
+    """
+    def __init__(self, ttl_seconds: float, max_sessions: int, max_messages: int, token_budget: int, max_stored: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._history_kwargs = dict(max_messages=max_messages, token_budget=token_budget, max_stored=max_stored)
+        self._lock = threading.Lock()
+        # session_id -> (history, last_access), least recently used first
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _purge_expired(self, now: float) -> None:
+        # Sessions are ordered by last access, so expired ones sit at the front
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: str) -> BaseChatMessageHistory:
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+            if session_id in self._sessions:
+                history, _ = self._sessions.pop(session_id)
+            else:
+                history = BoundedChatMessageHistory(**self._history_kwargs)
+                while len(self._sessions) >= self.max_sessions:
+                    evicted, _ = self._sessions.popitem(last=False)
+                    logger.debug(f"Evicted least recently used chat session {evicted}.")
+            self._sessions[session_id] = (history, now)
+            return history
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+# --- 3. Shared SQLite Backend ---
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """A chat history persisted in SQLite, so every worker and pod on the volume sees it."""
+    def __init__(self, store: "SQLiteHistoryStore", session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self.store.read_messages(self.session_id)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.write_messages(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store.delete_session(self.session_id)
+
+class SQLiteHistoryStore:
+    """
+    Session store backed by a SQLite database file.
+
+    A new connection is opened per operation, which keeps the store safe across
+    threads and forked worker processes. Expired and least recently used sessions are
+    purged at most once every `purge_interval` seconds.
+    """
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float,
+        max_sessions: int,
+        max_messages: int,
+        token_budget: int,
+        max_stored: int,
+        purge_interval: float = 60.0,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.max_stored = max_stored
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, message TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_access ON sessions (last_access)")
+        logger.info(f"SQLite chat history store ready at {path}.")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Yields a connection inside a transaction and closes it afterwards."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _maybe_purge(self, conn: sqlite3.Connection, now: float) -> None:
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        conn.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+        conn.execute("DELETE FROM messages WHERE session_id NOT IN (SELECT session_id FROM sessions)")
+
+    def get(self, session_id: str) -> BaseChatMessageHistory:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT last_access FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row and now - row[0] > self.ttl_seconds:
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))  # Session expired
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access",
+                (session_id, now),
+            )
+            self._maybe_purge(conn, now)
+        return SQLiteChatMessageHistory(self, session_id)
+
+    def read_messages(self, session_id: str) -> List[BaseMessage]:
+        limit = self.max_messages if self.max_messages > 0 else self.max_stored
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, limit),
+            ).fetchall()
+        messages = messages_from_dict([json.loads(row[0]) for row in reversed(rows)])
+        return trim_messages_to_budget(messages, self.max_messages, self.token_budget)
+
+    def write_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO messages (session_id, message) VALUES (?, ?)",
+                [(session_id, json.dumps(message_to_dict(m))) for m in messages],
+            )
+            # Keep only the newest `max_stored` messages of the session
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id NOT IN ("
+                "SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_stored),
+            )
+
+    def delete_session(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+# --- 4. Factory ---
+
+def create_history_store():
+    """Builds the chat history store selected by AppConfig.HISTORY_BACKEND."""
+    kwargs = dict(
+        ttl_seconds=AppConfig.HISTORY_TTL_SECONDS,
+        max_sessions=AppConfig.HISTORY_MAX_SESSIONS,
+        max_messages=AppConfig.HISTORY_WINDOW_MESSAGES,
+        token_budget=AppConfig.HISTORY_TOKEN_BUDGET,
+        max_stored=AppConfig.HISTORY_MAX_STORED_MESSAGES,
+    )
+    backend = AppConfig.HISTORY_BACKEND
+    if backend == "memory":
+        return InMemoryHistoryStore(**kwargs)
+    if backend == "sqlite":
+        return SQLiteHistoryStore(AppConfig.HISTORY_SQLITE_PATH, **kwargs)
+    raise ValueError(f"Unknown HISTORY_BACKEND '{backend}'. Use 'memory' or 'sqlite'.")
@@ -0,0 +1,91 @@
+import time
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from chain.product_filter import PRODUCT_FILTER_DECISIONS, ProductCatalog, product_filter_for
+from utils.lexical_index import BM25Index
+from utils.metrics import STAGE_LATENCY
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+    Merges ranked lists with reciprocal-rank fusion: score(d) = sum over lists of 1 / (rrf_k + rank).
+
+    Only ranks are used, so BM25 and cosine scores never need to be put on one scale.
+    Documents are identified by their content hash, falling back to their text.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc.metadata.get("content_hash") or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+class HybridRetriever(BaseRetriever):
+    """
+    Combines dense vector search with BM25 keyword search using reciprocal-rank fusion.
+
+    Dense retrieval captures paraphrases ("long battery life"), while BM25 catches
+    exact tokens the embedding blurs, such as model names ("Rockerz 235v2"). Each side
+    returns `fetch_k` candidates, and the fused top `k` are passed to the LLM. When a
+    catalog is given, both sides are restricted to the products the question names,
+    as in ProductFilteredRetriever.
+    """
+    vector_store: VectorStore
+    lexical_index: BM25Index
+    catalog: Optional[ProductCatalog] = None
+    k: int = 4
+    fetch_k: int = 10
+    rrf_k: int = 60
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _lexical_search(self, query: str, product_filter: Optional[dict]) -> List[Document]:
+        start = time.perf_counter()
+        results = self.lexical_index.search(query, k=self.fetch_k, filter=product_filter)
+        STAGE_LATENCY.labels(stage="lexical_search").observe(time.perf_counter() - start)
+        return [doc for doc, _ in results]
+
+    def _record_filter_outcome(self, product_filter: Optional[dict], dense: List[Document], lexical: List[Document]) -> bool:
+        """Counts the filter decision; returns True if a filtered search must be retried unfiltered."""
+        if product_filter is None:
+            PRODUCT_FILTER_DECISIONS.labels(outcome="unfiltered").inc()
+            return False
+        if dense or lexical:
+            PRODUCT_FILTER_DECISIONS.labels(outcome="filtered").inc()
+            return False
+        PRODUCT_FILTER_DECISIONS.labels(outcome="fallback").inc()
+        return True
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        # Embedded once; a fallback search reuses the vector
+        embedding = self.vector_store.embeddings.embed_query(query)
+        product_filter = product_filter_for(self.catalog, query)
+        search_kwargs = {"filter": product_filter} if product_filter else {}
+        dense = self.vector_store.similarity_search_by_vector(embedding, k=self.fetch_k, **search_kwargs)
+        lexical = self._lexical_search(query, product_filter)
+        if self._record_filter_outcome(product_filter, dense, lexical):
+            dense = self.vector_store.similarity_search_by_vector(embedding, k=self.fetch_k)
+            lexical = self._lexical_search(query, None)
+        return reciprocal_rank_fusion([dense, lexical], k=self.k, rrf_k=self.rrf_k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # BM25 scoring is a few vectorized NumPy calls, cheap enough to run on the event loop
+        embedding = await self.vector_store.embeddings.aembed_query(query)
+        product_filter = product_filter_for(self.catalog, query)
+        search_kwargs = {"filter": product_filter} if product_filter else {}
+        dense = await self.vector_store.asimilarity_search_by_vector(embedding, k=self.fetch_k, **search_kwargs)
+        lexical = self._lexical_search(query, product_filter)
+        if self._record_filter_outcome(product_filter, dense, lexical):
+            dense = await self.vector_store.asimilarity_search_by_vector(embedding, k=self.fetch_k)
+            lexical = self._lexical_search(query, None)
+        return reciprocal_rank_fusion([dense, lexical], k=self.k, rrf_k=self.rrf_k)
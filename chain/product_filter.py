@@ -0,0 +1,163 @@
+import math
+from typing import Dict, List, Optional
+
+import pandas as pd
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from prometheus_client import Counter
+
+from chain.question_router import GENERIC_TITLE_WORDS, tokenize
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# --- Prometheus Metrics ---
+PRODUCT_FILTER_DECISIONS = Counter(
+    "rag_product_filter_total",
+    "Retrievals restricted to detected products, run unfiltered, or retried unfiltered",
+    ["outcome"],
+)
+
+# Metadata field holding the product title on every review Document
+PRODUCT_FIELD = "product_name"
+
+class ProductCatalog:
+    """
+    An in-memory index of product titles used to spot which products a question names.
+
+    Each title is reduced to its distinctive words (brand, line, model number), with
+    generic descriptive words and words shared by most titles dropped. Titles are
+    matched by the IDF-weighted overlap of their words with the question: the
+    best-scoring titles are selected, the words they explain are removed, and the
+    search repeats, so a comparison such as "realme Buds vs OnePlus Bullets" selects
+    both products, "boAt Airdopes 131" selects one, and "boAt" alone selects every
+    boAt product.
+    """
+    def __init__(self, titles: List[str], max_title_share: float = 0.5):
+        """
+        Args:
+            titles (List[str]): Distinct product titles, exactly as stored in Document metadata.
+            max_title_share (float): Words found in more than this fraction of titles are ignored.
+        """
+        self.titles = list(dict.fromkeys(titles))
+        title_tokens = [set(tokenize(title)) - GENERIC_TITLE_WORDS for title in self.titles]
+
+        document_frequency: Dict[str, int] = {}
+        for tokens in title_tokens:
+            for token in tokens:
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+        limit = max(1, int(len(self.titles) * max_title_share))
+        n = len(self.titles)
+        # token -> IDF weight, over distinctive tokens only
+        self._weights = {
+            token: math.log(1 + n / df) for token, df in document_frequency.items() if df <= limit
+        }
+        # token -> indices of the titles containing it
+        self._postings: Dict[str, List[int]] = {}
+        for i, tokens in enumerate(title_tokens):
+            for token in tokens:
+                if token in self._weights:
+                    self._postings.setdefault(token, []).append(i)
+
+    @classmethod
+    def from_csv(cls, file_path: str) -> "ProductCatalog":
+        """
+        Builds the catalog from the product_title column of the review CSV.
+
+        A missing or unreadable file yields an empty catalog, which disables filtering.
+        """
+        try:
+            titles = pd.read_csv(file_path, usecols=["product_title"])["product_title"].dropna().unique()
+        except Exception as e:
+            logger.warning(f"Could not load product titles from {file_path}; product filtering disabled. Error: {e}")
+            return cls([])
+        catalog = cls([str(t) for t in titles])
+        logger.info(f"Product catalog built with {len(catalog)} titles and {len(catalog._weights)} distinctive terms.")
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def match(self, question: str) -> List[str]:
+        """
+        Returns the titles of the products a question refers to (empty if none).
+
+        A title qualifies only through at least one alphabetic term; bare numbers such
+        as "100" add weight (to separate "BassHeads 100" from its siblings) but never
+        select a product on their own, since they usually mean prices or quantities.
+        """
+        remaining = {token for token in tokenize(question) if token in self._weights}
+        selected: List[int] = []
+        while remaining:
+            scores: Dict[int, float] = {}
+            qualifies: Dict[int, bool] = {}
+            for token in remaining:
+                for i in self._postings[token]:
+                    if i in selected:
+                        continue
+                    scores[i] = scores.get(i, 0.0) + self._weights[token]
+                    qualifies[i] = qualifies.get(i, False) or any(c.isalpha() for c in token)
+            candidates = {i: score for i, score in scores.items() if qualifies[i]}
+            if not candidates:
+                break
+            best = max(candidates.values())
+            winners = sorted(i for i, score in candidates.items() if score >= best - 1e-9)
+            selected.extend(winners)
+            remaining -= {token for token in remaining if any(i in winners for i in self._postings[token])}
+        return [self.titles[i] for i in selected]
+
+def product_filter_for(catalog: Optional[ProductCatalog], query: str) -> Optional[dict]:
+    """Returns the metadata filter for the products `query` names, or None if it names none."""
+    products = catalog.match(query) if catalog is not None else []
+    if not products:
+        return None
+    logger.debug(f"Restricting retrieval to products: {products}")
+    return {PRODUCT_FIELD: {"$in": products}}
+
+class ProductFilteredRetriever(BaseRetriever):
+    """
+    A retriever that restricts the similarity search to the products a question names.
+
+    The product filter uses the {"$in": [...]} metadata syntax understood by both
+    Astra DB and LocalVectorStore. Questions that name no product, or whose filtered
+    search returns nothing, fall back to a plain search over every review.
+    """
+    vector_store: VectorStore
+    catalog: ProductCatalog
+    k: int = 4
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        # Embedded once; a fallback search reuses the vector
+        embedding = self.vector_store.embeddings.embed_query(query)
+        product_filter = product_filter_for(self.catalog, query)
+        if product_filter is None:
+            PRODUCT_FILTER_DECISIONS.labels(outcome="unfiltered").inc()
+            return self.vector_store.similarity_search_by_vector(embedding, k=self.k)
+
+        documents = self.vector_store.similarity_search_by_vector(embedding, k=self.k, filter=product_filter)
+        if documents:
+            PRODUCT_FILTER_DECISIONS.labels(outcome="filtered").inc()
+            return documents
+        PRODUCT_FILTER_DECISIONS.labels(outcome="fallback").inc()
+        return self.vector_store.similarity_search_by_vector(embedding, k=self.k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        embedding = await self.vector_store.embeddings.aembed_query(query)
+        product_filter = product_filter_for(self.catalog, query)
+        if product_filter is None:
+            PRODUCT_FILTER_DECISIONS.labels(outcome="unfiltered").inc()
+            return await self.vector_store.asimilarity_search_by_vector(embedding, k=self.k)
+
+        documents = await self.vector_store.asimilarity_search_by_vector(embedding, k=self.k, filter=product_filter)
+        if documents:
+            PRODUCT_FILTER_DECISIONS.labels(outcome="filtered").inc()
+            return documents
+        PRODUCT_FILTER_DECISIONS.labels(outcome="fallback").inc()
+        return await self.vector_store.asimilarity_search_by_vector(embedding, k=self.k)
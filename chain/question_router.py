@@ -0,0 +1,91 @@
+import re
+from typing import FrozenSet, Iterable
+
+import pandas as pd
+from prometheus_client import Counter
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# --- Prometheus Metrics ---
+CONTEXTUALIZER_DECISIONS = Counter(
+    "rag_contextualizer_decisions_total",
+    "How each question reached retrieval: rewritten by the LLM or passed through as-is",
+    ["outcome"],
+)
+
+# Words that only make sense by pointing back at an earlier turn
+ANAPHORA = frozenset({
+    "it", "its", "it's", "they", "them", "their", "theirs", "this", "that", "these", "those",
+    "he", "she", "him", "her", "one", "ones", "same", "former", "latter", "above", "previous",
+    "earlier", "both", "either", "neither", "other", "another", "else",
+})
+
+# Openings that signal a follow-up to the previous answer
+FOLLOW_UP_PREFIXES = (
+    "what about", "how about", "and ", "also", "but ", "so ", "then ", "compared", "vs", "versus",
+    "instead", "why", "really", "ok", "okay",
+)
+
+# Descriptive title words that do not identify a product ("... with ASAP charging ...")
+GENERIC_TITLE_WORDS = frozenset({
+    "with", "and", "for", "the", "bass", "charging", "low", "price", "version", "edition", "series",
+    "wired", "wireless", "bluetooth", "headset", "headphones", "earphones", "mic", "true", "fast",
+})
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'&+.-]*")
+
+def tokenize(text: str) -> list:
+    return _TOKEN_RE.findall(text.lower())
+
+def load_entity_terms(file_path: str, max_title_share: float = 0.5) -> FrozenSet[str]:
+    """
+    Builds the vocabulary of distinctive product-title words (brands, model names).
+
+    Generic descriptive words and words shared by more than `max_title_share` of all
+    titles are dropped, since they do not identify a product on their own.
+
+    Args:
+        file_path (str): The product review CSV.
+        max_title_share (float): Maximum fraction of titles a word may appear in.
+
+    Returns:
+        FrozenSet[str]: Lower-cased entity terms.
+    """
+    try:
+        titles = pd.read_csv(file_path, usecols=["product_title"])["product_title"].dropna().unique()
+    except Exception as e:
+        logger.warning(f"Could not load product titles from {file_path}; standalone detection disabled. Error: {e}")
+        return frozenset()
+
+    title_counts: dict = {}
+    for title in titles:
+        for token in set(tokenize(title)):
+            title_counts[token] = title_counts.get(token, 0) + 1
+    limit = max(1, int(len(titles) * max_title_share))
+    terms = frozenset(
+        t for t, n in title_counts.items()
+        if n <= limit and len(t) > 2 and any(c.isalpha() for c in t) and t not in GENERIC_TITLE_WORDS
+    )
+    logger.info(f"Loaded {len(terms)} product entity terms from {len(titles)} titles.")
+    return terms
+
+def is_standalone_question(question: str, entity_terms: Iterable[str]) -> bool:
+    """
+    Cheap check for whether a question can be retrieved on without rewriting.
+
+    A question is treated as standalone when it names a product explicitly (an entity
+    term or a model number such as "235v2") and contains no back-references like
+    "it", "that one" or a follow-up opener like "what about". Anything ambiguous is
+    sent to the contextualizer LLM, so false negatives only cost the old latency.
+    """
+    text = question.strip().lower()
+    if text.startswith(FOLLOW_UP_PREFIXES):
+        return False
+    tokens = tokenize(text)
+    if not tokens or any(token in ANAPHORA for token in tokens):
+        return False
+    entity_terms = entity_terms if isinstance(entity_terms, (set, frozenset)) else set(entity_terms)
+    return any(token in entity_terms or (any(c.isdigit() for c in token) and any(c.isalpha() for c in token))
+               for token in tokens)
@@ -1,14 +1,32 @@
-from langchain_groq import ChatGroq
+import os
+import threading
+from operator import itemgetter
+from typing import FrozenSet, Optional
+
 from langchain.chains import create_retrieval_chain
-from langchain.chains.history_aware_retriever import create_history_aware_retriever
 from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import Runnable
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable, RunnableBranch, RunnableLambda, RunnablePassthrough
 from langchain_core.vectorstores import VectorStore
-from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
+from chain.answer_cache import SemanticAnswerCache
+from chain.callbacks import PipelineMetricsHandler, stage_tag
+from chain.context_assembler import ContextAssembler
+from chain.history_store import create_history_store
+from chain.hybrid_retriever import HybridRetriever
+from chain.product_filter import ProductCatalog, ProductFilteredRetriever
+from chain.question_router import CONTEXTUALIZER_DECISIONS, is_standalone_question, load_entity_terms
+from chain.summary_router import create_summary_router
 from config.config import AppConfig
+from utils.lexical_index import BM25Index
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 # --- 1. Define Prompt Templates for Clarity ---
 
@@ -32,56 +50,183 @@ QA_PROMPT = ChatPromptTemplate.from_messages([
     ("human", "{input}")
 ])
 
-# In-memory store for chat histories
-store = {}
+# Bounded store for chat histories (in-memory LRU/TTL or shared SQLite, see AppConfig).
+# Created on first use, so importing this module never creates directories or databases.
+# Web session IDs are uuid4 strings, so they never start with this prefix
+EPHEMERAL_SESSION_PREFIX = "ephemeral-"
+
+_history_store = None
+_history_store_lock = threading.Lock()
 
-def get_session_history(session_id: str) -> ChatMessageHistory:
+def get_history_store():
+    """Returns the process-wide chat history store, creating it on first use."""
+    global _history_store
+    if _history_store is None:
+        with _history_store_lock:
+            if _history_store is None:
+                _history_store = create_history_store()
+    return _history_store
+
+def get_session_history(session_id: str) -> BaseChatMessageHistory:
     """
     Retrieves the chat history for a given session ID.
     If no history exists, a new one is created.
+    Only the most recent window of messages is exposed to the chain.
+
+    An ID starting with EPHEMERAL_SESSION_PREFIX gets an empty history that is never
+    stored, for one-off questions that must not take a slot in the shared store.
     """
-    if session_id not in store:
-        store[session_id] = ChatMessageHistory()
-    return store[session_id]
+    if session_id.startswith(EPHEMERAL_SESSION_PREFIX):
+        return InMemoryChatMessageHistory()
+    return get_history_store().get(session_id)
 
 # --- 2. Create the RAG Chain ---
 
-def create_rag_chain(vector_store: VectorStore) -> Runnable:
+def create_question_rewriter(model: BaseChatModel, entity_terms: FrozenSet[str] = frozenset()) -> Runnable:
+    """
+    Creates a Runnable that turns {"input", "chat_history"} into a standalone question.
+
+    The contextualizer LLM call is skipped when there is no chat history, and (if
+    enabled) when the question already names a product without referring back to
+    earlier turns.
+    """
+    def passthrough(outcome: str) -> Runnable:
+        def _record(x: dict) -> str:
+            CONTEXTUALIZER_DECISIONS.labels(outcome=outcome).inc()
+            return x["input"]
+        return RunnableLambda(_record)
+
+    def _rewrite_with_llm(x: dict) -> dict:
+        CONTEXTUALIZER_DECISIONS.labels(outcome="rewritten").inc()
+        return x
+
+    skip_standalone = AppConfig.CONTEXTUALIZER_SKIP_STANDALONE
+    return RunnableBranch(
+        (lambda x: not x.get("chat_history"), passthrough("skipped_no_history")),
+        (lambda x: skip_standalone and is_standalone_question(x["input"], entity_terms), passthrough("skipped_standalone")),
+        (RunnableLambda(_rewrite_with_llm) | CONTEXTUALIZER_PROMPT | model | StrOutputParser())
+        .with_config(tags=[stage_tag("contextualize")]),
+    ).with_config(run_name="contextualize_question")
+
+def get_index_version(vector_store: VectorStore) -> Optional[str]:
+    """
+    Returns a token that changes whenever the indexed documents change.
+
+    The local backend tracks its own version; for remote stores we fall back to the
+    modification time of the ingestion manifest, which every ingestion run rewrites.
+    """
+    version = getattr(vector_store, "index_version", None)
+    if version:
+        return version
+    try:
+        return str(os.path.getmtime(AppConfig.INGEST_MANIFEST_PATH))
+    except OSError:
+        return None
+
+def create_retriever(vector_store: VectorStore) -> BaseRetriever:
+    """
+    Builds the retriever selected by AppConfig.RETRIEVER_MODE.
+
+    "hybrid" fuses dense and BM25 results and needs the lexical index written at
+    ingestion time; without it, retrieval falls back to dense search. Either way the
+    search is restricted to the products a question names when
+    AppConfig.PRODUCT_FILTER_ENABLED is set.
+    """
+    mode = AppConfig.RETRIEVER_MODE
+    if mode not in ("vector", "hybrid"):
+        raise ValueError(f"Unknown RETRIEVER_MODE '{mode}'. Use 'vector' or 'hybrid'.")
+    catalog = ProductCatalog.from_csv(AppConfig.DATA_FILE_PATH) if AppConfig.PRODUCT_FILTER_ENABLED else None
+
+    if mode == "hybrid":
+        lexical_index = BM25Index.load(AppConfig.LEXICAL_INDEX_DIR)
+        if lexical_index is not None:
+            return HybridRetriever(
+                vector_store=vector_store,
+                lexical_index=lexical_index,
+                catalog=catalog,
+                k=AppConfig.RAG_RETRIEVER_K,
+                fetch_k=AppConfig.HYBRID_FETCH_K,
+                rrf_k=AppConfig.HYBRID_RRF_K,
+            )
+        logger.warning(f"No BM25 index in {AppConfig.LEXICAL_INDEX_DIR}; falling back to vector-only retrieval.")
+
+    if catalog is not None:
+        return ProductFilteredRetriever(vector_store=vector_store, catalog=catalog, k=AppConfig.RAG_RETRIEVER_K)
+    return vector_store.as_retriever(search_kwargs={"k": AppConfig.RAG_RETRIEVER_K})
+
+def create_rag_chain(vector_store: VectorStore, llm: Optional[BaseChatModel] = None) -> Runnable:
     """
     Creates a conversational RAG chain.
 
     Args:
         vector_store: A configured vector store instance.
+        llm: Optional chat model to use instead of Groq (e.g. a local stand-in for benchmarks).
 
     Returns:
         A LangChain Runnable that manages the conversation flow.
     """
-    # 1. Initialize the LLM
-    model = ChatGroq(model_name=AppConfig.RAG_MODEL, temperature=AppConfig.RAG_TEMPERATURE)
+    # 1. Initialize the LLM (the Groq client is only imported and validated when it is used)
+    model = llm
+    if model is None:
+        from langchain_groq import ChatGroq
 
-    # 2. Create the retriever
-    retriever = vector_store.as_retriever(search_kwargs={"k": AppConfig.RAG_RETRIEVER_K})
+        model = ChatGroq(
+            model_name=AppConfig.RAG_MODEL,
+            temperature=AppConfig.RAG_TEMPERATURE,
+            groq_api_key=AppConfig.GROQ_API_KEY,
+        )
 
-    # 3. Create the history-aware retriever
-    history_aware_retriever = create_history_aware_retriever(
-        llm=model,
-        retriever=retriever,
-        prompt=CONTEXTUALIZER_PROMPT
-    )
+    # 2. Create the retriever (dense or hybrid, restricted to the products a question names)
+    retriever = create_retriever(vector_store)
+
+    # 3. Create the question rewriter (history-aware retrieval runs on its output)
+    entity_terms = load_entity_terms(AppConfig.DATA_FILE_PATH) if AppConfig.CONTEXTUALIZER_SKIP_STANDALONE else frozenset()
+    question_rewriter = create_question_rewriter(model, entity_terms)
 
     # 4. Create the question-answering chain
     question_answer_chain = create_stuff_documents_chain(
         llm=model,
         prompt=QA_PROMPT
     )
+    if AppConfig.CONTEXT_ASSEMBLY_ENABLED:
+        # Fit deduplicated, sentence-extracted reviews and the history into one token budget
+        context_assembler = ContextAssembler(
+            token_budget=AppConfig.QA_TOKEN_BUDGET,
+            history_share=AppConfig.QA_HISTORY_SHARE,
+            max_sentences=AppConfig.CONTEXT_MAX_SENTENCES,
+            max_review_tokens=AppConfig.CONTEXT_MAX_REVIEW_TOKENS,
+            dedup_similarity=AppConfig.CONTEXT_DEDUP_SIMILARITY,
+        )
+        question_answer_chain = context_assembler.as_runnable() | question_answer_chain
+    question_answer_chain = question_answer_chain.with_config(tags=[stage_tag("qa")])
 
     # 5. Combine them into a final retrieval chain
-    rag_chain = create_retrieval_chain(
-        retriever=history_aware_retriever,
+    answer_chain = create_retrieval_chain(
+        retriever=itemgetter("standalone_question") | retriever,
         combine_docs_chain=question_answer_chain
     )
 
-    # 6. Add history management
+    # 5a. Answer product-level questions from the precomputed summaries, skipping retrieval
+    if AppConfig.PRODUCT_SUMMARIES_ENABLED:
+        summary_router = create_summary_router(AppConfig.PRODUCT_SUMMARIES_PATH, AppConfig.SUMMARY_MAX_PRODUCTS)
+        if summary_router is not None:
+            answer_chain = summary_router.route(answer_chain, question_answer_chain)
+
+    # 5b. Serve repeated questions from the semantic answer cache
+    if AppConfig.ANSWER_CACHE_ENABLED:
+        answer_cache = SemanticAnswerCache(
+            embedding=vector_store.embeddings,
+            similarity_threshold=AppConfig.ANSWER_CACHE_SIMILARITY,
+            ttl_seconds=AppConfig.ANSWER_CACHE_TTL_SECONDS,
+            max_entries=AppConfig.ANSWER_CACHE_MAX_ENTRIES,
+            index_version_fn=lambda: get_index_version(vector_store)
+        )
+        answer_chain = answer_cache.wrap(answer_chain)
+
+    rag_chain = RunnablePassthrough.assign(standalone_question=question_rewriter) | answer_chain
+
+    # 6. Add history management (opening the store here surfaces a misconfigured backend at startup)
+    get_history_store()
     conversational_rag_chain = RunnableWithMessageHistory(
         rag_chain,
         get_session_history,
@@ -90,4 +235,6 @@ def create_rag_chain(vector_store: VectorStore) -> Runnable:
         output_messages_key="answer",
     )
 
-    return conversational_rag_chain
\ No newline at end of file
+    # 7. Export per-stage latency, token and retrieval metrics
+    metrics_handler = PipelineMetricsHandler(trace_logging=AppConfig.TRACE_LOGGING_ENABLED)
+    return conversational_rag_chain.with_config(callbacks=[metrics_handler])
\ No newline at end of file
@@ -0,0 +1,105 @@
+import re
+from typing import List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable, RunnableBranch, RunnableLambda, RunnablePassthrough
+from prometheus_client import Counter
+
+from chain.product_filter import ProductCatalog
+from chain.question_router import tokenize
+from utils.logger import setup_logger
+from utils.product_summaries import ProductSummaryTable
+
+logger = setup_logger(__name__)
+
+# --- Prometheus Metrics ---
+SUMMARY_ROUTE_DECISIONS = Counter(
+    "rag_summary_route_total",
+    "Questions answered from precomputed product summaries or sent through retrieval",
+    ["outcome"],
+)
+
+# Words that ask about a product as a whole rather than about one specific situation
+PRODUCT_LEVEL_WORDS = frozenset({
+    "overall", "general", "generally", "summary", "summarize", "summarise", "pros", "cons",
+    "worth", "rating", "ratings", "rated", "verdict", "opinion", "opinions", "consensus",
+})
+
+# Phrasings of the same intent that no single word gives away
+PRODUCT_LEVEL_PHRASES = re.compile(
+    r"\b(what do (people|customers|buyers|users|reviewers) (think|say|feel)"
+    r"|what are (people|customers|buyers|users|reviewers) saying"
+    r"|(do|would) (you|people|customers) recommend|reviews say)\b"
+)
+
+def is_product_level_question(question: str) -> bool:
+    """True if the question asks for an overall verdict ("overall, how is ...", "pros and cons of ...")."""
+    text = question.lower()
+    return any(token in PRODUCT_LEVEL_WORDS for token in tokenize(text)) or bool(PRODUCT_LEVEL_PHRASES.search(text))
+
+class SummaryRouter:
+    """
+    Finds the precomputed summaries that answer a product-level question.
+
+    A question is served from the summary table when it asks for an overall verdict
+    and names between one and `max_products` products, all of which have an entry.
+    Anything else (no product, a product without a summary, a specific situation such
+    as "does it fit small ears?") goes through normal retrieval.
+    """
+    def __init__(self, table: ProductSummaryTable, max_products: int = 3):
+        self.table = table
+        self.catalog = ProductCatalog(table.titles)
+        self.max_products = max_products
+
+    def lookup(self, question: str) -> List[Document]:
+        """Returns the summary Documents for `question`, or an empty list if it needs retrieval."""
+        if not self.table or not is_product_level_question(question):
+            return []
+        products = self.catalog.match(question)
+        if not products or len(products) > self.max_products:
+            return []
+        return [self.table.to_document(title) for title in products]
+
+    def route(self, answer_chain: Runnable, qa_chain: Runnable, question_key: str = "standalone_question") -> Runnable:
+        """
+        Puts the summary lookup in front of `answer_chain`.
+
+        Product-level questions skip retrieval and have `qa_chain` answer from the
+        summaries; the output keeps the retrieval chain's {"context", "answer"} shape.
+        """
+        # Looked up once; the branch and the summary chain both read x["summaries"]
+        find_summaries = RunnablePassthrough.assign(summaries=RunnableLambda(lambda x: self.lookup(x[question_key])))
+
+        def use_summaries(x: dict) -> bool:
+            routed = bool(x["summaries"])
+            SUMMARY_ROUTE_DECISIONS.labels(outcome="summary" if routed else "retrieval").inc()
+            return routed
+
+        def summaries_as_context(x: dict) -> dict:
+            inputs = {key: value for key, value in x.items() if key != "summaries"}
+            inputs["context"] = x["summaries"]
+            return inputs
+
+        def drop_summaries(x: dict) -> dict:
+            return {key: value for key, value in x.items() if key != "summaries"}
+
+        summary_chain = (
+            RunnableLambda(summaries_as_context) | RunnablePassthrough.assign(answer=qa_chain)
+        ).with_config(run_name="answer_from_summaries")
+
+        return (
+            find_summaries | RunnableBranch((use_summaries, summary_chain), RunnableLambda(drop_summaries) | answer_chain)
+        ).with_config(run_name="summary_router")
+
+def create_summary_router(path: str, max_products: int = 3) -> Optional[SummaryRouter]:
+    """Loads the summary table; returns None (logging why) when there is nothing to route to."""
+    try:
+        table = ProductSummaryTable.load(path)
+    except Exception as e:
+        logger.warning(f"Could not load product summaries from {path}; summary answers disabled. Error: {e}")
+        return None
+    if not table:
+        logger.warning(f"No product summaries in {path}; run `python -m utils.product_summaries` to build them.")
+        return None
+    logger.info(f"Loaded {len(table)} product summaries from {path}.")
+    return SummaryRouter(table, max_products=max_products)
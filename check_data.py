@@ -1,7 +1,9 @@
 import pandas as pd
 
-# Define the path to your data file
-FILE_PATH = "data/flipkart_product_review.csv"
+from config.config import AppConfig
+
+# Shares the application's configuration; importing it needs no secrets
+FILE_PATH = AppConfig.DATA_FILE_PATH
 
 def analyze_product_data(file_path: str):
     """
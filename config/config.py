@@ -1,41 +1,207 @@
 import os
+from typing import Any, Callable, Optional, Union
 from dotenv import load_dotenv
 
-# Load environment variables from the .env file
-load_dotenv()
+_dotenv_loaded = False
+
+def ensure_dotenv_loaded() -> None:
+    """
+    Loads the .env file into the environment on first use.
+
+    Deferred so that importing this module has no side effects; tools such as
+    check_data.py can share the configuration without any secrets being present.
+    """
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        load_dotenv()
+        _dotenv_loaded = True
 
 def get_env_variable(var_name: str) -> str:
     """
     Gets an environment variable or raises an error if it's not found.
     This ensures the application fails fast if a required variable is missing.
     """
+    ensure_dotenv_loaded()
     value = os.getenv(var_name)
     if value is None:
         raise ValueError(f"Error: Environment variable '{var_name}' not found. Please set it in your .env file.")
     return value
 
+def _to_bool(value: str) -> bool:
+    return value.lower() == "true"
+
+class EnvSetting:
+    """
+    A class attribute read from the environment on first access, then cached.
+
+    `default` may be a callable taking the owning class, for settings derived from
+    other settings. With `required=True` there is no default: a missing variable
+    raises ValueError when the setting is read, i.e. when the service that needs it
+    is built, not when the configuration is imported.
+    """
+    def __init__(
+        self,
+        var_name: str,
+        default: Union[str, Callable[[type], Any], None] = None,
+        cast: Callable[[str], Any] = str,
+        required: bool = False,
+    ):
+        self.var_name = var_name
+        self.default = default
+        self.cast = cast
+        self.required = required
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance: Any, owner: type) -> Any:
+        if self.required:
+            value = self.cast(get_env_variable(self.var_name))
+        else:
+            ensure_dotenv_loaded()
+            raw = os.getenv(self.var_name)
+            if raw is not None:
+                value = self.cast(raw)
+            else:
+                value = self.default(owner) if callable(self.default) else self.default
+        # Replace the descriptor with the resolved value so later reads are plain attribute lookups
+        setattr(owner, self.name, value)
+        return value
+
+def validate_secrets(*names: str) -> None:
+    """
+    Checks that every listed AppConfig secret is set, reporting all missing ones at once.
+
+    Raises:
+        ValueError: If any of the environment variables is missing.
+    """
+    missing = []
+    for name in names:
+        try:
+            getattr(AppConfig, name)
+        except ValueError:
+            missing.append(name)
+    if missing:
+        raise ValueError(f"Error: Environment variable(s) {', '.join(missing)} not found. Please set them in your .env file.")
+
 class AppConfig:
     """
     Centralized configuration for the application.
 
     Loads sensitive data from environment variables and defines application constants.
+    Environment-backed values are resolved lazily on first access (see EnvSetting).
     """
-    # Secrets loaded securely from the .env file
-    ASTRA_DB_API_ENDPOINT: str = get_env_variable("ASTRA_DB_API_ENDPOINT")
-    ASTRA_DB_APPLICATION_TOKEN: str = get_env_variable("ASTRA_DB_APPLICATION_TOKEN")
-    ASTRA_DB_KEYSPACE: str = get_env_variable("ASTRA_DB_KEYSPACE")
-    GROQ_API_KEY: str = get_env_variable("GROQ_API_KEY")
-    HUGGINGFACEHUB_API_TOKEN: str = get_env_variable("HUGGINGFACEHUB_API_TOKEN")
-    FLASK_SECRET_KEY: str = get_env_variable("FLASK_SECRET_KEY")
+    # Secrets loaded securely from the .env file, validated when first read
+    ASTRA_DB_API_ENDPOINT: str = EnvSetting("ASTRA_DB_API_ENDPOINT", required=True)
+    ASTRA_DB_APPLICATION_TOKEN: str = EnvSetting("ASTRA_DB_APPLICATION_TOKEN", required=True)
+    ASTRA_DB_KEYSPACE: str = EnvSetting("ASTRA_DB_KEYSPACE", required=True)
+    GROQ_API_KEY: str = EnvSetting("GROQ_API_KEY", required=True)
+    HUGGINGFACEHUB_API_TOKEN: str = EnvSetting("HUGGINGFACEHUB_API_TOKEN", required=True)
+    FLASK_SECRET_KEY: str = EnvSetting("FLASK_SECRET_KEY", required=True)
 
     # Application constants (non-sensitive values)
     EMBEDDING_MODEL: str = "BAAI/bge-base-en-v1.5"
+    # Directory where the embedding model is cached (None uses the library default)
+    EMBEDDING_CACHE_DIR: Optional[str] = EnvSetting("EMBEDDING_CACHE_DIR")
+    # Bulk embedding pipeline tuning (CPU-only nodes)
+    EMBEDDING_BATCH_SIZE: int = EnvSetting("EMBEDDING_BATCH_SIZE", 64, int)
+    EMBEDDING_NUM_WORKERS: int = EnvSetting("EMBEDDING_NUM_WORKERS", 2, int)
+    EMBEDDING_INTRA_OP_THREADS: int = EnvSetting("EMBEDDING_INTRA_OP_THREADS", 0, int)  # 0 keeps the library default
+    # Embedding backend: "torch" (float sentence-transformers) or "onnx" (exported model on ONNX Runtime)
+    EMBEDDING_BACKEND: str = EnvSetting("EMBEDDING_BACKEND", "torch")
+    ONNX_MODEL_DIR: str = EnvSetting("ONNX_MODEL_DIR", "artifacts/onnx/bge-base-en-v1.5")
+    ONNX_QUANTIZED: bool = EnvSetting("ONNX_QUANTIZED", True, _to_bool)  # int8 dynamic quantization
+    ONNX_INTRA_OP_THREADS: int = EnvSetting("ONNX_INTRA_OP_THREADS", 0, int)  # 0 keeps the ONNX Runtime default
+    ONNX_INTER_OP_THREADS: int = EnvSetting("ONNX_INTER_OP_THREADS", 0, int)
+    # Concurrent query embeddings are coalesced into micro-batches (see utils/query_batcher.py)
+    QUERY_BATCHING_ENABLED: bool = EnvSetting("QUERY_BATCHING_ENABLED", True, _to_bool)
+    QUERY_BATCH_MAX_SIZE: int = EnvSetting("QUERY_BATCH_MAX_SIZE", 32, int)
+    QUERY_BATCH_WAIT_MS: float = EnvSetting("QUERY_BATCH_WAIT_MS", 5.0, float)  # Idle encoder waits this long to fill a batch
+    QUERY_EMBED_CACHE_SIZE: int = EnvSetting("QUERY_EMBED_CACHE_SIZE", 1024, int)  # Recent query vectors kept (0 disables)
     RAG_MODEL: str = "llama-3.1-8b-instant"
 
     # Data and Vector Store settings
     DATA_FILE_PATH: str = "data/flipkart_product_review.csv"
+    DATA_CHUNK_SIZE: int = EnvSetting("DATA_CHUNK_SIZE", 10000, int)  # CSV rows parsed per chunk
     ASTRA_DB_COLLECTION_NAME: str = "flipkart_reviews"
 
+    # Vector store backend: "astra" (managed Astra DB) or "local" (in-process NumPy index)
+    VECTOR_STORE_BACKEND: str = EnvSetting("VECTOR_STORE_BACKEND", "astra")
+    LOCAL_INDEX_TYPE: str = EnvSetting("LOCAL_INDEX_TYPE", "exact")  # "exact" or "ivf"
+    LOCAL_IVF_NLIST: int = 64
+    LOCAL_IVF_NPROBE: int = 8
+    # On-disk, memory-mapped artifact for the local backend (shared across workers)
+    LOCAL_INDEX_DIR: str = EnvSetting("LOCAL_INDEX_DIR", "artifacts/local_index")
+    LOCAL_INDEX_DTYPE: str = EnvSetting("LOCAL_INDEX_DTYPE", "float32")  # "float32" or "float16"
+    # Content hashes already written to the vector store, used for incremental ingestion
+    INGEST_MANIFEST_PATH: str = EnvSetting(
+        "INGEST_MANIFEST_PATH", lambda cfg: f"artifacts/ingest_manifest_{cfg.VECTOR_STORE_BACKEND}.json"
+    )
+
     # RAG Chain settings
     RAG_TEMPERATURE: float = 0.5
-    RAG_RETRIEVER_K: int = 3
\ No newline at end of file
+    RAG_RETRIEVER_K: int = 3
+    # Skip the contextualizer LLM for questions that already name a product explicitly
+    CONTEXTUALIZER_SKIP_STANDALONE: bool = EnvSetting("CONTEXTUALIZER_SKIP_STANDALONE", True, _to_bool)
+    # Restrict retrieval to the products named in the question (matched against the CSV's titles)
+    PRODUCT_FILTER_ENABLED: bool = EnvSetting("PRODUCT_FILTER_ENABLED", True, _to_bool)
+    # Retriever: "vector" (dense only) or "hybrid" (dense + BM25 fused with reciprocal-rank fusion)
+    RETRIEVER_MODE: str = EnvSetting("RETRIEVER_MODE", "hybrid")
+    LEXICAL_INDEX_DIR: str = EnvSetting("LEXICAL_INDEX_DIR", "artifacts/lexical_index")
+    HYBRID_FETCH_K: int = EnvSetting("HYBRID_FETCH_K", 10, int)  # Candidates taken from each side before fusion
+    HYBRID_RRF_K: int = 60  # Reciprocal-rank fusion constant
+    # Answer product-level questions ("overall, how is X?") from precomputed per-product summaries
+    PRODUCT_SUMMARIES_ENABLED: bool = EnvSetting("PRODUCT_SUMMARIES_ENABLED", True, _to_bool)
+    PRODUCT_SUMMARIES_PATH: str = EnvSetting("PRODUCT_SUMMARIES_PATH", "artifacts/product_summaries.json")
+    SUMMARY_MAX_REVIEWS: int = EnvSetting("SUMMARY_MAX_REVIEWS", 30, int)  # Reviews shown to the LLM per product
+    SUMMARY_TEMPERATURE: float = 0.2
+    SUMMARY_MAX_PRODUCTS: int = 3  # Questions naming more products go through retrieval
+    # Context assembly: one token budget for the QA prompt's reviews and chat history
+    CONTEXT_ASSEMBLY_ENABLED: bool = EnvSetting("CONTEXT_ASSEMBLY_ENABLED", True, _to_bool)
+    QA_TOKEN_BUDGET: int = EnvSetting("QA_TOKEN_BUDGET", 1200, int)  # Approximate tokens of context + history
+    QA_HISTORY_SHARE: float = 0.35  # Part of the budget history keeps even when the context could use it
+    CONTEXT_MAX_SENTENCES: int = EnvSetting("CONTEXT_MAX_SENTENCES", 3, int)  # Sentences kept from a long review
+    CONTEXT_MAX_REVIEW_TOKENS: int = 40  # Reviews up to this size (~160 characters) are passed whole
+    CONTEXT_DEDUP_SIMILARITY: float = 0.8  # Word-set Jaccard similarity above which reviews are duplicates
+
+    # Chat history: "memory" (per process) or "sqlite" (shared by every worker/pod on the volume)
+    HISTORY_BACKEND: str = EnvSetting("HISTORY_BACKEND", "memory")
+    HISTORY_SQLITE_PATH: str = EnvSetting("HISTORY_SQLITE_PATH", "artifacts/chat_history.sqlite3")
+    HISTORY_TTL_SECONDS: int = EnvSetting("HISTORY_TTL_SECONDS", 3600, int)
+    HISTORY_MAX_SESSIONS: int = EnvSetting("HISTORY_MAX_SESSIONS", 10000, int)
+    HISTORY_MAX_STORED_MESSAGES: int = EnvSetting("HISTORY_MAX_STORED_MESSAGES", 50, int)
+    HISTORY_WINDOW_MESSAGES: int = EnvSetting("HISTORY_WINDOW_MESSAGES", 6, int)  # Messages sent to the LLM
+    HISTORY_TOKEN_BUDGET: int = EnvSetting("HISTORY_TOKEN_BUDGET", 1000, int)  # Approximate tokens sent to the LLM
+
+    # Async serving: cap on concurrent chain calls per worker, and how long a request may queue for a slot
+    LLM_MAX_CONCURRENCY: int = EnvSetting("LLM_MAX_CONCURRENCY", 32, int)
+    LLM_QUEUE_TIMEOUT_SECONDS: float = EnvSetting("LLM_QUEUE_TIMEOUT_SECONDS", 10.0, float)
+    # Startup: services warm up in the background; chat requests wait this long for them before a 503
+    READY_WAIT_SECONDS: float = EnvSetting("READY_WAIT_SECONDS", 5.0, float)
+
+    # Batch question answering (/batch and the shopsmart-batch-qa CLI, see chain/batch_qa.py)
+    BATCH_MAX_CONCURRENCY: int = EnvSetting("BATCH_MAX_CONCURRENCY", 4, int)  # Chain calls in flight per job
+    BATCH_CHUNK_SIZE: int = EnvSetting("BATCH_CHUNK_SIZE", 16, int)  # Questions per rag_chain.batch call; results stream per chunk
+    BATCH_MAX_RETRIES: int = EnvSetting("BATCH_MAX_RETRIES", 5, int)  # Retries of a rate-limited question
+    BATCH_RETRY_BASE_SECONDS: float = EnvSetting("BATCH_RETRY_BASE_SECONDS", 2.0, float)  # Doubled per retry unless Retry-After is sent
+    BATCH_MAX_QUESTIONS: int = EnvSetting("BATCH_MAX_QUESTIONS", 1000, int)  # Per /batch request; larger jobs use the CLI
+
+    # Logging: "queue" hands records to a background thread so requests never wait on log I/O; "sync" writes inline
+    LOG_MODE: str = EnvSetting("LOG_MODE", "queue")
+    LOG_FORMAT: str = EnvSetting("LOG_FORMAT", "text")  # "text" or "json" (one object per line)
+    LOG_LEVEL: str = EnvSetting("LOG_LEVEL", "INFO")
+    LOG_DIR: str = EnvSetting("LOG_DIR", "logs")
+    LOG_FILE_ENABLED: bool = EnvSetting("LOG_FILE_ENABLED", True, _to_bool)
+    LOG_FILE_MAX_BYTES: int = EnvSetting("LOG_FILE_MAX_BYTES", 10 * 1024 * 1024, int)  # Rotate logs/app.log at this size
+    LOG_FILE_BACKUP_COUNT: int = EnvSetting("LOG_FILE_BACKUP_COUNT", 5, int)
+    LOG_QUEUE_SIZE: int = EnvSetting("LOG_QUEUE_SIZE", 10000, int)  # Records beyond this are dropped, never waited on
+    LOG_SAMPLE_RATE: float = EnvSetting("LOG_SAMPLE_RATE", 1.0, float)  # Share of per-request INFO messages kept
+
+    # Log one line per request with its trace id and per-stage timings
+    TRACE_LOGGING_ENABLED: bool = EnvSetting("TRACE_LOGGING_ENABLED", False, _to_bool)
+
+    # Semantic answer cache (keyed on the embedding of the standalone question)
+    ANSWER_CACHE_ENABLED: bool = EnvSetting("ANSWER_CACHE_ENABLED", True, _to_bool)
+    ANSWER_CACHE_SIMILARITY: float = EnvSetting("ANSWER_CACHE_SIMILARITY", 0.95, float)
+    ANSWER_CACHE_TTL_SECONDS: int = EnvSetting("ANSWER_CACHE_TTL_SECONDS", 3600, int)
+    ANSWER_CACHE_MAX_ENTRIES: int = EnvSetting("ANSWER_CACHE_MAX_ENTRIES", 1024, int)
\ No newline at end of file
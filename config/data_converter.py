@@ -5,12 +5,13 @@ class DataConverter:
     def __init__(self,file_path:str):
         self.file_path = file_path
 
-    def convert(self):
-        df = pd.read_csv(self.file_path)[["product_title","review"]]
+    def iter_convert(self, chunksize:int = 10_000):
+        # Stream the CSV chunk by chunk so memory stays bounded for large exports
+        for chunk in pd.read_csv(self.file_path, usecols=["product_title","review"], chunksize=chunksize):
+            for row in chunk.to_dict('records'):
+                yield Document(page_content=row['review'] , metadata = {"product_name" : row["product_title"]})
 
-        docs = [
-            Document(page_content=row['review'] , metadata = {"product_name" : row["product_title"]})
-            for _, row in df.iterrows()
-        ]
+    def convert(self):
+        docs = list(self.iter_convert())
 
-        return docs
\ No newline at end of file
+        return docs
@@ -0,0 +1,30 @@
+# =================================================================
+# Gunicorn configuration for the async (ASGI) application
+# Run with: gunicorn -c gunicorn.conf.py "asgi:create_asgi_app()"
+# =================================================================
+import multiprocessing
+import os
+
+# --- Server Socket ---
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# --- Worker Processes ---
+# Each uvicorn worker runs an event loop that holds many in-flight LLM calls,
+# so a small number of workers per pod is enough; concurrency comes from asyncio.
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", min(2, multiprocessing.cpu_count())))
+
+# --- Timeouts ---
+# LLM responses can take several seconds; give requests room but recycle hung workers.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# --- Memory ---
+# Recycle workers periodically to cap slow memory growth.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+
+# --- Logging ---
+accesslog = "-"
+errorlog = "-"
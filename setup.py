@@ -28,6 +28,16 @@ setup(
     url="https://github.com/your-username/ShopSmartAIRecommender",  # Add your repo URL
     packages=find_packages(),
     install_requires=get_requirements(REQUIREMENTS_FILE),
+    extras_require={
+        # Optional ONNX Runtime embedding backend (EMBEDDING_BACKEND=onnx)
+        "onnx": ["onnxruntime>=1.17", "onnx>=1.15", "tokenizers>=0.15"],
+        # Offline test suite in tests/
+        "test": ["pytest>=7"],
+    },
+    entry_points={
+        # Nightly batch question answering over a JSONL file (see chain/batch_qa.py)
+        "console_scripts": ["shopsmart-batch-qa=chain.batch_qa:main"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",  # It's good practice to choose a license
@@ -0,0 +1,22 @@
+"""
+Shared fixtures. Every test runs offline: the hashing embeddings and fake chat model
+from benchmarks/fakes.py stand in for the embedding model, Groq and Astra DB.
+"""
+
+import os
+import sys
+
+import pytest
+
+# Run from anywhere: the project root holds the app's top-level packages
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeChatModel, HashingEmbeddings  # noqa: E402
+
+@pytest.fixture
+def embeddings() -> HashingEmbeddings:
+    return HashingEmbeddings(size=64)
+
+@pytest.fixture
+def chat_model() -> FakeChatModel:
+    return FakeChatModel()
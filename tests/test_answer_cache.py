@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+from chain import answer_cache
+from chain.answer_cache import EMBEDDING_KEY, SemanticAnswerCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+def test_same_words_hit_and_different_question_misses(embeddings):
+    cache = SemanticAnswerCache(embeddings, similarity_threshold=0.95)
+    cache.store("How long does the battery last?", "About 8 hours.")
+
+    assert cache.lookup("how long does the battery last") == "About 8 hours."  # Exact after normalizing
+    assert cache.lookup("How long does the battery last!!") == "About 8 hours."  # Same embedding
+    assert cache.lookup("Does it fit small ears?") is None
+
+def test_entries_expire_after_the_ttl(embeddings, clock):
+    cache = SemanticAnswerCache(embeddings, ttl_seconds=60)
+    cache.store("Is the bass good?", "Yes.")
+
+    clock.now += 59
+    assert cache.lookup("Is the bass good?") == "Yes."
+    clock.now += 2
+    assert cache.lookup("Is the bass good?") is None
+    assert cache.lookup("Is the bass good!") is None
+
+def test_index_version_change_clears_the_cache(embeddings):
+    version = {"current": "v1"}
+    cache = SemanticAnswerCache(embeddings, index_version_fn=lambda: version["current"])
+    cache.store("Is the bass good?", "Yes.")
+    assert cache.lookup("Is the bass good?") == "Yes."
+
+    version["current"] = "v2"
+    assert cache.lookup("Is the bass good?") is None
+    cache.store("Is the bass good?", "Not any more.")
+    assert cache.lookup("Is the bass good?") == "Not any more."
+
+def test_least_recently_used_entry_is_evicted_when_full(embeddings):
+    cache = SemanticAnswerCache(embeddings, max_entries=2)
+    cache.store("battery life", "long")
+    cache.store("bass quality", "deep")
+    cache.lookup("battery life")  # Now the most recently used
+    cache.store("case hinge", "fragile")
+
+    assert cache.lookup("battery life") == "long"
+    assert cache.lookup("bass quality") is None
+    assert cache.lookup("case hinge") == "fragile"
+
+def test_wrapped_chain_runs_once_and_serves_repeats_from_the_cache(embeddings):
+    calls = []
+    answer_chain = RunnablePassthrough.assign(answer=RunnableLambda(lambda x: calls.append(x) or "Deep bass."))
+    chain = SemanticAnswerCache(embeddings).wrap(answer_chain)
+
+    first = chain.invoke({"standalone_question": "Is the bass good?"})
+    second = chain.invoke({"standalone_question": "is the bass good"})
+    third = asyncio.run(chain.ainvoke({"standalone_question": "Is the bass good!"}))
+
+    assert len(calls) == 1
+    assert first["answer"] == second["answer"] == third["answer"] == "Deep bass."
+    assert second["context"] == []
+    assert all(EMBEDDING_KEY not in output for output in (first, second, third))
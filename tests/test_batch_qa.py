@@ -0,0 +1,156 @@
+import json
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from chain import rag_chain
+from chain.batch_qa import BatchQARunner, is_rate_limit_error, parse_batch_lines, read_completed, retry_after_seconds
+from chain.history_store import InMemoryHistoryStore
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("Too many requests")
+        self.response = type("Response", (), {"status_code": 429, "headers": {"retry-after": retry_after}})()
+
+class FakeRagChain:
+    """Answers from the session history like the real chain, failing with each question's scripted errors first."""
+    def __init__(self, failures=None):
+        self.failures = {q: list(errors) for q, errors in (failures or {}).items()}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, inputs, config):
+        question = inputs["input"]
+        with self._lock:
+            self.calls.append(question)
+            errors = self.failures.get(question)
+            if errors:
+                raise errors.pop(0)
+        history = rag_chain.get_session_history(config["configurable"]["session_id"])
+        earlier = [m.content for m in history.messages if isinstance(m, HumanMessage)]
+        answer = f"{question} (after {', '.join(earlier) or 'nothing'})"
+        history.add_messages([HumanMessage(content=question), AIMessage(content=answer)])
+        return {"answer": answer, "context": []}
+
+    def runnable(self):
+        return RunnableLambda(self)
+
+@pytest.fixture(autouse=True)
+def history_store(monkeypatch):
+    store = InMemoryHistoryStore(ttl_seconds=3600, max_sessions=100, max_messages=20, token_budget=0, max_stored=50)
+    monkeypatch.setattr(rag_chain, "_history_store", store)
+    return store
+
+def _runner(chain, **kwargs):
+    kwargs.setdefault("retry_base_seconds", 0.0)
+    return BatchQARunner(chain.runnable(), **kwargs)
+
+def _items(*rows):
+    return parse_batch_lines(json.dumps(row) for row in rows)
+
+def test_parse_batch_lines_reads_ids_questions_and_sessions():
+    items = parse_batch_lines(['{"id": 7, "question": "Bass?"}', "", '{"msg": "Battery?", "session": 1}'])
+    assert items == [
+        {"id": "7", "question": "Bass?", "session": None},
+        {"id": "3", "question": "Battery?", "session": "1"},
+    ]
+
+@pytest.mark.parametrize("lines, message", [
+    (["not json"], "is not valid JSON"),
+    (['{"id": 1}'], "has none of the keys"),
+    (['["question"]'], "has none of the keys"),
+    (['{"id": 1, "question": "a"}', '{"id": 1, "question": "b"}'], "repeats the id '1'"),
+])
+def test_parse_batch_lines_rejects_bad_lines(lines, message):
+    with pytest.raises(ValueError, match=message):
+        parse_batch_lines(lines, source="questions.jsonl")
+
+def test_read_completed_keeps_answered_ids_and_skips_truncated_lines(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    assert read_completed(str(path)) == {}
+    path.write_text(
+        '{"id": "1", "status": "ok", "answer": "Deep"}\n'
+        '{"id": "2", "status": "error", "error": "boom"}\n'
+        '{"id": "3", "status": "ok", "ans'
+    )
+    assert list(read_completed(str(path))) == ["1"]
+
+def test_conversations_are_answered_in_order_and_others_independently():
+    chain = FakeRagChain()
+    items = _items(
+        {"id": "a1", "question": "Bass?", "session": "a"},
+        {"id": "x", "question": "Price?"},
+        {"id": "a2", "question": "And the battery?", "session": "a"},
+        {"id": "y", "question": "Warranty?"},
+    )
+    results = {r["id"]: r for r in _runner(chain, chunk_size=2).run(items)}
+
+    assert all(r["status"] == "ok" and r["attempts"] == 1 for r in results.values())
+    assert results["a2"]["answer"] == "And the battery? (after Bass?)"
+    assert results["x"]["answer"] == "Price? (after nothing)"
+    assert results["y"]["answer"] == "Warranty? (after nothing)"
+    assert chain.calls.index("Bass?") < chain.calls.index("And the battery?")
+
+def test_resume_skips_answered_questions_and_replays_their_turns(tmp_path, history_store):
+    items = _items(
+        {"id": "a1", "question": "Bass?", "session": "a"},
+        {"id": "a2", "question": "And the battery?", "session": "a"},
+        {"id": "x", "question": "Price?"},
+    )
+    output = tmp_path / "answers.jsonl"
+    output.write_text(
+        json.dumps({"id": "a1", "session": "a", "question": "Bass?", "status": "ok", "answer": "Deep."}) + "\n"
+        + '{"id": "x", "status": "ok", "answ'  # Cut short by a crash
+    )
+    chain = FakeRagChain()
+    results = list(_runner(chain).run(items, read_completed(str(output))))
+
+    assert [r["id"] for r in results] == ["a2", "x"]
+    assert chain.calls == ["And the battery?", "Price?"]
+    assert results[0]["answer"] == "And the battery? (after Bass?)"
+    assert len(history_store) == 1  # The sessionless question left no history behind
+
+def test_rate_limited_questions_are_retried():
+    chain = FakeRagChain({"Bass?": [RateLimitError(), RateLimitError(retry_after="0")]})
+    results = {r["id"]: r for r in _runner(chain).run(_items({"id": 1, "question": "Bass?"}, {"id": 2, "question": "Fit?"}))}
+
+    assert results["1"]["status"] == "ok"
+    assert results["1"]["attempts"] == 3
+    assert results["2"]["attempts"] == 1
+    assert chain.calls.count("Bass?") == 3
+
+def test_rate_limited_questions_give_up_after_max_retries():
+    chain = FakeRagChain({"Bass?": [RateLimitError()] * 5})
+    [result] = _runner(chain, max_retries=2).run(_items({"id": 1, "question": "Bass?"}))
+
+    assert result["status"] == "error"
+    assert result["error"] == "RateLimitError: Too many requests"
+    assert result["attempts"] == 3
+
+def test_other_errors_are_reported_without_retrying():
+    chain = FakeRagChain({"Bass?": [KeyError("answer")]})
+    [result] = _runner(chain).run(_items({"id": 1, "question": "Bass?"}))
+
+    assert result["status"] == "error"
+    assert result["attempts"] == 1
+    assert chain.calls == ["Bass?"]
+
+def test_rate_limit_detection_and_retry_after():
+    assert is_rate_limit_error(RateLimitError())
+    assert not is_rate_limit_error(ValueError("429"))
+    assert retry_after_seconds(RateLimitError(retry_after="12")) == 12.0
+    assert retry_after_seconds(RateLimitError()) is None
+
+def test_stop_ends_the_run_before_the_next_chunk():
+    chain = FakeRagChain()
+    runner = _runner(chain, chunk_size=1)
+    results = runner.run(_items(*({"id": i, "question": f"Q{i}"} for i in range(5))))
+
+    assert next(results)["id"] == "0"
+    runner.stop()
+    assert list(results) == []
+    assert chain.calls == ["Q0"]
@@ -0,0 +1,87 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+from chain.context_assembler import ContextAssembler, estimate_text_tokens, split_sentences
+from chain.history_store import estimate_tokens
+from utils.product_summaries import SUMMARY_SOURCE
+
+LONG_REVIEW = (
+    "Delivery was quick and the box was fine. The bass is deep and punchy. "
+    "The app keeps crashing on my phone. Battery lasts two full days. "
+    "The case feels cheap. Overall the bass makes it worth buying."
+)
+
+def _review(text, **metadata):
+    return Document(page_content=text, metadata={"product_name": "Rockerz", **metadata})
+
+def _history(turns, size=200):
+    messages = []
+    for i in range(turns):
+        messages += [HumanMessage(content=f"q{i} " + "x" * size), AIMessage(content=f"a{i} " + "y" * size)]
+    return messages
+
+def _tokens(result):
+    context = sum(estimate_text_tokens(d.page_content) for d in result["context"])
+    history = sum(estimate_tokens(m) for m in result["chat_history"])
+    return context, history
+
+def test_split_sentences_handles_ellipses_and_numbered_lists():
+    assert split_sentences("Good sound... bad mic. 1- bass is deep 2- fits well") == [
+        "Good sound", "bad mic", "1- bass is deep", "2- fits well",
+    ]
+
+def test_near_duplicates_are_dropped_keeping_the_first():
+    documents = [
+        _review("The bass is deep and punchy", rank=1),
+        _review("the bass is deep and punchy!", rank=2),
+        _review("Battery lasts two days", rank=3),
+    ]
+    kept = ContextAssembler().deduplicate(documents)
+    assert [d.metadata["rank"] for d in kept] == [1, 3]
+
+def test_long_reviews_keep_their_most_relevant_sentences_in_order():
+    assembler = ContextAssembler(max_sentences=2, max_review_tokens=10)
+    short = _review("Bass is fine.")
+    summary = _review(LONG_REVIEW, source=SUMMARY_SOURCE)
+    extracted = assembler.extract([_review(LONG_REVIEW), short, summary], "How is the bass?")
+
+    assert extracted[0].page_content == "The bass is deep and punchy ... Overall the bass makes it worth buying"
+    assert extracted[1] is short
+    assert extracted[2] is summary
+
+def test_reviews_sharing_no_words_keep_their_opening_sentences():
+    extracted = ContextAssembler(max_sentences=2, max_review_tokens=10).extract([_review(LONG_REVIEW)], "Is it waterproof?")
+    assert extracted[0].page_content == "Delivery was quick and the box was fine ... The bass is deep and punchy"
+
+@pytest.mark.parametrize("turns", [0, 1, 6])
+def test_context_and_history_fit_the_budget(turns):
+    assembler = ContextAssembler(token_budget=300, history_share=0.35, max_review_tokens=40)
+    documents = [_review(f"Review {i} says the bass is deep and the fit is snug for long runs " * 3) for i in range(20)]
+    result = assembler.assemble({"input": "How is the bass?", "context": documents, "chat_history": _history(turns)})
+
+    context, history = _tokens(result)
+    assert context + history <= 300
+    assert result["context"]
+    if turns:
+        assert result["chat_history"][-1].content.startswith(f"a{turns - 1}")  # Newest turn survives
+        assert isinstance(result["chat_history"][0], HumanMessage)
+
+def test_history_keeps_its_share_and_takes_unused_context():
+    assembler = ContextAssembler(token_budget=400, history_share=0.5)
+    history = _history(6)  # ~110 tokens per turn
+
+    crowded = assembler.assemble({"input": "bass", "context": [_review(f"Review {i} " * 30) for i in range(20)],
+                                  "chat_history": history})
+    crowded_context, crowded_history = _tokens(crowded)
+    assert crowded_context > 0
+    assert crowded_history >= 110  # At least one full turn from its half of the budget
+
+    sparse = assembler.assemble({"input": "bass", "context": [_review("Short review")], "chat_history": history})
+    _, sparse_history = _tokens(sparse)
+    assert sparse_history > crowded_history  # Unused context budget goes to older turns
+    assert sparse["context"][0].page_content == "Short review"
+
+def test_other_inputs_pass_through():
+    result = ContextAssembler().assemble({"input": "q", "standalone_question": "sq", "session_id": "s"})
+    assert result == {"input": "q", "standalone_question": "sq", "session_id": "s", "context": [], "chat_history": []}
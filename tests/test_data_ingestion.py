@@ -0,0 +1,118 @@
+import csv
+import json
+
+import pytest
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from config.config import AppConfig
+from utils.data_converter import compute_content_hash
+from utils.data_ingestion import DataIngestor
+from utils.local_vector_store import LocalVectorStore
+from utils.onnx_embeddings import embedding_model_id
+
+ROWS = [
+    ("P1", "Rockerz 235v2", "bass is very high"),
+    ("P1", "Rockerz 235v2", "battery lasts all day"),
+    ("P2", "Airdopes 131", "fits small ears well"),
+    ("P2", "Airdopes 131", "fits small ears well"),  # Exact duplicate, stored once
+]
+
+class CountingEmbeddings:
+    """Wraps an Embeddings and counts the documents it embeds."""
+    def __init__(self, inner):
+        self.inner = inner
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.inner.embed_query(text)
+
+class RemoteStore(InMemoryVectorStore):
+    """A store without `add_embeddings`, ingested like Astra DB; `clear` mirrors AstraDBVectorStore."""
+    def clear(self):
+        self.store.clear()
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["product_id", "product_title", "rating", "summary", "review"])
+        writer.writerows((product_id, title, 5, "ok", review) for product_id, title, review in rows)
+
+def _ids(rows):
+    return {compute_content_hash(product_id, review) for product_id, _, review in rows}
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.setattr(AppConfig, "DATA_FILE_PATH", str(tmp_path / "reviews.csv"))
+    monkeypatch.setattr(AppConfig, "INGEST_MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(AppConfig, "LOCAL_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(AppConfig, "LEXICAL_INDEX_DIR", str(tmp_path / "lexical"))
+    monkeypatch.setattr(AppConfig, "DATA_CHUNK_SIZE", 2)
+    monkeypatch.setattr(AppConfig, "EMBEDDING_BATCH_SIZE", 2)
+    monkeypatch.setattr(AppConfig, "EMBEDDING_NUM_WORKERS", 1)
+    return AppConfig
+
+def _ingestor(store) -> DataIngestor:
+    ingestor = DataIngestor.__new__(DataIngestor)  # Skips building the real embedding model
+    ingestor.vstore = store
+    return ingestor
+
+def _manifest_ids(config):
+    with open(config.INGEST_MANIFEST_PATH, encoding="utf-8") as f:
+        return set(json.load(f)["ids"])
+
+def test_first_run_stores_every_unique_row(config, embeddings):
+    _write_csv(config.DATA_FILE_PATH, ROWS)
+    store = LocalVectorStore(embedding=embeddings)
+    _ingestor(store).ingest_data()
+
+    assert set(store.ids) == _ids(ROWS)
+    assert _manifest_ids(config) == _ids(ROWS)
+    assert len(LocalVectorStore.load(config.LOCAL_INDEX_DIR, embeddings, model_name=embedding_model_id())) == 3
+
+def test_rerun_embeds_only_new_rows_and_deletes_removed_ones(config, embeddings):
+    _write_csv(config.DATA_FILE_PATH, ROWS)
+    counting = CountingEmbeddings(embeddings)
+    store = LocalVectorStore(embedding=counting)
+    ingestor = _ingestor(store)
+    ingestor.ingest_data()
+    counting.embedded = 0
+
+    ingestor.ingest_data()
+    assert counting.embedded == 0
+
+    changed = [ROWS[0], ("P1", "Rockerz 235v2", "battery lasts two days"), ROWS[2]]
+    _write_csv(config.DATA_FILE_PATH, changed)
+    ingestor.ingest_data()
+
+    assert counting.embedded == 1
+    assert set(store.ids) == _ids(changed)
+    assert _manifest_ids(config) == _ids(changed)
+
+def test_remote_store_deletes_through_the_manifest(config, embeddings):
+    _write_csv(config.DATA_FILE_PATH, ROWS)
+    store = RemoteStore(embedding=embeddings)
+    ingestor = _ingestor(store)
+    ingestor.ingest_data()
+    assert set(store.store) == _ids(ROWS)
+
+    _write_csv(config.DATA_FILE_PATH, ROWS[1:])
+    ingestor.ingest_data()
+
+    assert set(store.store) == _ids(ROWS[1:])
+    assert _manifest_ids(config) == _ids(ROWS[1:])
+
+def test_full_rebuild_drops_rows_the_manifest_never_saw(config, embeddings):
+    _write_csv(config.DATA_FILE_PATH, ROWS)
+    store = RemoteStore(embedding=embeddings)
+    store.add_texts(["stored under a random id"], ids=["legacy-uuid"])
+    ingestor = _ingestor(store)
+
+    ingestor.ingest_data()
+    assert "legacy-uuid" in store.store  # Invisible to an incremental run
+
+    ingestor.ingest_data(full_rebuild=True)
+    assert set(store.store) == _ids(ROWS)
@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from chain import history_store
+from chain.history_store import (
+    BoundedChatMessageHistory,
+    InMemoryHistoryStore,
+    SQLiteHistoryStore,
+    estimate_tokens,
+    trim_messages_to_budget,
+)
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(history_store, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+def _turns(n, size=40):
+    messages = []
+    for i in range(n):
+        messages += [HumanMessage(content=f"q{i}".ljust(size, ".")), AIMessage(content=f"a{i}".ljust(size, "."))]
+    return messages
+
+def _texts(messages):
+    return [m.content.rstrip(".") for m in messages]
+
+def test_window_keeps_the_latest_messages_and_starts_on_a_question():
+    messages = _turns(3)
+    assert _texts(trim_messages_to_budget(messages, 4, 0)) == ["q1", "a1", "q2", "a2"]
+    # An odd window would open on an AI reply, which is dropped
+    assert _texts(trim_messages_to_budget(messages, 3, 0)) == ["q2", "a2"]
+    assert trim_messages_to_budget(messages, 0, 0) == messages
+
+def test_token_budget_keeps_only_what_fits():
+    messages = _turns(3)
+    per_message = estimate_tokens(messages[0])
+    assert _texts(trim_messages_to_budget(messages, 0, 4 * per_message)) == ["q1", "a1", "q2", "a2"]
+    assert _texts(trim_messages_to_budget(messages, 0, 3 * per_message)) == ["q2", "a2"]
+    assert trim_messages_to_budget(messages, 0, per_message - 1) == []
+
+def test_bounded_history_caps_storage_and_exposes_the_window():
+    history = BoundedChatMessageHistory(max_messages=2, token_budget=0, max_stored=4)
+    history.add_messages(_turns(3))
+    assert _texts(history._messages) == ["q1", "a1", "q2", "a2"]
+    assert _texts(history.messages) == ["q2", "a2"]
+    history.clear()
+    assert history.messages == []
+
+def _memory_store(**overrides):
+    kwargs = dict(ttl_seconds=60, max_sessions=2, max_messages=10, token_budget=0, max_stored=20)
+    kwargs.update(overrides)
+    return InMemoryHistoryStore(**kwargs)
+
+def test_in_memory_store_evicts_the_least_recently_used_session(clock):
+    store = _memory_store()
+    store.get("a").add_messages(_turns(1))
+    store.get("b")
+    store.get("a")  # "b" is now the least recently used
+    store.get("c")
+
+    assert len(store) == 2
+    assert set(store._sessions) == {"a", "c"}
+    assert _texts(store.get("a").messages) == ["q0", "a0"]
+
+def test_in_memory_store_expires_idle_sessions(clock):
+    store = _memory_store()
+    store.get("a").add_messages(_turns(1))
+    clock.now += 30
+    assert _texts(store.get("a").messages) == ["q0", "a0"]  # Access refreshes the TTL
+    clock.now += 61
+    assert store.get("a").messages == []
+
+@pytest.fixture
+def sqlite_store(tmp_path, clock):
+    return SQLiteHistoryStore(
+        str(tmp_path / "history" / "chat.db"),
+        ttl_seconds=60, max_sessions=2, max_messages=4, token_budget=0, max_stored=6, purge_interval=0,
+    )
+
+def test_sqlite_store_round_trips_and_caps_messages(sqlite_store):
+    history = sqlite_store.get("a")
+    history.add_messages(_turns(4))
+    assert _texts(history.messages) == ["q2", "a2", "q3", "a3"]
+
+    with sqlite_store._connect() as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM messages WHERE session_id = 'a'").fetchone()[0]
+    assert stored == 6
+
+    history.clear()
+    assert history.messages == []
+
+def test_sqlite_store_expires_idle_sessions(sqlite_store, clock):
+    sqlite_store.get("a").add_messages(_turns(1))
+    clock.now += 61
+    assert sqlite_store.get("a").messages == []
+
+def test_sqlite_store_purges_least_recently_used_sessions(sqlite_store, clock):
+    for session_id in ("a", "b", "c"):
+        sqlite_store.get(session_id).add_messages(_turns(1))
+        clock.now += 1
+
+    with sqlite_store._connect() as conn:
+        sessions = {row[0] for row in conn.execute("SELECT session_id FROM sessions")}
+    assert sessions == {"b", "c"}
+    assert sqlite_store.read_messages("a") == []
+    assert _texts(sqlite_store.read_messages("b")) == ["q0", "a0"]
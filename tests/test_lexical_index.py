@@ -0,0 +1,86 @@
+import math
+import os
+from collections import Counter
+
+import pytest
+from langchain_core.documents import Document
+
+from utils.lexical_index import BM25Index, tokenize_for_search
+
+REVIEWS = [
+    ("r1", "Rockerz", "Bass is very deep and the bass never distorts"),
+    ("r2", "Rockerz", "Battery lasts two days on a single charge"),
+    ("r3", "Airdopes", "Fits small ears and the bass is punchy"),
+    ("r4", "Airdopes", "Case hinge broke after a week"),
+    ("r5", "Basshead", "Battery is weak but the sound is clear"),
+]
+
+def _documents():
+    return [(doc_id, Document(page_content=text, metadata={"product_name": name, "rating": i % 3}))
+            for i, (doc_id, name, text) in enumerate(REVIEWS)]
+
+def _id(doc):
+    return next(doc_id for doc_id, _, text in REVIEWS if text == doc.page_content)
+
+def _reference_scores(query, k1=1.2, b=0.75):
+    """Textbook Okapi BM25 over REVIEWS, for checking the precomputed impacts."""
+    docs = {doc_id: tokenize_for_search(text) for doc_id, _, text in REVIEWS}
+    n = len(docs)
+    avg_length = sum(len(tokens) for tokens in docs.values()) / n
+    scores = {}
+    for doc_id, tokens in docs.items():
+        counts, score = Counter(tokens), 0.0
+        for term in set(tokenize_for_search(query)):
+            if counts[term]:
+                df = sum(term in other for other in docs.values())
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                score += idf * counts[term] * (k1 + 1) / (counts[term] + k1 * (1 - b + b * len(tokens) / avg_length))
+        if score:
+            scores[doc_id] = score
+    return scores
+
+def test_tokenizer_lowercases_and_drops_stop_words():
+    assert tokenize_for_search("The Rockerz 235v2 is GREAT!") == ["rockerz", "235v2", "great"]
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 10_000])
+def test_scores_match_reference_bm25_for_any_chunk_size(tmp_path, chunk_size):
+    index = BM25Index.build(_documents(), str(tmp_path), chunk_size=chunk_size)
+    for query in ("bass", "battery sound", "deep bass battery hinge"):
+        results = index.search(query, k=10)
+        expected = _reference_scores(query)
+        got = {_id(doc): score for doc, score in results}
+        assert got.keys() == expected.keys()
+        for doc_id, score in expected.items():
+            assert got[doc_id] == pytest.approx(score, rel=1e-5)
+        assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+def test_build_leaves_no_spool_files_and_reloads(tmp_path):
+    built = BM25Index.build(_documents(), str(tmp_path), chunk_size=2)
+    loaded = BM25Index.load(str(tmp_path))
+
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".spool-") or ".tmp-" in name]
+    assert loaded.ids == built.ids
+    assert loaded.index_version == built.index_version
+    assert loaded.search("battery", k=3) == built.search("battery", k=3)
+    assert BM25Index.is_current(str(tmp_path))
+
+def test_unknown_terms_return_nothing(tmp_path):
+    index = BM25Index.build(_documents(), str(tmp_path))
+
+    assert index.search("zzz qqq", k=5) == []
+    assert index.search("bass", k=0) == []
+
+@pytest.mark.parametrize("filter, expected", [
+    ({"product_name": "Airdopes"}, {"r3"}),
+    ({"product_name": {"$in": ["Rockerz", "Basshead"]}}, {"r1", "r2", "r5"}),
+    ({"product_name": {"$eq": "Nobody"}}, set()),
+    ({"rating": 2}, {"r3"}),  # A field without stored codes is checked per document
+])
+def test_filter_is_applied_before_top_k(tmp_path, filter, expected):
+    index = BM25Index.build(_documents(), str(tmp_path))
+    results = index.search("bass battery", k=10, filter=filter)
+
+    assert {_id(doc) for doc, _ in results} == expected
+    # Top-k over the filtered rows, not a filtered top-k over all rows
+    if expected:
+        assert len(index.search("bass battery", k=1, filter=filter)) == 1
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from utils.local_vector_store import LocalVectorStore
+
+def _store(embeddings, **kwargs) -> LocalVectorStore:
+    store = LocalVectorStore(embedding=embeddings, **kwargs)
+    store.add_texts(
+        ["great bass and deep sound", "battery lasts two days", "fits small ears well", "bass is weak"],
+        metadatas=[
+            {"product_name": "Rockerz", "rating": 5},
+            {"product_name": "Rockerz", "rating": 4},
+            {"product_name": "Airdopes", "rating": 4},
+            {"product_name": "Airdopes", "rating": 2},
+        ],
+        ids=["r1", "r2", "a1", "a2"],
+    )
+    return store
+
+def test_add_with_existing_id_replaces_the_row(embeddings):
+    store = _store(embeddings)
+    store.add_texts(["battery dies within an hour"], metadatas=[{"product_name": "Rockerz"}], ids=["r2"])
+
+    assert len(store) == 4
+    assert sorted(store.ids) == ["a1", "a2", "r1", "r2"]
+    assert store.get_by_ids(["r2"])[0].page_content == "battery dies within an hour"
+    assert store.similarity_search("battery dies within an hour", k=1)[0].page_content == "battery dies within an hour"
+
+def test_delete_ignores_unknown_ids(embeddings):
+    store = _store(embeddings)
+
+    assert store.delete(ids=["r1", "missing"]) is True
+    assert store.delete(ids=["missing"]) is False
+    assert sorted(store.ids) == ["a1", "a2", "r2"]
+    assert all(doc.page_content != "great bass and deep sound" for doc in store.similarity_search("bass", k=4))
+
+@pytest.mark.parametrize("condition, expected", [
+    ("Airdopes", {"fits small ears well", "bass is weak"}),
+    ({"$eq": "Rockerz"}, {"great bass and deep sound", "battery lasts two days"}),
+    ({"$in": ["Airdopes", "Unknown"]}, {"fits small ears well", "bass is weak"}),
+    ({"$in": ["Unknown"]}, set()),
+])
+def test_filter_restricts_search_to_matching_rows(embeddings, condition, expected):
+    store = _store(embeddings)
+    docs = store.similarity_search("bass", k=10, filter={"product_name": condition})
+
+    assert {doc.page_content for doc in docs} == expected
+
+def test_filter_conditions_on_several_fields_are_combined(embeddings):
+    store = _store(embeddings)
+    docs = store.similarity_search("bass", k=10, filter={"product_name": "Airdopes", "rating": {"$in": [4, 5]}})
+
+    assert [doc.page_content for doc in docs] == ["fits small ears well"]
+
+def test_unsupported_filter_operator_is_rejected(embeddings):
+    with pytest.raises(ValueError):
+        _store(embeddings).similarity_search("bass", filter={"rating": {"$gt": 3}})
+
+def test_batched_appends_match_a_single_add(embeddings):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(100, 16))
+    texts = [f"doc {i}" for i in range(100)]
+    once = LocalVectorStore(embedding=embeddings)
+    once.add_embeddings(texts, vectors, ids=texts)
+    batched = LocalVectorStore(embedding=embeddings)
+    for start in range(0, 100, 7):
+        batched.add_embeddings(texts[start:start + 7], vectors[start:start + 7], ids=texts[start:start + 7])
+
+    query = rng.normal(size=16).tolist()
+    assert batched.ids == once.ids
+    assert batched.similarity_search_by_vector(query, k=10) == once.similarity_search_by_vector(query, k=10)
+
+def test_ivf_search_keeps_most_of_the_exact_top_k():
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(40, 32))
+    vectors = centers[rng.integers(0, 40, size=4000)] + 0.3 * rng.normal(size=(4000, 32))
+    texts = [str(i) for i in range(len(vectors))]
+    exact = LocalVectorStore(embedding=None, index_type="exact")
+    ivf = LocalVectorStore(embedding=None, index_type="ivf", nlist=40, nprobe=8)
+    for store in (exact, ivf):
+        store.add_embeddings(texts, vectors, ids=texts)
+
+    hits = 0
+    queries = centers[rng.integers(0, 40, size=50)] + 0.3 * rng.normal(size=(50, 32))
+    for query in queries:
+        expected = {doc.page_content for doc in exact.similarity_search_by_vector(query.tolist(), k=10)}
+        hits += len(expected & {doc.page_content for doc in ivf.similarity_search_by_vector(query.tolist(), k=10)})
+    assert hits / (10 * len(queries)) >= 0.9
+
+def test_saved_index_loads_with_the_same_results(embeddings, tmp_path):
+    store = _store(embeddings)
+    store.save(str(tmp_path), model_name="hashing")
+    loaded = LocalVectorStore.load(str(tmp_path), embedding=embeddings, model_name="hashing")
+
+    assert loaded.ids == store.ids
+    assert loaded.index_version == store.index_version
+    assert loaded.similarity_search("bass", k=4) == store.similarity_search("bass", k=4)
+    assert LocalVectorStore.load(str(tmp_path), embedding=embeddings, model_name="other-model") is None
+
+def test_saving_again_leaves_an_open_index_readable(embeddings, tmp_path):
+    store = _store(embeddings)
+    store.save(str(tmp_path), model_name="hashing")
+    reader = LocalVectorStore.load(str(tmp_path), embedding=embeddings, model_name="hashing")
+    for i in range(4):
+        store.add_texts([f"new review {i}"], ids=[f"n{i}"])
+        store.save(str(tmp_path), model_name="hashing")
+
+    assert len(reader.similarity_search("bass", k=4)) == 4
+    assert len(LocalVectorStore.load(str(tmp_path), embedding=embeddings, model_name="hashing")) == 8
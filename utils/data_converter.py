@@ -1,7 +1,8 @@
 # In utils/data_converter.py
 
+import hashlib
 import pandas as pd
-from typing import List
+from typing import Iterator, List
 from langchain_core.documents import Document
 from utils.custom_exception import CustomException
 from utils.logger import setup_logger
@@ -9,6 +10,22 @@ from utils.logger import setup_logger
 # Initialize a logger for this module
 logger = setup_logger(__name__)
 
+# Only these columns are loaded, saving memory
+REQUIRED_COLUMNS = ["product_id", "product_title", "review"]
+
+# Start of the ValueError pandas raises when a `usecols` column is not in the header
+USECOLS_MISMATCH = "Usecols do not match columns"
+
+def compute_content_hash(product_id: str, review: str) -> str:
+    """
+    Returns a stable content hash for a review row.
+
+    The hash doubles as the document id in the vector store, so re-ingesting an
+    unchanged row is a no-op and an edited review gets a new id.
+    """
+    payload = f"{product_id}\x1f{review}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:32]
+
 class DataConverter:
     """
     A class to read a CSV file and convert its rows into LangChain Document objects.
@@ -23,11 +40,60 @@ class DataConverter:
         self.file_path = file_path
         logger.info(f"DataConverter initialized for file: {self.file_path}")
 
+    @staticmethod
+    def _row_to_document(row: dict) -> Document:
+        return Document(
+            page_content=row['review'],
+            metadata={
+                "product_name": row["product_title"],
+                "product_id": row["product_id"],
+                "content_hash": compute_content_hash(row["product_id"], row["review"])
+            }
+        )
+
+    def iter_documents(self, chunksize: int = 10_000) -> Iterator[Document]:
+        """
+        Lazily yields Documents while reading the CSV in chunks of `chunksize` rows.
+
+        Only one chunk is held in memory at a time, so peak memory stays bounded
+        regardless of how large the review export is.
+
+        Args:
+            chunksize (int): Number of CSV rows parsed per chunk.
+
+        Yields:
+            Document: One LangChain Document per non-empty review.
+
+        Raises:
+            CustomException: If the file is not found, required columns are missing,
+                             a row cannot be parsed, or another error occurs during conversion.
+        """
+        try:
+            logger.info(f"Streaming CSV from {self.file_path} in chunks of {chunksize} rows...")
+            reader = pd.read_csv(self.file_path, usecols=REQUIRED_COLUMNS, chunksize=chunksize)
+            for chunk in reader:
+                chunk = chunk.dropna(subset=["review"]) # Remove rows where review is missing
+                # Use the much faster to_dict('records') instead of iterrows()
+                for row in chunk.to_dict('records'):
+                    yield self._row_to_document(row)
+
+        except FileNotFoundError as e:
+            raise CustomException(f"CSV file not found at path: {self.file_path}", e)
+        except ValueError as e:
+            # pandas reports missing 'usecols' columns as a ValueError, as it does malformed rows
+            if str(e).startswith(USECOLS_MISMATCH):
+                raise CustomException(f"Missing a required column in the CSV file: {e}", e)
+            raise CustomException(f"Could not parse the CSV file at path: {self.file_path}", e)
+        except Exception as e:
+            raise CustomException("An unexpected error occurred during data conversion.", e)
+
     def to_documents(self) -> List[Document]:
         """
         Reads the CSV, extracts relevant columns, and converts each row
         into a LangChain Document object.
 
+        Prefer `iter_documents` for large files; this materializes the full list.
+
         Returns:
             List[Document]: A list of LangChain Document objects.
 
@@ -35,28 +101,6 @@ class DataConverter:
             CustomException: If the file is not found, required columns are missing,
                              or another error occurs during conversion.
         """
-        try:
-            logger.info(f"Reading CSV from {self.file_path}...")
-            # Use 'usecols' to only load the columns we need, saving memory
-            df = pd.read_csv(self.file_path, usecols=["product_title", "review"])
-            df.dropna(subset=["review"], inplace=True) # Remove rows where review is missing
-            logger.info(f"Successfully loaded {len(df)} rows from CSV.")
-
-            # Use the much faster df.to_dict('records') instead of iterrows()
-            docs = [
-                Document(
-                    page_content=row['review'],
-                    metadata={"product_name": row["product_title"]}
-                )
-                for row in df.to_dict('records')
-            ]
-
-            logger.info(f"Successfully converted {len(docs)} rows to Document objects.")
-            return docs
-
-        except FileNotFoundError as e:
-            raise CustomException(f"CSV file not found at path: {self.file_path}", e)
-        except KeyError as e:
-            raise CustomException(f"Missing a required column in the CSV file: {e}", e)
-        except Exception as e:
-            raise CustomException("An unexpected error occurred during data conversion.", e)
\ No newline at end of file
+        docs = list(self.iter_documents())
+        logger.info(f"Successfully converted {len(docs)} rows to Document objects.")
+        return docs
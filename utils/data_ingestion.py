@@ -1,12 +1,24 @@
 # In utils/data_ingestion.py
 
-from langchain_astradb import AstraDBVectorStore
-# --- NEW, STABLE IMPORT ---
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import argparse
+import os
+import sys
+from typing import Iterator, Set, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 from utils.data_converter import DataConverter
-from config.config import AppConfig
+from utils.embedding_pipeline import EmbeddingPipeline, set_intra_op_threads
+from utils.embedding_store import EmbeddingStore
+from utils.ingest_manifest import IngestManifest
+from utils.lexical_index import BM25Index
+from utils.local_vector_store import LocalVectorStore
+from config.config import AppConfig, validate_secrets
 from utils.custom_exception import CustomException
 from utils.logger import setup_logger
+from utils.metrics import InstrumentedEmbeddings
+from utils.onnx_embeddings import OnnxEmbeddings, embedding_model_id
+from utils.query_batcher import BatchingEmbeddings
 
 logger = setup_logger(__name__)
 
@@ -14,15 +26,29 @@ class DataIngestor:
     def __init__(self):
         self.vstore = self._initialize_vector_store()
 
-    def _initialize_vector_store(self) -> AstraDBVectorStore:
+    def _initialize_vector_store(self) -> VectorStore:
         try:
-            logger.info("Initializing vector store with HuggingFaceEmbeddings...")
+            logger.info(f"Initializing vector store with the '{AppConfig.EMBEDDING_BACKEND}' embedding backend...")
+            embedding_model = self._create_embedding_model()
+            # Coalesce concurrent query embeddings into batched forward passes
+            if AppConfig.QUERY_BATCHING_ENABLED:
+                embedding_model = BatchingEmbeddings(
+                    embedding_model,
+                    max_batch_size=AppConfig.QUERY_BATCH_MAX_SIZE,
+                    max_wait_ms=AppConfig.QUERY_BATCH_WAIT_MS,
+                    cache_size=AppConfig.QUERY_EMBED_CACHE_SIZE,
+                )
+            # Time query embeddings (including any batching wait), which happen inside the vector store
+            embedding_model = InstrumentedEmbeddings(embedding_model)
 
-            # --- USING THE STABLE EMBEDDING CLASS ---
-            # This will download the model on its first run
-            embedding_model = HuggingFaceEmbeddings(
-                model_name=AppConfig.EMBEDDING_MODEL
-            )
+            backend = AppConfig.VECTOR_STORE_BACKEND
+            if backend == "local":
+                return self._initialize_local_store(embedding_model)
+            if backend != "astra":
+                raise ValueError(f"Unknown VECTOR_STORE_BACKEND '{backend}'. Use 'astra' or 'local'.")
+
+            validate_secrets("ASTRA_DB_API_ENDPOINT", "ASTRA_DB_APPLICATION_TOKEN", "ASTRA_DB_KEYSPACE")
+            from langchain_astradb import AstraDBVectorStore
 
             vector_store = AstraDBVectorStore(
                 embedding=embedding_model,
@@ -34,22 +60,196 @@ class DataIngestor:
             logger.info("Successfully connected to Astra DB Vector Store.")
             return vector_store
         except Exception as e:
-            raise CustomException("Failed to initialize Astra DB Vector Store.", e)
+            raise CustomException("Failed to initialize the vector store.", e)
+
+    def _create_embedding_model(self) -> Embeddings:
+        """Builds the configured embedding backend: "torch" (sentence-transformers) or "onnx" (ONNX Runtime)."""
+        backend = AppConfig.EMBEDDING_BACKEND
+        if backend == "onnx":
+            # Runs the exported, int8-quantized model; PyTorch is never imported
+            return OnnxEmbeddings.from_config()
+        if backend != "torch":
+            raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Use 'torch' or 'onnx'.")
+
+        # Heavy imports (torch, sentence-transformers) are deferred until the store is built
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        # --- USING THE STABLE EMBEDDING CLASS ---
+        # This will download the model on its first run
+        set_intra_op_threads(AppConfig.EMBEDDING_INTRA_OP_THREADS)
+        return HuggingFaceEmbeddings(
+            model_name=AppConfig.EMBEDDING_MODEL,
+            cache_folder=AppConfig.EMBEDDING_CACHE_DIR,
+            encode_kwargs={"batch_size": AppConfig.EMBEDDING_BATCH_SIZE}
+        )
+
+    def _initialize_local_store(self, embedding_model: Embeddings) -> LocalVectorStore:
+        index_kwargs = dict(
+            index_type=AppConfig.LOCAL_INDEX_TYPE,
+            nlist=AppConfig.LOCAL_IVF_NLIST,
+            nprobe=AppConfig.LOCAL_IVF_NPROBE
+        )
+        # Reuse the persisted artifact when it was built with the same model and backend
+        vector_store = LocalVectorStore.load(
+            AppConfig.LOCAL_INDEX_DIR,
+            embedding=embedding_model,
+            model_name=embedding_model_id(),
+            **index_kwargs
+        )
+        if vector_store is None:
+            vector_store = LocalVectorStore(embedding=embedding_model, **index_kwargs)
+        logger.info(
+            f"Initialized local in-process vector store with {len(vector_store)} documents "
+            f"(index_type={AppConfig.LOCAL_INDEX_TYPE})."
+        )
+        return vector_store
+
+    def ensure_local_index(self) -> None:
+        """
+        Builds the local artifact if there is none yet, once across processes.
 
-    def ingest_data(self):
+        On a fresh deploy every web worker starts with an empty store. The first one to
+        take the build lock ingests; the others wait, then load the artifact it saved.
+        """
+        if len(self.vstore):
+            return
+        with EmbeddingStore(AppConfig.LOCAL_INDEX_DIR).build_lock():
+            self.vstore = self._initialize_local_store(self.vstore.embeddings)
+            if len(self.vstore) == 0:
+                self.ingest_data()
+
+    def _stored_ids(self, manifest: IngestManifest) -> Set[str]:
+        # The local index knows exactly what it holds; remote stores rely on the manifest
+        if isinstance(self.vstore, LocalVectorStore):
+            return set(self.vstore.ids)
+        return set(manifest.ids)
+
+    def _clear_store(self, manifest: IngestManifest) -> None:
+        """Deletes every document in the store, including rows no manifest knows about."""
+        if isinstance(self.vstore, LocalVectorStore):
+            self.vstore.delete(ids=list(self.vstore.ids))
+        else:
+            self.vstore.clear()
+        manifest.clear()
+        manifest.save()
+        logger.info("Cleared the vector store for a full rebuild.")
+
+    def ingest_data(self, full_rebuild: bool = False):
+        """
+        Incrementally syncs the vector store with the CSV.
+
+        Each row is identified by a content hash of (product_id, review). Only rows
+        whose hash is not yet stored are embedded and upserted, and rows that no
+        longer appear in the CSV are deleted, so re-running ingestion is idempotent.
+        The CSV is streamed in chunks straight into the embedding pipeline, so only
+        the set of hashes (not the documents) is held in memory.
+
+        Args:
+            full_rebuild (bool): Empty the store first and re-embed every row. Needed
+                once for a collection filled before rows were keyed by content hash,
+                whose random-UUID rows the manifest cannot see (and so never deletes).
+        """
         try:
             logger.info("Starting data ingestion process...")
             converter = DataConverter(file_path=AppConfig.DATA_FILE_PATH)
-            documents = converter.to_documents()
+            manifest = IngestManifest(AppConfig.INGEST_MANIFEST_PATH)
+            if full_rebuild:
+                self._clear_store(manifest)
+            elif not isinstance(self.vstore, LocalVectorStore) and not os.path.exists(manifest.path):
+                logger.warning(
+                    f"No ingestion manifest at {manifest.path}. If the collection already holds rows from "
+                    "an earlier ingestion, run `python -m utils.data_ingestion --full-rebuild` once instead, "
+                    "or every review will be stored twice."
+                )
+            stored_ids = self._stored_ids(manifest)
+            seen_ids: Set[str] = set()
+
+            def new_documents() -> Iterator[Tuple[str, Document]]:
+                for doc in converter.iter_documents(chunksize=AppConfig.DATA_CHUNK_SIZE):
+                    doc_id = doc.metadata["content_hash"]
+                    if doc_id in seen_ids:
+                        continue  # Exact duplicate row
+                    seen_ids.add(doc_id)
+                    if doc_id not in stored_ids:
+                        yield doc_id, doc
 
-            if not documents:
-                logger.warning("No documents found to ingest. Aborting.")
+            pipeline = EmbeddingPipeline(
+                self.vstore,
+                batch_size=AppConfig.EMBEDDING_BATCH_SIZE,
+                num_workers=AppConfig.EMBEDDING_NUM_WORKERS
+            )
+            try:
+                stats = pipeline.run(new_documents(), on_batch_written=manifest.add)
+            finally:
+                # Persist progress even if a batch failed, so a re-run resumes where this one stopped
+                manifest.save()
+
+            if not seen_ids:
+                logger.warning("No documents found in the CSV; leaving the vector store untouched.")
                 return
 
-            logger.info(f"Ingesting {len(documents)} documents...")
-            self.vstore.add_documents(documents)
+            removed_ids = [doc_id for doc_id in stored_ids if doc_id not in seen_ids]
+            if removed_ids:
+                self.vstore.delete(ids=removed_ids)
+                manifest.discard(removed_ids)
+                manifest.save()
+
+            logger.info(
+                f"Ingestion summary: {stats.documents} new, {len(removed_ids)} removed, "
+                f"{len(seen_ids) - stats.documents} unchanged documents."
+            )
+
+            changed = bool(stats.documents or removed_ids)
+            if isinstance(self.vstore, LocalVectorStore) and changed:
+                self.vstore.save(
+                    AppConfig.LOCAL_INDEX_DIR,
+                    model_name=embedding_model_id(),
+                    dtype=AppConfig.LOCAL_INDEX_DTYPE
+                )
+            if changed or not BM25Index.is_current(AppConfig.LEXICAL_INDEX_DIR):
+                self.build_lexical_index()
             logger.info("Data ingestion completed successfully.")
+        except CustomException:
+            raise
         except Exception as e:
             raise CustomException("An error occurred during data ingestion.", e)
 
+    def build_lexical_index(self) -> BM25Index:
+        """
+        Rebuilds the BM25 index used by hybrid retrieval from the CSV and saves it.
+
+        Unlike embedding, tokenizing the whole catalog is cheap, so the index is always
+        rebuilt from scratch; it uses the same content-hash ids as the vector store.
+        Postings are spooled to disk per DATA_CHUNK_SIZE documents and merged, so memory
+        stays bounded apart from the vocabulary and the set of ids.
+
+        Raises:
+            CustomException: If the CSV cannot be read or the index cannot be written.
+        """
+        try:
+            converter = DataConverter(file_path=AppConfig.DATA_FILE_PATH)
+            seen_ids: Set[str] = set()
+
+            def unique_documents() -> Iterator[Tuple[str, Document]]:
+                for doc in converter.iter_documents(chunksize=AppConfig.DATA_CHUNK_SIZE):
+                    doc_id = doc.metadata["content_hash"]
+                    if doc_id not in seen_ids:
+                        seen_ids.add(doc_id)
+                        yield doc_id, doc
+
+            return BM25Index.build(unique_documents(), AppConfig.LEXICAL_INDEX_DIR, chunk_size=AppConfig.DATA_CHUNK_SIZE)
+        except Exception as e:
+            raise CustomException("Failed to build the BM25 lexical index.", e)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sync the vector store (and BM25 index) with the review CSV.")
+    parser.add_argument(
+        "--full-rebuild", action="store_true",
+        help="Delete every stored document first and re-embed the whole CSV (one-time migration of old rows).",
+    )
+    args = parser.parse_args(argv)
+    DataIngestor().ingest_data(full_rebuild=args.full_rebuild)
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())
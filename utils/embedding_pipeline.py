@@ -0,0 +1,148 @@
+# In utils/embedding_pipeline.py
+
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from utils.logger import setup_logger
+
+# Initialize a logger for this module
+logger = setup_logger(__name__)
+
+@dataclass
+class PipelineStats:
+    """Throughput summary of one pipeline run."""
+    documents: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.documents / self.seconds if self.seconds > 0 else 0.0
+
+def set_intra_op_threads(num_threads: Optional[int]) -> None:
+    """
+    Caps the number of threads PyTorch uses inside a single forward pass.
+
+    With several batches encoded concurrently, letting every batch grab all cores
+    oversubscribes the CPU; `workers * intra_op_threads ~= cores` works best.
+    """
+    if not num_threads:
+        return
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+        logger.info(f"Set PyTorch intra-op threads to {num_threads}.")
+    except ImportError:
+        logger.warning("PyTorch is not installed; ignoring intra-op thread setting.")
+
+class EmbeddingPipeline:
+    """
+    Embeds documents in fixed-size batches on a thread pool and writes them to a vector store.
+
+    Encoding runs in worker threads (PyTorch releases the GIL during inference) while the
+    calling thread writes finished batches, so embedding and vector-store writes overlap.
+    The number of in-flight batches is bounded, so arbitrarily large (even streaming)
+    inputs are processed with constant memory.
+    """
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        batch_size: int = 64,
+        num_workers: int = 2,
+        max_pending: Optional[int] = None,
+    ):
+        """
+        Initializes the EmbeddingPipeline.
+
+        Args:
+            vector_store (VectorStore): The store to write to. Its `embeddings` are used for encoding.
+            batch_size (int): Number of documents encoded per forward pass.
+            num_workers (int): Number of concurrent encoding threads.
+            max_pending (Optional[int]): Maximum batches in flight (defaults to 2 * num_workers).
+        """
+        if batch_size < 1 or num_workers < 1:
+            raise ValueError("batch_size and num_workers must both be at least 1.")
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.max_pending = max_pending or 2 * num_workers
+        # Stores that accept pre-computed vectors let us split encoding from writing;
+        # others (e.g. Astra DB) embed internally, so workers call add_documents directly.
+        self._precomputed = hasattr(vector_store, "add_embeddings")
+
+    def _batches(self, items: Iterable[Tuple[str, Document]]) -> Iterator[List[Tuple[str, Document]]]:
+        iterator = iter(items)
+        while True:
+            batch = list(islice(iterator, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _encode(self, batch: List[Tuple[str, Document]]) -> Optional[List[List[float]]]:
+        if self._precomputed:
+            return self.vector_store.embeddings.embed_documents([doc.page_content for _, doc in batch])
+        self.vector_store.add_documents([doc for _, doc in batch], ids=[doc_id for doc_id, _ in batch])
+        return None
+
+    def _write(self, batch: List[Tuple[str, Document]], vectors: Optional[List[List[float]]]) -> None:
+        if vectors is None:
+            return  # Already written by the worker
+        self.vector_store.add_embeddings(
+            texts=[doc.page_content for _, doc in batch],
+            embeddings=vectors,
+            metadatas=[doc.metadata for _, doc in batch],
+            ids=[doc_id for doc_id, _ in batch],
+        )
+
+    def run(
+        self,
+        items: Iterable[Tuple[str, Document]],
+        on_batch_written: Optional[Callable[[List[str]], None]] = None,
+    ) -> PipelineStats:
+        """
+        Embeds and writes every (id, document) pair.
+
+        Args:
+            items: An iterable of (id, Document) pairs; may be a lazy generator.
+            on_batch_written: Optional callback receiving the ids of each batch once it is
+                              durably written (e.g. to update an ingestion manifest).
+
+        Returns:
+            PipelineStats: Documents, batches and elapsed time, including docs/sec.
+        """
+        stats = PipelineStats()
+        start = time.perf_counter()
+        pending: Deque[Tuple[List[Tuple[str, Document]], Future]] = deque()
+
+        def drain_one() -> None:
+            batch, future = pending.popleft()
+            self._write(batch, future.result())
+            stats.documents += len(batch)
+            stats.batches += 1
+            if on_batch_written:
+                on_batch_written([doc_id for doc_id, _ in batch])
+            if stats.batches % 10 == 0:
+                elapsed = time.perf_counter() - start
+                logger.info(f"Embedded {stats.documents} documents ({stats.documents / elapsed:.1f} docs/sec).")
+
+        with ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="embed") as pool:
+            for batch in self._batches(items):
+                pending.append((batch, pool.submit(self._encode, batch)))
+                # Backpressure: write the oldest batch before queuing more work
+                if len(pending) >= self.max_pending:
+                    drain_one()
+            while pending:
+                drain_one()
+
+        stats.seconds = time.perf_counter() - start
+        logger.info(
+            f"Embedding pipeline finished: {stats.documents} documents in {stats.batches} batches, "
+            f"{stats.seconds:.2f}s ({stats.docs_per_sec:.1f} docs/sec)."
+        )
+        return stats
@@ -0,0 +1,309 @@
+# In utils/embedding_store.py
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, fine for a single dev server
+    fcntl = None
+
+import numpy as np
+from utils.logger import setup_logger
+
+# Initialize a logger for this module
+logger = setup_logger(__name__)
+
+# Bump this whenever the on-disk layout changes so stale artifacts are rebuilt
+INDEX_FORMAT_VERSION = 1
+
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.json"
+RECORDS_FILE = "records.jsonl"
+OFFSETS_FILE = "offsets.npy"
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_ASSIGNMENTS_FILE = "ivf_assignments.npy"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+SAVE_LOCK_FILE = ".save.lock"
+BUILD_LOCK_FILE = ".build.lock"
+
+# Superseded versions kept on disk, for readers that resolved CURRENT just before a swap
+KEEP_OLD_VERSIONS = 2
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Holds an exclusive advisory lock on `path` across processes."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _write_atomic(path: str, writer) -> None:
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        writer(f)
+    os.replace(tmp_path, path)
+
+def compute_fingerprint(model_name: str, dimension: int, dtype: str) -> str:
+    """
+    Returns a short hash identifying everything that makes stored vectors
+    (in)compatible with the running embedding model.
+    """
+    payload = json.dumps(
+        {"format": INDEX_FORMAT_VERSION, "model": model_name, "dim": dimension, "dtype": dtype},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+class MappedRecords(Sequence):
+    """
+    Read-only, memory-mapped view over the (text, metadata) records of a saved index.
+
+    Records are only decoded when accessed, so a worker that serves a handful of
+    search hits never pays to parse the whole catalog.
+    """
+    def __init__(self, records_path: str, offsets: np.ndarray):
+        self._file = open(records_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> Tuple[str, dict]:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        record = json.loads(self._mmap[start:end])
+        return record["text"], record["metadata"]
+
+class EmbeddingStore:
+    """
+    Reads and writes a self-describing on-disk embedding artifact.
+
+    Each save writes a complete version into versions/<version>/:
+      - vectors.npy      (n, dim) float32/float16 matrix, memory-mapped on load
+      - ids.json         document ids in row order
+      - records.jsonl    one JSON record (text + metadata) per row
+      - offsets.npy      (n + 1) byte offsets of each record in records.jsonl
+      - manifest.json    model/format fingerprint, row count and index version
+
+    The CURRENT file names the live version and is swapped atomically once that
+    version is complete, so a reader in another process sees either the old index or
+    the new one, never files from both. Saves are serialised with a file lock.
+    """
+    def __init__(self, directory: str):
+        """
+        Initializes the EmbeddingStore.
+
+        Args:
+            directory (str): The directory holding the artifact.
+        """
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _current_dir(self) -> str:
+        """The live version's directory (the top level for an artifact saved before versioning)."""
+        try:
+            with open(self._path(CURRENT_FILE), encoding="utf-8") as f:
+                return os.path.join(self.directory, VERSIONS_DIR, f.read().strip())
+        except FileNotFoundError:
+            return self.directory
+
+    @contextmanager
+    def build_lock(self) -> Iterator[None]:
+        """
+        Serialises building the artifact across processes.
+
+        Web workers that find no artifact at startup take this lock before ingesting,
+        so the first one builds it and the rest load the result.
+        """
+        with _file_lock(self._path(BUILD_LOCK_FILE)):
+            yield
+
+    def read_manifest(self, version_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Returns the parsed manifest, or None if no artifact has been written yet."""
+        try:
+            with open(os.path.join(version_dir or self._current_dir(), MANIFEST_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _prune_versions(self, current: str) -> None:
+        versions_dir = self._path(VERSIONS_DIR)
+        old = sorted(
+            (entry for entry in os.scandir(versions_dir) if entry.is_dir() and entry.name != current),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        # Deleting files another process has memory-mapped is safe; its mapping stays valid
+        for entry in old[:-KEEP_OLD_VERSIONS] if KEEP_OLD_VERSIONS else old:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def save(
+        self,
+        ids: List[str],
+        records: Iterator[Tuple[str, dict]],
+        vectors: np.ndarray,
+        model_name: str,
+        dtype: str = "float32",
+        ivf_centroids: Optional[np.ndarray] = None,
+        ivf_assignments: Optional[np.ndarray] = None,
+    ) -> Dict[str, Any]:
+        """
+        Writes an artifact, replacing any previous one.
+
+        Args:
+            ids (List[str]): Document ids in row order.
+            records: (text, metadata) pairs in row order.
+            vectors (np.ndarray): The (n, dim) embedding matrix.
+            model_name (str): Name of the embedding model that produced the vectors.
+            dtype (str): On-disk precision, "float32" or "float16".
+            ivf_centroids / ivf_assignments: Optional trained IVF state to persist.
+
+        Returns:
+            Dict[str, Any]: The manifest that was written.
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported dtype '{dtype}'. Use 'float32' or 'float16'.")
+        os.makedirs(self.directory, exist_ok=True)
+        with _file_lock(self._path(SAVE_LOCK_FILE)):
+            return self._save_version(ids, records, vectors, model_name, dtype, ivf_centroids, ivf_assignments)
+
+    def _save_version(
+        self,
+        ids: List[str],
+        records: Iterator[Tuple[str, dict]],
+        vectors: np.ndarray,
+        model_name: str,
+        dtype: str,
+        ivf_centroids: Optional[np.ndarray],
+        ivf_assignments: Optional[np.ndarray],
+    ) -> Dict[str, Any]:
+        start = time.perf_counter()
+        version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        version_dir = os.path.join(self.directory, VERSIONS_DIR, version)
+        os.makedirs(version_dir)
+
+        def path(name: str) -> str:
+            return os.path.join(version_dir, name)
+
+        vectors = np.asarray(vectors, dtype=dtype)
+        dimension = int(vectors.shape[1]) if vectors.ndim == 2 and len(vectors) else 0
+
+        # Serialize records and remember where each one starts
+        offsets = [0]
+        with open(path(RECORDS_FILE), "wb") as f:
+            for text, metadata in records:
+                line = json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+
+        if len(offsets) - 1 != len(ids):
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise ValueError(f"Got {len(ids)} ids but {len(offsets) - 1} records.")
+        np.save(path(OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+        np.save(path(VECTORS_FILE), vectors)
+        with open(path(IDS_FILE), "w", encoding="utf-8") as f:
+            json.dump(ids, f)
+
+        has_ivf = ivf_centroids is not None and ivf_assignments is not None
+        if has_ivf:
+            np.save(path(IVF_CENTROIDS_FILE), np.asarray(ivf_centroids, dtype=np.float32))
+            np.save(path(IVF_ASSIGNMENTS_FILE), np.asarray(ivf_assignments, dtype=np.int32))
+
+        manifest = {
+            "format_version": INDEX_FORMAT_VERSION,
+            "model_name": model_name,
+            "dimension": dimension,
+            "dtype": dtype,
+            "count": len(ids),
+            "fingerprint": compute_fingerprint(model_name, dimension, dtype),
+            "index_version": hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()[:16],
+            "has_ivf": has_ivf,
+            "created_at": time.time(),
+        }
+        with open(path(MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        # The swap that publishes the version; everything it points at is already on disk
+        _write_atomic(self._path(CURRENT_FILE), lambda f: f.write(version.encode("utf-8")))
+        self._prune_versions(version)
+
+        logger.info(
+            f"Saved embedding artifact version {version} with {len(ids)} vectors ({dtype}) to {self.directory} "
+            f"in {time.perf_counter() - start:.2f}s."
+        )
+        return manifest
+
+    def load(self, model_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Memory-maps a previously saved artifact.
+
+        Args:
+            model_name (str): The embedding model the caller will query with. Artifacts
+                              produced by a different model or format are rejected.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dict with "manifest", "ids", "vectors" (read-only
+            memmap), "records" (MappedRecords) and optional "ivf_centroids" /
+            "ivf_assignments", or None if the artifact is missing or stale.
+        """
+        # Resolved once, so every file below comes from the same version
+        version_dir = self._current_dir()
+        manifest = self.read_manifest(version_dir)
+        if manifest is None:
+            logger.info(f"No embedding artifact found in {self.directory}.")
+            return None
+
+        expected = compute_fingerprint(model_name, manifest["dimension"], manifest["dtype"])
+        if manifest.get("fingerprint") != expected:
+            logger.warning(
+                f"Embedding artifact in {self.directory} was built for model "
+                f"'{manifest.get('model_name')}' (format {manifest.get('format_version')}); ignoring it."
+            )
+            return None
+
+        start = time.perf_counter()
+        # mmap_mode="r" lets every worker process share the same page-cache copy
+        def path(name: str) -> str:
+            return os.path.join(version_dir, name)
+
+        vectors = np.load(path(VECTORS_FILE), mmap_mode="r")
+        offsets = np.load(path(OFFSETS_FILE))
+        with open(path(IDS_FILE), encoding="utf-8") as f:
+            ids = json.load(f)
+
+        loaded = {
+            "manifest": manifest,
+            "ids": ids,
+            "vectors": vectors,
+            "records": MappedRecords(path(RECORDS_FILE), offsets),
+        }
+        if manifest.get("has_ivf"):
+            loaded["ivf_centroids"] = np.load(path(IVF_CENTROIDS_FILE))
+            loaded["ivf_assignments"] = np.load(path(IVF_ASSIGNMENTS_FILE), mmap_mode="r")
+
+        logger.info(
+            f"Memory-mapped {manifest['count']} vectors from {self.directory} "
+            f"in {(time.perf_counter() - start) * 1000:.1f}ms."
+        )
+        return loaded
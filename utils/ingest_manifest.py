@@ -0,0 +1,50 @@
+# In utils/ingest_manifest.py
+
+import json
+import os
+import time
+from typing import Iterable, Set
+from utils.logger import setup_logger
+
+# Initialize a logger for this module
+logger = setup_logger(__name__)
+
+class IngestManifest:
+    """
+    Records the content hashes of every document already written to a vector store.
+
+    Comparing the manifest against a fresh pass over the CSV tells ingestion exactly
+    which rows are new (to embed and upsert) and which disappeared (to delete).
+    """
+    def __init__(self, path: str):
+        """
+        Initializes the IngestManifest and loads any existing state from disk.
+
+        Args:
+            path (str): The JSON file that persists the manifest.
+        """
+        self.path = path
+        self.ids: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.ids = set(json.load(f).get("ids", []))
+            logger.info(f"Loaded ingestion manifest with {len(self.ids)} entries from {path}.")
+
+    def add(self, ids: Iterable[str]) -> None:
+        self.ids.update(ids)
+
+    def discard(self, ids: Iterable[str]) -> None:
+        self.ids.difference_update(ids)
+
+    def clear(self) -> None:
+        self.ids.clear()
+
+    def save(self) -> None:
+        """Atomically writes the manifest so a crash never leaves a truncated file."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": time.time(), "ids": sorted(self.ids)}, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,396 @@
+# In utils/lexical_index.py
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from utils.embedding_store import MappedRecords
+from utils.logger import setup_logger
+
+# Initialize a logger for this module
+logger = setup_logger(__name__)
+
+# Bump this whenever the on-disk layout or the tokenizer changes so stale indexes are rebuilt
+LEXICAL_FORMAT_VERSION = 3
+
+INDPTR_FILE = "indptr.npy"
+DOC_ROWS_FILE = "doc_rows.npy"
+IMPACTS_FILE = "impacts.npy"
+VOCABULARY_FILE = "vocabulary.json"
+IDS_FILE = "ids.json"
+RECORDS_FILE = "records.jsonl"
+OFFSETS_FILE = "offsets.npy"
+FIELD_VALUES_FILE = "field_values.json"
+FIELD_CODES_FILE = "codes.{field}.npy"
+MANIFEST_FILE = "manifest.json"
+
+# Metadata fields stored as one integer code per row, so filters on them are a vectorized mask
+CODED_FIELDS = ("product_name", "product_id")
+
+# Words too common to help ranking; dropping them keeps the postings short
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have", "i", "if",
+    "in", "is", "it", "its", "me", "my", "of", "on", "or", "so", "that", "the", "this", "to", "very",
+    "was", "we", "what", "which", "with", "you",
+})
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize_for_search(text: str) -> List[str]:
+    """Lower-cased alphanumeric tokens without stop words ("Rockerz 235v2" -> ["rockerz", "235v2"])."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+def accepted_values(field: str, condition: Any) -> List[Any]:
+    """
+    Returns the values a filter condition accepts, for the subset shared with
+    LocalVectorStore and Astra DB: plain values, {"$eq": value} and {"$in": [values]}.
+    """
+    if not isinstance(condition, dict):
+        return [condition]
+    if len(condition) != 1 or next(iter(condition)) not in ("$eq", "$in"):
+        raise ValueError(f"Unsupported filter condition for '{field}': {condition}. Use $eq or $in.")
+    operator, operand = next(iter(condition.items()))
+    return list(operand) if operator == "$in" else [operand]
+
+def metadata_matches(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    """Checks metadata against a filter ($eq / $in / plain values)."""
+    return all(metadata.get(field) in accepted_values(field, condition) for field, condition in filter.items())
+
+def _tmp_path(path: str) -> str:
+    return f"{path}.tmp-{os.getpid()}"
+
+def _write_atomic(path: str, writer) -> None:
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        writer(f)
+    os.replace(tmp_path, path)
+
+def _spool_chunk(path: str, term_ids: List[np.ndarray], term_freqs: List[np.ndarray], first_row: int) -> np.ndarray:
+    """Writes one chunk's (term, row, tf) postings to `path`, sorted term-major; returns the chunk's terms."""
+    counts = np.fromiter((len(t) for t in term_ids), dtype=np.int64, count=len(term_ids))
+    terms = np.concatenate(term_ids)
+    rows = np.repeat(np.arange(first_row, first_row + len(term_ids), dtype=np.int32), counts)
+    order = np.argsort(terms, kind="stable")
+    np.savez(path, terms=terms[order], rows=rows[order], tfs=np.concatenate(term_freqs)[order])
+    return terms
+
+class BM25Index:
+    """
+    An Okapi BM25 inverted index with compact, precomputed postings.
+
+    Postings are stored term-major in CSR form: for term t, rows
+    `doc_rows[indptr[t]:indptr[t + 1]]` contain it, with their final BM25 contribution
+    (IDF x saturated, length-normalized term frequency) precomputed in `impacts`. A
+    query therefore costs one slice per query term plus a vectorized scatter-add over
+    the touched postings, with no per-document Python work.
+
+    Artifact layout (written atomically, manifest last):
+      - indptr.npy / doc_rows.npy / impacts.npy   postings (int64 / int32 / float32), memory-mapped
+      - vocabulary.json  term -> term id
+      - ids.json         document ids in row order
+      - records.jsonl / offsets.npy   documents, memory-mapped like the embedding artifact
+      - field_values.json / codes.<field>.npy   per-row codes of CODED_FIELDS (-1 when absent)
+      - manifest.json    format version, BM25 parameters, counts and index version
+    """
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        indptr: np.ndarray,
+        doc_rows: np.ndarray,
+        impacts: np.ndarray,
+        ids: List[str],
+        records: Any,
+        k1: float = 1.2,
+        b: float = 0.75,
+        field_codes: Optional[Dict[str, Tuple[Dict[Any, int], np.ndarray]]] = None,
+    ):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_rows = doc_rows
+        self.impacts = impacts
+        self.ids = ids
+        self._records = records  # (text, metadata) per row: a list, or MappedRecords when loaded
+        self.k1 = k1
+        self.b = b
+        self.field_codes = field_codes or {}  # field -> (value -> code, per-row codes)
+        self.index_version = hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # --- 1. Building ---
+
+    @classmethod
+    def build(
+        cls,
+        documents: Iterable[Tuple[str, Document]],
+        directory: str,
+        k1: float = 1.2,
+        b: float = 0.75,
+        chunk_size: int = 10_000,
+    ) -> "BM25Index":
+        """
+        Builds the index from (id, Document) pairs into `directory`, replacing any previous one.
+
+        Memory stays bounded by `chunk_size`. Records are written to disk as they arrive,
+        and each chunk's postings are sorted and spooled to a temporary file. Once the
+        corpus statistics (document count, frequencies, average length) are known, a
+        merge pass scatters every spooled chunk into memory-mapped postings files. Only
+        the vocabulary and the id, length and record offset of each document are kept.
+
+        Args:
+            documents: The documents to index, e.g. straight from DataConverter.iter_documents.
+            directory (str): Where the index is written.
+            k1 (float): Term-frequency saturation.
+            b (float): Document-length normalization.
+            chunk_size (int): Documents per spooled chunk of postings.
+
+        Returns:
+            BM25Index: The saved index, loaded memory-mapped.
+        """
+        start = time.perf_counter()
+        os.makedirs(directory, exist_ok=True)
+        path = lambda name: os.path.join(directory, name)
+        spool_dir = tempfile.mkdtemp(prefix=".spool-", dir=directory)
+        try:
+            # Pass 1: write records, spool per-chunk postings and count document frequencies
+            vocabulary: Dict[str, int] = {}
+            ids: List[str] = []
+            lengths = array("f")
+            offsets = array("q", [0])
+            document_frequency = np.zeros(0, dtype=np.int64)
+            spools: List[str] = []
+            term_ids: List[np.ndarray] = []
+            term_freqs: List[np.ndarray] = []
+            field_values: Dict[str, Dict[Any, int]] = {field: {} for field in CODED_FIELDS}
+            field_codes = {field: array("i") for field in CODED_FIELDS}
+
+            def flush() -> None:
+                nonlocal document_frequency
+                spool = os.path.join(spool_dir, f"chunk-{len(spools):06d}.npz")
+                terms = _spool_chunk(spool, term_ids, term_freqs, len(ids) - len(term_ids))
+                spools.append(spool)
+                document_frequency = np.pad(document_frequency, (0, len(vocabulary) - len(document_frequency)))
+                document_frequency += np.bincount(terms, minlength=len(vocabulary))
+                term_ids.clear()
+                term_freqs.clear()
+
+            with open(_tmp_path(path(RECORDS_FILE)), "wb") as records:
+                for doc_id, doc in documents:
+                    tokens = tokenize_for_search(doc.page_content)
+                    counts = Counter(tokens)
+                    term_ids.append(np.fromiter(
+                        (vocabulary.setdefault(t, len(vocabulary)) for t in counts), dtype=np.int32, count=len(counts)
+                    ))
+                    term_freqs.append(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+                    lengths.append(len(tokens))
+                    ids.append(doc_id)
+                    for field, values in field_values.items():
+                        value = doc.metadata.get(field)
+                        scalar = isinstance(value, (str, int, float, bool))
+                        field_codes[field].append(values.setdefault(value, len(values)) if scalar else -1)
+                    line = json.dumps(
+                        {"text": doc.page_content, "metadata": dict(doc.metadata)}, ensure_ascii=False
+                    ).encode("utf-8") + b"\n"
+                    records.write(line)
+                    offsets.append(offsets[-1] + len(line))
+                    if len(term_ids) == chunk_size:
+                        flush()
+                if term_ids:
+                    flush()
+
+            # Pass 2: BM25 impacts need the corpus statistics, so they are computed while merging
+            n = len(ids)
+            document_frequency = np.pad(document_frequency, (0, len(vocabulary) - len(document_frequency)))
+            doc_lengths = np.frombuffer(lengths, dtype=np.float32)
+            avg_length = max(float(doc_lengths.mean()), 1.0) if n else 1.0
+            idf = np.log(1.0 + (n - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+            indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+            np.cumsum(document_frequency, out=indptr[1:])
+
+            total = int(indptr[-1])
+            doc_rows = np.lib.format.open_memmap(_tmp_path(path(DOC_ROWS_FILE)), mode="w+", dtype=np.int32, shape=(total,))
+            impacts = np.lib.format.open_memmap(_tmp_path(path(IMPACTS_FILE)), mode="w+", dtype=np.float32, shape=(total,))
+            cursor = indptr[:-1].copy()  # Next free posting slot of each term
+            for spool in spools:
+                with np.load(spool) as chunk:
+                    terms, rows, tfs = chunk["terms"], chunk["rows"], chunk["tfs"]
+                # Chunks arrive in row order, so each term's postings stay sorted by row
+                unique, first, counts = np.unique(terms, return_index=True, return_counts=True)
+                positions = cursor[terms] + (np.arange(len(terms)) - np.repeat(first, counts))
+                cursor[unique] += counts
+                norm = k1 * (1.0 - b + b * doc_lengths[rows] / avg_length)
+                doc_rows[positions] = rows
+                impacts[positions] = idf[terms] * tfs * (k1 + 1.0) / (tfs + norm)
+                os.remove(spool)
+            doc_rows.flush()
+            impacts.flush()
+            del doc_rows, impacts
+
+            os.replace(_tmp_path(path(RECORDS_FILE)), path(RECORDS_FILE))
+            os.replace(_tmp_path(path(DOC_ROWS_FILE)), path(DOC_ROWS_FILE))
+            os.replace(_tmp_path(path(IMPACTS_FILE)), path(IMPACTS_FILE))
+            _write_atomic(path(OFFSETS_FILE), lambda f: np.save(f, np.frombuffer(offsets, dtype=np.int64)))
+            _write_atomic(path(INDPTR_FILE), lambda f: np.save(f, indptr))
+            _write_atomic(path(VOCABULARY_FILE), lambda f: f.write(json.dumps(vocabulary).encode("utf-8")))
+            _write_atomic(path(IDS_FILE), lambda f: f.write(json.dumps(ids).encode("utf-8")))
+            for field, codes in field_codes.items():
+                _write_atomic(
+                    path(FIELD_CODES_FILE.format(field=field)), lambda f: np.save(f, np.frombuffer(codes, dtype=np.int32))
+                )
+            _write_atomic(path(FIELD_VALUES_FILE), lambda f: f.write(
+                json.dumps({field: list(values) for field, values in field_values.items()}).encode("utf-8")
+            ))
+            manifest = {
+                "format_version": LEXICAL_FORMAT_VERSION,
+                "k1": k1,
+                "b": b,
+                "count": n,
+                "terms": len(vocabulary),
+                "postings": total,
+                "index_version": hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()[:16],
+                "created_at": time.time(),
+            }
+            _write_atomic(path(MANIFEST_FILE), lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+        logger.info(
+            f"Built BM25 index over {n} documents ({len(vocabulary)} terms, {total} postings, "
+            f"{len(spools)} chunks) in {directory} in {time.perf_counter() - start:.2f}s."
+        )
+        return cls.load(directory)
+
+    # --- 2. Searching ---
+
+    def _document(self, row: int) -> Document:
+        text, metadata = self._records[row]
+        return Document(page_content=text, metadata=dict(metadata))
+
+    def search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """
+        Returns up to k documents ranked by BM25 score (only documents sharing a term with the query).
+
+        Args:
+            query (str): The user's question.
+            k (int): Number of results.
+            filter (Optional[Dict[str, Any]]): Optional metadata filter ($eq / $in). On
+                CODED_FIELDS it masks the candidates before ranking; on other fields,
+                candidates are decoded and checked in score order.
+        """
+        term_ids = {self.vocabulary[t] for t in tokenize_for_search(query) if t in self.vocabulary}
+        if not term_ids or k <= 0:
+            return []
+
+        slices = [slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        rows = np.concatenate([self.doc_rows[s] for s in slices])
+        impacts = np.concatenate([self.impacts[s] for s in slices])
+        # Scatter-add the impacts of every touched posting onto its document. Short posting
+        # runs are compacted with a sort; long ones go straight into a dense score array.
+        if len(rows) * 8 < len(self.ids):
+            candidates, inverse = np.unique(rows, return_inverse=True)
+            scores = np.bincount(inverse, weights=impacts)
+        else:
+            scores = np.bincount(rows, weights=impacts, minlength=len(self.ids))
+            candidates = np.flatnonzero(scores)
+            scores = scores[candidates]
+
+        if filter:
+            mask = self._filter_mask(candidates, filter)
+            if mask is None:
+                return self._search_uncoded(candidates, scores, k, filter)
+            candidates, scores = candidates[mask], scores[mask]
+
+        if len(scores):
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+            return [(self._document(int(candidates[i])), float(scores[i])) for i in top]
+        return []
+
+    def _filter_mask(self, candidates: np.ndarray, filter: Dict[str, Any]) -> Optional[np.ndarray]:
+        """The candidates matching `filter`, or None if it uses a field without stored codes."""
+        if any(field not in self.field_codes for field in filter):
+            return None
+        mask = np.ones(len(candidates), dtype=bool)
+        for field, condition in filter.items():
+            values, codes = self.field_codes[field]
+            allowed = [values[v] for v in accepted_values(field, condition) if v in values]
+            mask &= np.isin(codes[candidates], allowed)
+        return mask
+
+    def _search_uncoded(
+        self, candidates: np.ndarray, scores: np.ndarray, k: int, filter: Dict[str, Any]
+    ) -> List[Tuple[Document, float]]:
+        results = []
+        for i in np.argsort(-scores):
+            doc = self._document(int(candidates[i]))
+            if metadata_matches(doc.metadata, filter):
+                results.append((doc, float(scores[i])))
+                if len(results) == k:
+                    break
+        return results
+
+    # --- 3. Persistence ---
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        """
+        Loads a saved index; postings and documents stay memory-mapped, and documents are decoded only for hits.
+
+        Returns:
+            Optional[BM25Index]: The index, or None if it is missing or in an older format.
+        """
+        manifest = cls._read_manifest(directory)
+        if manifest is None:
+            logger.info(f"No BM25 index found in {directory}.")
+            return None
+        if manifest.get("format_version") != LEXICAL_FORMAT_VERSION:
+            logger.warning(f"BM25 index in {directory} has format {manifest.get('format_version')}; ignoring it.")
+            return None
+
+        start = time.perf_counter()
+        indptr = np.load(os.path.join(directory, INDPTR_FILE))
+        doc_rows = np.load(os.path.join(directory, DOC_ROWS_FILE), mmap_mode="r")
+        impacts = np.load(os.path.join(directory, IMPACTS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, VOCABULARY_FILE), encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        with open(os.path.join(directory, IDS_FILE), encoding="utf-8") as f:
+            ids = json.load(f)
+        records = MappedRecords(os.path.join(directory, RECORDS_FILE), np.load(os.path.join(directory, OFFSETS_FILE)))
+        with open(os.path.join(directory, FIELD_VALUES_FILE), encoding="utf-8") as f:
+            field_codes = {
+                field: (
+                    {value: code for code, value in enumerate(values)},
+                    np.load(os.path.join(directory, FIELD_CODES_FILE.format(field=field)), mmap_mode="r"),
+                )
+                for field, values in json.load(f).items()
+            }
+        index = cls(vocabulary, indptr, doc_rows, impacts, ids, records, manifest["k1"], manifest["b"], field_codes)
+        logger.info(
+            f"Loaded BM25 index with {len(index)} documents from {directory} "
+            f"in {(time.perf_counter() - start) * 1000:.1f}ms."
+        )
+        return index
+
+    @staticmethod
+    def _read_manifest(directory: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def is_current(cls, directory: str) -> bool:
+        """True if `directory` holds an index in the current format."""
+        manifest = cls._read_manifest(directory)
+        return manifest is not None and manifest.get("format_version") == LEXICAL_FORMAT_VERSION
@@ -0,0 +1,448 @@
+# In utils/local_vector_store.py
+
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from utils.embedding_store import EmbeddingStore
+from utils.logger import setup_logger
+
+# Initialize a logger for this module
+logger = setup_logger(__name__)
+
+# Rows scored per block when the matrix is stored at reduced precision
+_SCORE_BLOCK_ROWS = 65536
+
+class LocalVectorStore(VectorStore):
+    """
+    An in-process vector store backed by a NumPy matrix of L2-normalized embeddings.
+
+    Because every row is unit length, cosine similarity is a single matrix-vector
+    product, so top-k search over a few thousand reviews takes well under a millisecond.
+    Two search modes are supported:
+      - "exact": brute-force scoring of every row.
+      - "ivf":   an inverted-file index (spherical k-means coarse quantizer). Only the
+                 `nprobe` closest clusters are scored, trading a little recall for speed
+                 on large catalogs.
+
+    Searches accept an Astra-style metadata `filter` such as
+    {"product_name": {"$in": [...]}}; only the matching rows are scored.
+
+    The index can be saved to and memory-mapped from an on-disk artifact
+    (see utils/embedding_store.py) so workers start without re-embedding anything.
+    """
+    def __init__(
+        self,
+        embedding: Embeddings,
+        index_type: str = "exact",
+        nlist: int = 64,
+        nprobe: int = 8,
+    ):
+        """
+        Initializes an empty LocalVectorStore.
+
+        Args:
+            embedding (Embeddings): The embedding model used for documents and queries.
+            index_type (str): Either "exact" or "ivf".
+            nlist (int): Maximum number of IVF clusters (only used when index_type="ivf").
+            nprobe (int): Number of IVF clusters scored per query.
+        """
+        if index_type not in ("exact", "ivf"):
+            raise ValueError(f"Unsupported index_type '{index_type}'. Use 'exact' or 'ivf'.")
+
+        self._embedding = embedding
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+
+        self._lock = threading.RLock()
+        self._vectors: Optional[np.ndarray] = None
+        # Over-allocated float32 storage that `_vectors` views while rows are only appended
+        self._buffer: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        # (text, metadata) per row; a MappedRecords view when loaded from disk
+        self._records: Sequence[Tuple[str, dict]] = []
+        self._id_to_row: Dict[str, int] = {}
+        self.index_version: Optional[str] = None
+
+        # IVF state is rebuilt lazily on the first search after the data changes
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._inverted_lists: List[np.ndarray] = []
+        self._ivf_dirty = True
+
+        # metadata field -> value -> rows, built lazily per field and reset on every change
+        self._field_rows: Dict[str, Dict[Any, np.ndarray]] = {}
+
+    # --- 1. Properties ---
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def ids(self) -> List[str]:
+        """The ids of all stored documents, in row order."""
+        return list(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # --- 2. Writing ---
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """Returns a float32 copy of `vectors` scaled to unit length row-wise."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        Embeds and adds texts to the index. Existing ids are overwritten (upsert).
+
+        Returns:
+            List[str]: The ids of the added texts.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        embeddings = self._embedding.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas=metadatas, ids=ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: Any,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Adds pre-computed embeddings to the index without calling the embedding model.
+
+        Args:
+            texts (List[str]): The document texts.
+            embeddings: A (n, dim) array-like of embeddings, one per text.
+            metadatas (Optional[List[dict]]): Optional metadata per text.
+            ids (Optional[List[str]]): Optional ids; random UUIDs are generated if omitted.
+
+        Returns:
+            List[str]: The ids of the added texts.
+        """
+        vectors = self._normalize(embeddings)
+        if len(vectors) != len(texts):
+            raise ValueError(f"Got {len(texts)} texts but {len(vectors)} embeddings.")
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        if not (len(metadatas) == len(ids) == len(texts)):
+            raise ValueError("texts, metadatas and ids must all have the same length.")
+
+        with self._lock:
+            # Upsert semantics: drop any rows whose ids are being re-added
+            existing = [doc_id for doc_id in ids if doc_id in self._id_to_row]
+            if existing:
+                self._delete_rows(existing)
+
+            if self._vectors is not None and len(self._vectors) and vectors.shape[1] != self._vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension mismatch: index has {self._vectors.shape[1]}, got {vectors.shape[1]}."
+                )
+            self._vectors = self._append_rows(vectors)
+
+            start = len(self._ids)
+            if not isinstance(self._records, list):
+                # Copy-on-write: materialize a memory-mapped index before mutating it
+                self._records = list(self._records)
+            self._ids.extend(ids)
+            self._records.extend((text, dict(m)) for text, m in zip(texts, metadatas))
+            for offset, doc_id in enumerate(ids):
+                self._id_to_row[doc_id] = start + offset
+            self._ivf_dirty = True
+            self._field_rows = {}
+            self.index_version = None
+
+        return list(ids)
+
+    def _append_rows(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Writes `vectors` after the current rows and returns a view of all filled rows.
+
+        The buffer doubles when full, so ingesting n rows batch by batch copies O(n)
+        rows in total instead of the whole matrix per batch. Filled rows are never
+        rewritten, so a search holding the previous view is unaffected.
+        """
+        count = 0 if self._vectors is None else len(self._vectors)
+        needed = count + len(vectors)
+        if self._buffer is None or needed > len(self._buffer) or self._buffer.shape[1] != vectors.shape[1]:
+            buffer = np.empty((max(needed, 2 * count), vectors.shape[1]), dtype=np.float32)
+            if count:
+                buffer[:count] = self._vectors  # Also materializes a memory-mapped (or float16) matrix
+            self._buffer = buffer
+        self._buffer[count:needed] = vectors
+        return self._buffer[:needed]
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """
+        Deletes documents by id. Unknown ids are ignored.
+
+        Returns:
+            Optional[bool]: True if any document was removed, False otherwise.
+        """
+        if not ids:
+            return False
+        with self._lock:
+            return self._delete_rows(ids)
+
+    def _delete_rows(self, ids: List[str]) -> bool:
+        rows = [self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row]
+        if not rows:
+            return False
+
+        keep = np.ones(len(self._ids), dtype=bool)
+        keep[rows] = False
+        self._vectors = np.asarray(self._vectors[keep], dtype=np.float32)
+        self._buffer = None  # The next append copies the compacted rows into a fresh buffer
+        self._ids = [v for v, k in zip(self._ids, keep) if k]
+        self._records = [self._records[row] for row in np.flatnonzero(keep)]
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._ivf_dirty = True
+        self._field_rows = {}
+        self.index_version = None
+        return True
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        """Returns the stored Documents for the given ids, skipping unknown ids."""
+        with self._lock:
+            return [self._document(self._id_to_row[doc_id]) for doc_id in ids if doc_id in self._id_to_row]
+
+    # --- 3. IVF Index ---
+
+    def _build_ivf(self, vectors: np.ndarray, iterations: int = 10) -> None:
+        """Trains a spherical k-means coarse quantizer and fills the inverted lists."""
+        n = len(vectors)
+        nlist = max(1, min(self.nlist, int(np.sqrt(n))))
+        rng = np.random.default_rng(0)  # Fixed seed keeps results reproducible across workers
+        centroids = np.asarray(vectors[rng.choice(n, size=nlist, replace=False)], dtype=np.float32)
+
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = vectors[assignments == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = self._normalize(centroids)
+
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        self._set_ivf(centroids, assignments)
+        logger.info(f"Built IVF index with {nlist} clusters over {n} vectors.")
+
+    def _set_ivf(self, centroids: np.ndarray, assignments: np.ndarray) -> None:
+        self._centroids = np.asarray(centroids, dtype=np.float32)
+        self._assignments = np.asarray(assignments, dtype=np.int32)
+        self._inverted_lists = [np.flatnonzero(self._assignments == c) for c in range(len(self._centroids))]
+        self._ivf_dirty = False
+
+    def _candidate_rows(self, vectors: np.ndarray, query: np.ndarray) -> Optional[np.ndarray]:
+        """Returns the rows to score for `query`, or None to score every row."""
+        if self.index_type != "ivf" or len(vectors) <= self.nlist:
+            return None
+        if self._ivf_dirty:
+            self._build_ivf(vectors)
+        centroid_scores = self._centroids @ query
+        nprobe = min(self.nprobe, len(self._centroids))
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self._inverted_lists[c] for c in probe])
+
+    # --- 4. Metadata Filtering ---
+
+    def _rows_by_value(self, field: str) -> Dict[Any, np.ndarray]:
+        """Groups row numbers by the value of a metadata field, building the map on first use."""
+        index = self._field_rows.get(field)
+        if index is None:
+            groups: Dict[Any, List[int]] = {}
+            for row in range(len(self._records)):
+                value = self._records[row][1].get(field)
+                if isinstance(value, (str, int, float, bool)):
+                    groups.setdefault(value, []).append(row)
+            index = {value: np.asarray(rows, dtype=np.int64) for value, rows in groups.items()}
+            self._field_rows[field] = index
+        return index
+
+    def _filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """
+        Returns the sorted rows whose metadata match every condition of `filter`.
+
+        Each condition is either a plain value or {"$eq": value} / {"$in": [values]},
+        the subset of the Astra DB filter syntax used by the app.
+        """
+        rows: Optional[np.ndarray] = None
+        for field, condition in filter.items():
+            if isinstance(condition, dict):
+                if len(condition) != 1 or next(iter(condition)) not in ("$eq", "$in"):
+                    raise ValueError(f"Unsupported filter condition for '{field}': {condition}. Use $eq or $in.")
+                operator, operand = next(iter(condition.items()))
+                values = list(operand) if operator == "$in" else [operand]
+            else:
+                values = [condition]
+
+            index = self._rows_by_value(field)
+            matched = [index[v] for v in values if v in index]
+            field_rows = np.unique(np.concatenate(matched)) if matched else np.empty(0, dtype=np.int64)
+            rows = field_rows if rows is None else np.intersect1d(rows, field_rows, assume_unique=True)
+        return rows if rows is not None else np.arange(len(self._ids))
+
+    # --- 5. Searching ---
+
+    def _document(self, row: int) -> Document:
+        text, metadata = self._records[row]
+        return Document(page_content=text, metadata=dict(metadata))
+
+    @staticmethod
+    def _score(vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Cosine scores of `query` against every row of `vectors`."""
+        if vectors.dtype == np.float32:
+            return vectors @ query
+        # Upcast half-precision rows block by block to bound temporary memory
+        return np.concatenate([
+            np.asarray(vectors[i:i + _SCORE_BLOCK_ROWS], dtype=np.float32) @ query
+            for i in range(0, len(vectors), _SCORE_BLOCK_ROWS)
+        ])
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Returns the indices of the k largest scores, best first."""
+        if k >= len(scores):
+            return np.argsort(-scores)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Returns the k most similar documents to an embedding, with cosine similarity scores.
+
+        Pass `filter` to restrict the search to documents whose metadata match it; the
+        matching rows are scored exactly, so a selective filter also makes search cheaper.
+        """
+        with self._lock:
+            vectors = self._vectors
+            if vectors is None or len(vectors) == 0 or k <= 0:
+                return []
+            query = self._normalize(embedding)[0]
+            filter = kwargs.get("filter")
+            if filter:
+                rows = self._filter_rows(filter)
+                if len(rows) == 0:
+                    return []
+            else:
+                rows = self._candidate_rows(vectors, query)
+            if rows is None:
+                scores = self._score(vectors, query)
+                top = self._top_k(scores, k)
+                return [(self._document(int(r)), float(scores[r])) for r in top]
+
+            scores = self._score(vectors[rows], query)
+            top = self._top_k(scores, k)
+            return [(self._document(int(rows[i])), float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity lies in [-1, 1]; map it onto [0, 1] like Astra DB does
+        return lambda score: (score + 1.0) / 2.0
+
+    # --- 6. Persistence ---
+
+    def save(self, directory: str, model_name: str, dtype: str = "float32") -> None:
+        """
+        Saves the index as a memory-mappable artifact.
+
+        Args:
+            directory (str): Target directory (created if missing).
+            model_name (str): Name of the embedding model, recorded in the fingerprint.
+            dtype (str): On-disk precision, "float32" or "float16".
+        """
+        with self._lock:
+            vectors = self._vectors if self._vectors is not None else np.empty((0, 0), dtype=np.float32)
+            centroids = assignments = None
+            if self.index_type == "ivf" and len(vectors) > self.nlist:
+                if self._ivf_dirty:
+                    self._build_ivf(vectors)
+                centroids, assignments = self._centroids, self._assignments
+
+            manifest = EmbeddingStore(directory).save(
+                ids=self._ids,
+                records=iter(self._records),
+                vectors=vectors,
+                model_name=model_name,
+                dtype=dtype,
+                ivf_centroids=centroids,
+                ivf_assignments=assignments,
+            )
+            self.index_version = manifest["index_version"]
+
+    @classmethod
+    def load(cls, directory: str, embedding: Embeddings, model_name: str, **kwargs: Any) -> Optional["LocalVectorStore"]:
+        """
+        Memory-maps a saved index.
+
+        Args:
+            directory (str): The artifact directory written by `save`.
+            embedding (Embeddings): The embedding model used for queries.
+            model_name (str): Name of that model; artifacts for other models are rejected.
+            **kwargs: Extra constructor arguments (index_type, nlist, nprobe).
+
+        Returns:
+            Optional[LocalVectorStore]: The loaded store, or None if no compatible artifact exists.
+        """
+        loaded = EmbeddingStore(directory).load(model_name)
+        if loaded is None:
+            return None
+
+        store = cls(embedding=embedding, **kwargs)
+        store._ids = loaded["ids"]
+        store._records = loaded["records"]
+        store._id_to_row = {doc_id: row for row, doc_id in enumerate(store._ids)}
+        store.index_version = loaded["manifest"]["index_version"]
+        if len(store._ids):
+            store._vectors = loaded["vectors"]
+        if store.index_type == "ivf" and "ivf_centroids" in loaded:
+            store._set_ivf(loaded["ivf_centroids"], loaded["ivf_assignments"])
+        return store
+
+    # --- 7. Construction ---
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        ids = kwargs.pop("ids", None)
+        store = cls(embedding=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -1,13 +1,177 @@
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+import random
 import sys
-from datetime import datetime
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional
+
+from prometheus_client import Counter
+
+from config.config import AppConfig
+
+LOG_FILE_NAME = "app.log"
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+
+LOG_RECORDS_DROPPED = Counter("app_log_records_dropped_total", "Log records dropped because the log queue was full")
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is emitted as a JSON field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "sampled"}
+
+def sampled(**fields) -> dict:
+    """
+    Builds the `extra=` for a per-request message, which is kept at LOG_SAMPLE_RATE.
+
+    Warnings and errors are never sampled. `fields` (e.g. session_id) become fields of
+    the JSON log line.
+    """
+    return {"sampled": True, **fields}
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line, including any `extra=` fields."""
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "location": f"{record.filename}:{record.lineno}",
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        payload.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+class SamplingFilter(logging.Filter):
+    """Keeps a `rate` fraction of the records marked with `sampled()`; everything else passes."""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno >= logging.WARNING or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+class NonBlockingQueueHandler(QueueHandler):
+    """A QueueHandler that drops (and counts) records when the bounded queue is full, instead of blocking."""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like QueueHandler.prepare, but keeps the traceback in exc_text instead of folding it into the message
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+# --- Shared handlers, built once per process ---
+_lock = threading.Lock()
+_handlers: Optional[List[logging.Handler]] = None
+_console_handler: Optional[logging.StreamHandler] = None
+_listener: Optional[QueueListener] = None
+
+def _build_output_handlers() -> List[logging.Handler]:
+    """The handlers that do the actual I/O: a size-rotated file and stdout."""
+    global _console_handler
+    formatter = JsonFormatter() if AppConfig.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    level = logging.getLevelName(AppConfig.LOG_LEVEL.upper())
+    handlers: List[logging.Handler] = []
+
+    if AppConfig.LOG_FILE_ENABLED:
+        os.makedirs(AppConfig.LOG_DIR, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            os.path.join(AppConfig.LOG_DIR, LOG_FILE_NAME),
+            maxBytes=AppConfig.LOG_FILE_MAX_BYTES,
+            backupCount=AppConfig.LOG_FILE_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(formatter)
+        file_handler.setLevel(level)
+        handlers.append(file_handler)
+
+    _console_handler = logging.StreamHandler(sys.stdout)
+    _console_handler.setFormatter(formatter)
+    _console_handler.setLevel(level)
+    handlers.append(_console_handler)
+    return handlers
+
+def _start_listener(handler: QueueHandler, outputs: List[logging.Handler]) -> None:
+    global _listener
+    _listener = QueueListener(handler.queue, *outputs, respect_handler_level=True)
+    _listener.start()
+
+def _restart_listener_after_fork() -> None:
+    # The listener thread does not survive fork (e.g. a preloaded Gunicorn app); give the child its own
+    if _listener is not None and _handlers:
+        handler = _handlers[0]
+        handler.queue = queue.Queue(maxsize=AppConfig.LOG_QUEUE_SIZE)
+        _start_listener(handler, list(_listener.handlers))
+
+def stop_logging() -> None:
+    """Flushes the queued records and stops the listener thread (registered to run at exit)."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+def _shared_handlers() -> List[logging.Handler]:
+    """
+    Returns the handlers attached to every module logger.
+
+    In "queue" mode (the default) loggers only get a QueueHandler: the calling thread
+    appends the record to an in-memory queue and returns, while a QueueListener thread
+    formats it and does the file and console writes. In "sync" mode the writes happen
+    on the calling thread, as they used to.
+    """
+    global _handlers
+    with _lock:
+        if _handlers is None:
+            outputs = _build_output_handlers()
+            sampling = SamplingFilter(AppConfig.LOG_SAMPLE_RATE)
+            if AppConfig.LOG_MODE == "queue":
+                handler = NonBlockingQueueHandler(queue.Queue(maxsize=AppConfig.LOG_QUEUE_SIZE))
+                # Filter on the calling thread, so dropped records cost no queue traffic
+                handler.setLevel(min(h.level for h in outputs))
+                handler.addFilter(sampling)
+                _start_listener(handler, outputs)
+                atexit.register(stop_logging)
+                if hasattr(os, "register_at_fork"):
+                    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+                _handlers = [handler]
+            else:
+                for output in outputs:
+                    output.addFilter(sampling)
+                _handlers = outputs
+        return _handlers
+
+def set_console_level(level: int) -> None:
+    """Changes the console threshold without touching the log file (e.g. to quiet benchmarks)."""
+    _shared_handlers()
+    if _console_handler is not None:
+        _console_handler.setLevel(level)
 
 def setup_logger(name: str = "ShopSmartLogger"):
     """
     Sets up a configured logger instance.
 
-    This logger writes to both a daily log file and the console.
+    This logger writes to both a size-rotated log file and the console, through a
+    background queue by default (see AppConfig.LOG_MODE), in text or JSON format.
     It's designed to prevent duplicate handlers if called multiple times.
 
     Args:
@@ -16,35 +180,12 @@ def setup_logger(name: str = "ShopSmartLogger"):
     Returns:
         logging.Logger: A configured logger instance.
     """
-    # 1. Create the logs directory if it doesn't exist
-    logs_dir = "logs"
-    os.makedirs(logs_dir, exist_ok=True)
-
-    # 2. Create a log file name based on the current date
-    log_file = f"log_{datetime.now().strftime('%Y-%m-%d')}.log"
-    log_filepath = os.path.join(logs_dir, log_file)
-
-    # 3. Create a more detailed and structured log format
-    log_format = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
-    )
-
-    # 4. Get the logger instance and set its base level
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)  # Capture all messages from DEBUG level and up
+    logger.setLevel(logging.DEBUG)  # Handlers decide what is written (AppConfig.LOG_LEVEL)
 
-    # 5. Avoid adding duplicate handlers if the logger is already configured
+    # Avoid adding duplicate handlers if the logger is already configured
     if not logger.handlers:
-        # Handler for writing logs to a file
-        file_handler = logging.FileHandler(log_filepath)
-        file_handler.setFormatter(log_format)
-        file_handler.setLevel(logging.INFO)  # Only INFO and higher levels go to the file
-        logger.addHandler(file_handler)
-
-        # Handler for printing logs to the console
-        stream_handler = logging.StreamHandler(sys.stdout)
-        stream_handler.setFormatter(log_format)
-        stream_handler.setLevel(logging.INFO)  # Only INFO and higher levels appear in the console
-        logger.addHandler(stream_handler)
-
-    return logger
\ No newline at end of file
+        for handler in _shared_handlers():
+            logger.addHandler(handler)
+
+    return logger
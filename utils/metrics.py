@@ -0,0 +1,52 @@
+# In utils/metrics.py
+
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from prometheus_client import Counter, Histogram
+
+# --- Prometheus Metrics for the RAG pipeline ---
+# Buckets span cache hits (~1ms) to slow LLM generations (~30s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+    "rag_request_latency_seconds", "End-to-end latency of chat requests", ["endpoint"], buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    "rag_stage_latency_seconds",
+    "Latency of each RAG pipeline stage (embed_query, retrieval, contextualize, qa)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter("rag_llm_tokens_total", "LLM tokens consumed", ["stage", "kind"])
+RETRIEVED_DOCUMENTS = Histogram(
+    "rag_retrieved_documents", "Number of documents returned per retrieval", buckets=(0, 1, 2, 3, 5, 10, 20, 50)
+)
+
+class InstrumentedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model and records query-embedding latency.
+
+    Query embedding happens inside the vector store, where no LangChain callback
+    fires, so it is timed here instead.
+    """
+    def __init__(self, base: Embeddings):
+        self.base = base
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        start = time.perf_counter()
+        try:
+            return self.base.embed_query(text)
+        finally:
+            STAGE_LATENCY.labels(stage="embed_query").observe(time.perf_counter() - start)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        start = time.perf_counter()
+        try:
+            return await self.base.aembed_query(text)
+        finally:
+            STAGE_LATENCY.labels(stage="embed_query").observe(time.perf_counter() - start)
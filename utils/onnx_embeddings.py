@@ -0,0 +1,284 @@
+# In utils/onnx_embeddings.py
+"""
+Optional ONNX Runtime backend for the embedding model, with int8 dynamic quantization.
+
+The float PyTorch model is exported once to ONNX, quantized, and then served by
+onnxruntime on CPU. No PyTorch or sentence-transformers is loaded at serving time.
+
+Usage:
+    python -m utils.onnx_embeddings export               # writes AppConfig.ONNX_MODEL_DIR
+    python -m utils.onnx_embeddings validate --k 3       # retrieval drift vs the float model
+
+Requires the "onnx" extra: pip install -e .[onnx]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from langchain_core.embeddings import Embeddings
+
+from config.config import AppConfig
+from utils.logger import setup_logger
+
+# Initialize a logger for this module
+logger = setup_logger(__name__)
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+EXPORT_MANIFEST_FILE = "export.json"
+MODEL_INPUTS = ["input_ids", "attention_mask", "token_type_ids"]
+
+def embedding_model_id() -> str:
+    """
+    Identifies the configured embedding model and backend, e.g. for the local index fingerprint.
+
+    Quantized vectors differ slightly from float ones, so an index built with one
+    backend is not silently reused with the other.
+    """
+    if AppConfig.EMBEDDING_BACKEND == "onnx":
+        return f"{AppConfig.EMBEDDING_MODEL}:onnx{'-int8' if AppConfig.ONNX_QUANTIZED else ''}"
+    return AppConfig.EMBEDDING_MODEL
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeds texts with an exported BGE model on ONNX Runtime.
+
+    Matches the sentence-transformers pipeline of bge-base-en-v1.5: the [CLS] token's
+    hidden state, L2-normalized. Texts are sorted by length before batching so each
+    batch is padded only to its own longest text.
+    """
+    def __init__(
+        self,
+        model_dir: str,
+        quantized: bool = True,
+        batch_size: int = 32,
+        max_length: int = 512,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+    ):
+        """
+        Args:
+            model_dir (str): Directory written by `export_model`.
+            quantized (bool): Load the int8 model instead of the float ONNX model.
+            batch_size (int): Texts per forward pass.
+            max_length (int): Tokens kept per text.
+            intra_op_threads (int): Threads used inside one operator (0 keeps the ONNX Runtime default).
+            inter_op_threads (int): Threads running independent operators (0 keeps the default).
+
+        Raises:
+            ImportError: If onnxruntime or tokenizers is not installed.
+            FileNotFoundError: If the model has not been exported yet.
+        """
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX embedding backend needs onnxruntime and tokenizers: pip install -e .[onnx]"
+            ) from e
+
+        model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"No exported model at {model_path}. Run `python -m utils.onnx_embeddings export` first."
+            )
+        self.batch_size = batch_size
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        self._session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._inputs = [i.name for i in self._session.get_inputs()]
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self._tokenizer.enable_truncation(max_length=max_length)
+        pad_id = self._tokenizer.token_to_id("[PAD]") or 0
+        self._tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+
+        manifest_path = os.path.join(model_dir, EXPORT_MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                exported = json.load(f).get("model_name")
+            if exported != AppConfig.EMBEDDING_MODEL:
+                logger.warning(f"ONNX model in {model_dir} was exported from {exported}, not {AppConfig.EMBEDDING_MODEL}.")
+        logger.info(f"Loaded ONNX embedding model {model_path} (threads: intra={intra_op_threads or 'default'}).")
+
+    @classmethod
+    def from_config(cls) -> "OnnxEmbeddings":
+        return cls(
+            model_dir=AppConfig.ONNX_MODEL_DIR,
+            quantized=AppConfig.ONNX_QUANTIZED,
+            batch_size=AppConfig.EMBEDDING_BATCH_SIZE,
+            intra_op_threads=AppConfig.ONNX_INTRA_OP_THREADS,
+            inter_op_threads=AppConfig.ONNX_INTER_OP_THREADS,
+        )
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        columns = {
+            "input_ids": [e.ids for e in encodings],
+            "attention_mask": [e.attention_mask for e in encodings],
+            "token_type_ids": [e.type_ids for e in encodings],
+        }
+        feeds = {name: np.asarray(columns[name], dtype=np.int64) for name in self._inputs}
+        hidden = self._session.run(["last_hidden_state"], feeds)[0]
+        cls = hidden[:, 0]
+        return cls / np.linalg.norm(cls, axis=1, keepdims=True)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode([texts[i] for i in batch])):
+                vectors[i] = vector
+        return np.vstack(vectors).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+# --- 1. Export ---
+
+def export_model(model_name: str, output_dir: str, quantize: bool = True, opset: int = 14) -> None:
+    """
+    Exports a Hugging Face encoder to ONNX and, optionally, an int8 dynamically quantized copy.
+
+    Export needs PyTorch and transformers (already installed for the default backend);
+    only onnxruntime and tokenizers are needed afterwards.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=AppConfig.EMBEDDING_CACHE_DIR)
+    model = AutoModel.from_pretrained(model_name, cache_dir=AppConfig.EMBEDDING_CACHE_DIR).eval()
+    model.config.return_dict = False  # Export a plain (last_hidden_state, pooler_output) tuple
+
+    sample = tokenizer(["warm up the exporter"], return_tensors="pt")
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in MODEL_INPUTS),
+            model_path,
+            input_names=MODEL_INPUTS,
+            output_names=["last_hidden_state", "pooler_output"],
+            dynamic_axes={
+                **{name: {0: "batch", 1: "sequence"} for name in MODEL_INPUTS},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+                "pooler_output": {0: "batch"},
+            },
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(output_dir)  # Writes tokenizer.json for the tokenizers library
+    logger.info(f"Exported {model_name} to {model_path}.")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        logger.info(
+            f"Quantized to {quantized_path} ({os.path.getsize(quantized_path) / 2**20:.0f} MB, "
+            f"float: {os.path.getsize(model_path) / 2**20:.0f} MB)."
+        )
+
+    with open(os.path.join(output_dir, EXPORT_MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({"model_name": model_name, "quantized": quantize, "opset": opset, "exported_at": time.time()}, f)
+
+# --- 2. Validation ---
+
+def _validation_queries(data_file: str, limit: int) -> List[str]:
+    """Short review titles ("Terrific purchase") plus aspect questions about every product."""
+    frame = pd.read_csv(data_file, usecols=["product_title", "summary"])
+    titles = [str(t) for t in frame["product_title"].dropna().unique()]
+    aspects = ("battery backup", "sound quality", "build quality and comfort")
+    queries = [f"How is the {aspect} of the {title}?" for title in titles for aspect in aspects]
+    queries += [str(s) for s in frame["summary"].dropna().unique()]
+    return queries[:limit]
+
+def _top_k(queries: np.ndarray, documents: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ documents.T
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+def _recall(found: np.ndarray, reference: np.ndarray) -> float:
+    return float(np.mean([len(set(f) & set(r)) / len(r) for f, r in zip(found, reference)]))
+
+def validate(k: int = 3, num_queries: int = 200) -> Dict[str, float]:
+    """
+    Measures how far the ONNX model's retrieval drifts from the float model's on the review dataset.
+
+    Both models embed every review and a set of realistic queries. Recall@k is the
+    overlap of each query's top-k reviews with those the float model returns:
+    - "recall_onnx": ONNX queries against an index re-embedded with ONNX.
+    - "recall_mixed": ONNX queries against the existing float index (e.g. Astra DB
+      before re-ingestion).
+    """
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from utils.data_converter import DataConverter
+
+    texts = list(dict.fromkeys(d.page_content for d in DataConverter(AppConfig.DATA_FILE_PATH).iter_documents()))
+    queries = _validation_queries(AppConfig.DATA_FILE_PATH, num_queries)
+    float_model = HuggingFaceEmbeddings(
+        model_name=AppConfig.EMBEDDING_MODEL,
+        cache_folder=AppConfig.EMBEDDING_CACHE_DIR,
+        encode_kwargs={"batch_size": AppConfig.EMBEDDING_BATCH_SIZE, "normalize_embeddings": True},
+    )
+    onnx_model = OnnxEmbeddings.from_config()
+
+    results: Dict[str, float] = {"documents": len(texts), "queries": len(queries), "k": k}
+    vectors = {}
+    for name, model in (("float", float_model), ("onnx", onnx_model)):
+        start = time.perf_counter()
+        docs = np.asarray(model.embed_documents(texts), dtype=np.float32)
+        results[f"{name}_docs_per_sec"] = len(texts) / (time.perf_counter() - start)
+        start = time.perf_counter()
+        qs = np.asarray([model.embed_query(q) for q in queries], dtype=np.float32)
+        results[f"{name}_query_ms"] = (time.perf_counter() - start) / len(queries) * 1000
+        vectors[name] = (docs, qs)
+
+    (float_docs, float_queries), (onnx_docs, onnx_queries) = vectors["float"], vectors["onnx"]
+    reference = _top_k(float_queries, float_docs, k)
+    results["recall_onnx"] = _recall(_top_k(onnx_queries, onnx_docs, k), reference)
+    results["recall_mixed"] = _recall(_top_k(onnx_queries, float_docs, k), reference)
+    results["mean_cosine"] = float(np.mean(np.sum(float_docs * onnx_docs, axis=1)))
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Export and quantize the embedding model.")
+    export.add_argument("--output", default=None, help="Output directory (default: AppConfig.ONNX_MODEL_DIR).")
+    export.add_argument("--no-quantize", action="store_true", help="Only export the float ONNX model.")
+    check = commands.add_parser("validate", help="Compare ONNX retrieval with the float model.")
+    check.add_argument("--k", type=int, default=AppConfig.RAG_RETRIEVER_K, help="Results per query.")
+    check.add_argument("--num-queries", type=int, default=200, help="Queries to evaluate.")
+    check.add_argument("--min-recall", type=float, default=0.9, help="Fail (exit code 1) below this recall_onnx.")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_model(AppConfig.EMBEDDING_MODEL, args.output or AppConfig.ONNX_MODEL_DIR, quantize=not args.no_quantize)
+        return 0
+
+    results = validate(k=args.k, num_queries=args.num_queries)
+    for key, value in results.items():
+        print(f"{key:>20}: {value:.4f}" if isinstance(value, float) else f"{key:>20}: {value}")
+    if results["recall_onnx"] < args.min_recall:
+        print(f"FAIL recall_onnx {results['recall_onnx']:.3f} < {args.min_recall}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+# In utils/product_summaries.py
+"""
+Offline batch job that precomputes one summary per product from the review CSV.
+
+Each entry holds the product's rating distribution, the aspects its reviewers
+praise and complain about most, and a short LLM-written overview. The chain
+answers product-level questions ("overall, how is the battery on X?") from this
+table instead of retrieving raw reviews.
+
+Usage:
+    python -m utils.product_summaries            # refresh products whose reviews changed
+    python -m utils.product_summaries --full     # rebuild every product
+    python -m utils.product_summaries --no-llm   # aggregates only, no LLM calls
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from config.config import AppConfig
+from utils.custom_exception import CustomException
+from utils.data_converter import compute_content_hash
+from utils.lexical_index import tokenize_for_search
+from utils.logger import setup_logger
+
+# Initialize a logger for this module
+logger = setup_logger(__name__)
+
+# Bump this whenever the entry layout or the aspect extraction changes so every product is rebuilt
+SUMMARY_FORMAT_VERSION = 1
+
+SUMMARY_COLUMNS = ["product_id", "product_title", "rating", "review"]
+
+# Metadata "source" of summary Documents, which set them apart from raw reviews
+SUMMARY_SOURCE = "product_summary"
+
+# Opinion and filler words that say how good something is, or nothing at all, but not what it is about
+NON_ASPECT_WORDS = frozenset({
+    "good", "nice", "best", "better", "great", "awesome", "excellent", "super", "superb", "amazing",
+    "bad", "worst", "poor", "waste", "product", "products", "buy", "bought", "purchase", "money",
+    "value", "really", "much", "well", "overall", "like", "love", "just", "one", "also", "use", "using",
+    "flipkart", "item", "get", "got", "not", "after", "can", "other", "all", "however", "only", "about",
+    "too", "very", "even", "will", "would", "don", "day", "days", "time", "months", "month", "first",
+    "dont", "didn", "doesn", "now", "still", "thanks", "thank", "happy", "satisfied", "worth",
+})
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", (
+        "You summarize customer reviews of a single product for shoppers. "
+        "In 3 to 4 sentences, describe what buyers like and dislike about it (for example sound, "
+        "battery, comfort, build quality and value for money). "
+        "Use only the reviews given and do not invent specifications."
+    )),
+    ("human", (
+        "Product: {product}\n"
+        "Average rating: {average_rating:.1f}/5 from {review_count} reviews\n\n"
+        "Reviews:\n{reviews}"
+    ))
+])
+
+# --- 1. Aggregates ---
+
+def reviews_digest(hashes: Iterable[str]) -> str:
+    """Returns a digest of a product's review set; it changes whenever a review is added, edited or removed."""
+    return hashlib.sha256("\n".join(sorted(hashes)).encode("utf-8")).hexdigest()[:32]
+
+def _aspect_terms(review: str, exclude: frozenset) -> set:
+    """Returns the content words of a review plus its two-word phrases ("battery backup", "not working")."""
+    tokens = [t for t in tokenize_for_search(review) if len(t) > 2 and t.isalpha() and t not in exclude]
+    content = {t for t in tokens if t not in NON_ASPECT_WORDS}
+    phrases = {f"{a} {b}" for a, b in zip(tokens, tokens[1:]) if a != b and (a in content or b in content)}
+    return content | phrases
+
+def extract_aspects(positive: List[str], negative: List[str], exclude: Iterable[str] = (),
+                    top_n: int = 5, min_reviews: int = 2) -> Tuple[List[str], List[str]]:
+    """
+    Picks the terms that set a product's positive reviews apart from its negative ones.
+
+    A term scores by how much more often (as a share of reviews) it appears on one side
+    than on the other, weighted towards terms many reviews mention. Phrases win over
+    their single words when both would be listed.
+
+    Args:
+        positive (List[str]): Reviews rated 4 or 5.
+        negative (List[str]): Reviews rated 1 or 2.
+        exclude (Iterable[str]): Words never listed, such as the product's own name.
+        top_n (int): Maximum number of pros and of cons.
+        min_reviews (int): Reviews a term must appear in to be listed.
+
+    Returns:
+        Tuple[List[str], List[str]]: The pros and the cons.
+    """
+    exclude = frozenset(exclude)
+
+    def review_counts(reviews: List[str]) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for review in reviews:
+            for term in _aspect_terms(review, exclude):
+                counts[term] = counts.get(term, 0) + 1
+        return counts
+
+    def top_terms(side: Dict[str, int], side_total: int, other: Dict[str, int], other_total: int) -> List[str]:
+        if not side_total:
+            return []
+        scores = {
+            term: (count / side_total - other.get(term, 0) / max(other_total, 1)) * math.log1p(count)
+            for term, count in side.items() if count >= min_reviews
+        }
+        ranked = [term for term, score in sorted(scores.items(), key=lambda kv: (-kv[1], kv[0])) if score > 0]
+        chosen: List[str] = []
+        for term in ranked:
+            # Skip a word already covered by a chosen phrase, and replace a chosen word by its phrase
+            if any(term in phrase.split() for phrase in chosen if " " in phrase):
+                continue
+            chosen = [c for c in chosen if not (" " in term and c in term.split())]
+            chosen.append(term)
+            if len(chosen) == top_n:
+                break
+        return chosen
+
+    pos_counts, neg_counts = review_counts(positive), review_counts(negative)
+    pros = top_terms(pos_counts, len(positive), neg_counts, len(negative))
+    cons = top_terms(neg_counts, len(negative), pos_counts, len(positive))
+    return pros, cons
+
+def _sample_reviews(frame: pd.DataFrame, max_reviews: int, max_chars: int = 400) -> str:
+    """Takes evenly spaced reviews from the rating-sorted frame, so the sample keeps the rating mix."""
+    ordered = frame.sort_values("rating", kind="stable")
+    step = max(1, math.ceil(len(ordered) / max_reviews))
+    rows = ordered.iloc[::step].head(max_reviews)
+    return "\n".join(f"- ({int(row.rating)}/5) {str(row.review)[:max_chars]}" for row in rows.itertuples())
+
+# --- 2. Lookup Table ---
+
+class ProductSummaryTable:
+    """
+    The JSON lookup table of product summaries, keyed by product title.
+
+    Titles match the `product_name` metadata of the review Documents, so the same
+    ProductCatalog that filters retrieval can find entries for a question.
+    """
+    def __init__(self, path: str, entries: Optional[Dict[str, dict]] = None):
+        self.path = path
+        self.entries: Dict[str, dict] = entries or {}
+
+    @classmethod
+    def load(cls, path: str) -> "ProductSummaryTable":
+        """Loads the table; a missing file or an older format version yields an empty table."""
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("format_version") != SUMMARY_FORMAT_VERSION:
+            logger.warning(f"Product summaries in {path} use an old format; they will be rebuilt.")
+            return cls(path)
+        return cls(path, payload.get("products", {}))
+
+    def save(self) -> None:
+        """Atomically writes the table so readers never see a truncated file."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format_version": SUMMARY_FORMAT_VERSION,
+                "updated_at": time.time(),
+                "products": self.entries,
+            }, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, title: str) -> bool:
+        return title in self.entries
+
+    @property
+    def titles(self) -> List[str]:
+        return list(self.entries)
+
+    def to_document(self, title: str) -> Document:
+        """Renders one entry as a Document that can be passed to the QA prompt as context."""
+        entry = self.entries[title]
+        distribution = ", ".join(
+            f"{stars} stars: {entry['rating_distribution'].get(str(stars), 0)}" for stars in range(5, 0, -1)
+        )
+        lines = [
+            f"Product summary for {title}",
+            f"Based on {entry['review_count']} reviews, average rating {entry['average_rating']:.1f}/5 ({distribution}).",
+            f"Most praised: {', '.join(entry['pros']) or 'nothing stands out'}.",
+            f"Most criticised: {', '.join(entry['cons']) or 'nothing stands out'}.",
+        ]
+        if entry.get("summary"):
+            lines.append(f"Overview: {entry['summary']}")
+        return Document(
+            page_content="\n".join(lines),
+            metadata={"product_name": title, "product_id": entry["product_id"], "source": SUMMARY_SOURCE},
+        )
+
+# --- 3. Batch Job ---
+
+class ProductSummaryBuilder:
+    """
+    Builds and incrementally refreshes the product summary table.
+
+    Every product's entry records a digest of its reviews' content hashes and
+    ratings. A refresh recomputes only the products whose digest changed (or that
+    still lack an LLM summary), so new reviews cost one LLM call per affected product.
+    """
+    def __init__(self, llm: Optional[BaseChatModel] = None, data_file: Optional[str] = None,
+                 output_path: Optional[str] = None, max_reviews: Optional[int] = None):
+        """
+        Args:
+            llm: Chat model writing the overviews; None computes the aggregates only.
+            data_file: The review CSV (defaults to AppConfig.DATA_FILE_PATH).
+            output_path: The summary table (defaults to AppConfig.PRODUCT_SUMMARIES_PATH).
+            max_reviews: Reviews shown to the LLM per product (defaults to AppConfig.SUMMARY_MAX_REVIEWS).
+        """
+        self.llm = llm
+        self.data_file = data_file or AppConfig.DATA_FILE_PATH
+        self.output_path = output_path or AppConfig.PRODUCT_SUMMARIES_PATH
+        self.max_reviews = max_reviews or AppConfig.SUMMARY_MAX_REVIEWS
+        self._summarizer = (SUMMARY_PROMPT | llm | StrOutputParser()) if llm is not None else None
+
+    def _load_reviews(self) -> pd.DataFrame:
+        try:
+            frame = pd.read_csv(self.data_file, usecols=SUMMARY_COLUMNS)
+        except FileNotFoundError as e:
+            raise CustomException(f"CSV file not found at path: {self.data_file}", e)
+        except ValueError as e:
+            raise CustomException(f"CSV file {self.data_file} must contain the columns {SUMMARY_COLUMNS}", e)
+        frame = frame.dropna(subset=["product_title", "review"])
+        frame["rating"] = pd.to_numeric(frame["rating"], errors="coerce").clip(1, 5)
+        return frame.dropna(subset=["rating"])
+
+    def _build_entry(self, title: str, frame: pd.DataFrame, digest: str, previous: Optional[dict]) -> dict:
+        ratings = frame["rating"].round().astype(int)
+        reviews = frame["review"].astype(str)
+        pros, cons = extract_aspects(
+            reviews[ratings >= 4].tolist(), reviews[ratings <= 2].tolist(), exclude=tokenize_for_search(title)
+        )
+        entry = {
+            "product_id": str(frame["product_id"].iloc[0]),
+            "review_count": int(len(frame)),
+            "average_rating": round(float(frame["rating"].mean()), 2),
+            "rating_distribution": {str(stars): int((ratings == stars).sum()) for stars in range(1, 6)},
+            "pros": pros,
+            "cons": cons,
+            "summary": None,
+            "reviews_digest": digest,
+            "updated_at": time.time(),
+        }
+        if self._summarizer is not None:
+            entry["summary"] = self._summarizer.invoke({
+                "product": title,
+                "average_rating": entry["average_rating"],
+                "review_count": entry["review_count"],
+                "reviews": _sample_reviews(frame, self.max_reviews),
+            }).strip()
+        elif previous and previous.get("reviews_digest") == digest:
+            entry["summary"] = previous.get("summary")
+        return entry
+
+    def refresh(self, full: bool = False) -> Dict[str, int]:
+        """
+        Brings the summary table in line with the review CSV.
+
+        Args:
+            full (bool): Rebuild every product instead of only the changed ones.
+
+        Returns:
+            Dict[str, int]: Counts of "updated", "unchanged", "removed" and "failed" products.
+
+        Raises:
+            CustomException: If the CSV cannot be read.
+        """
+        frame = self._load_reviews()
+        table = ProductSummaryTable(self.output_path) if full else ProductSummaryTable.load(self.output_path)
+        stats = {"updated": 0, "unchanged": 0, "removed": 0, "failed": 0}
+
+        groups = dict(tuple(frame.groupby("product_title", sort=True)))
+        for title in [t for t in table.titles if t not in groups]:
+            del table.entries[title]
+            stats["removed"] += 1
+
+        try:
+            for title, group in groups.items():
+                digest = reviews_digest(
+                    f"{compute_content_hash(row.product_id, row.review)}:{row.rating}" for row in group.itertuples()
+                )
+                previous = table.entries.get(title)
+                needs_summary = self._summarizer is not None and not (previous or {}).get("summary")
+                if previous and previous.get("reviews_digest") == digest and not needs_summary:
+                    stats["unchanged"] += 1
+                    continue
+                try:
+                    table.entries[title] = self._build_entry(title, group, digest, previous)
+                    stats["updated"] += 1
+                except Exception as e:
+                    # Keep the previous entry; its stale digest makes the next refresh retry this product
+                    logger.error(f"Failed to summarize '{title}': {e}")
+                    stats["failed"] += 1
+        finally:
+            # Save whatever was finished, so an interrupted run does not repeat its LLM calls
+            table.save()
+
+        logger.info(f"Product summaries refreshed in {self.output_path}: {stats}")
+        return stats
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="Rebuild every product, not only the changed ones.")
+    parser.add_argument("--no-llm", action="store_true", help="Compute the aggregates without LLM-written overviews.")
+    args = parser.parse_args(argv)
+
+    llm = None
+    if not args.no_llm:
+        from langchain_groq import ChatGroq
+
+        llm = ChatGroq(
+            model_name=AppConfig.RAG_MODEL,
+            temperature=AppConfig.SUMMARY_TEMPERATURE,
+            groq_api_key=AppConfig.GROQ_API_KEY,
+        )
+    stats = ProductSummaryBuilder(llm=llm).refresh(full=args.full)
+    return 1 if stats["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
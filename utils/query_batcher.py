@@ -0,0 +1,167 @@
+# In utils/query_batcher.py
+
+import asyncio
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from prometheus_client import Counter, Histogram
+
+from utils.logger import setup_logger
+
+# Initialize a logger for this module
+logger = setup_logger(__name__)
+
+# --- Prometheus Metrics ---
+QUERY_EMBED_REQUESTS = Counter(
+    "rag_query_embed_requests_total",
+    "Query embeddings served from the LRU cache, joined to an identical in-flight query, or batched",
+    ["outcome"],
+)
+QUERY_EMBED_BATCH_SIZE = Histogram(
+    "rag_query_embed_batch_size", "Queries encoded per batched forward pass", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+_STOP = object()
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model so that concurrent query embeddings share forward passes.
+
+    Calls to `embed_query` are queued for a single encoder thread. Queries that arrive
+    while a batch is being encoded form the next batch, and each batch is encoded with
+    one `embed_documents` call, which costs little more than a single query on CPU.
+    When the encoder is idle and queries have been arriving less than `max_wait_ms`
+    apart, the first query waits up to `max_wait_ms` for company. Sparse traffic is
+    encoded at once, so a lone caller pays no batching delay.
+    Identical queries already in flight wait for the same result instead of being
+    encoded twice. A bounded LRU cache also serves repeats, such as the answer cache
+    and the retriever embedding the same standalone question.
+
+    The wrapped model's `embed_documents` must embed a text exactly as `embed_query`
+    does. This holds for HuggingFaceEmbeddings, but not for models that add a query
+    instruction. Document embedding is passed straight through.
+    """
+    def __init__(self, base: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 5.0, cache_size: int = 1024):
+        """
+        Args:
+            base (Embeddings): The model doing the actual encoding.
+            max_batch_size (int): Maximum queries encoded per forward pass.
+            max_wait_ms (float): How long an idle encoder waits to fill a batch.
+            cache_size (int): Query vectors kept in the LRU cache (0 disables it).
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.base = base
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._last_arrival = 0.0
+
+    # --- 1. Submission ---
+
+    def _lookup_or_submit(self, text: str) -> Tuple[Optional[List[float]], Optional[Future]]:
+        """Returns the cached vector, or the future of the (possibly shared) in-flight request."""
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+                QUERY_EMBED_REQUESTS.labels(outcome="cached").inc()
+                return vector, None
+            future = self._in_flight.get(text)
+            if future is not None:
+                QUERY_EMBED_REQUESTS.labels(outcome="coalesced").inc()
+                return None, future
+            future = Future()
+            self._in_flight[text] = future
+            now = time.monotonic()
+            busy = now - self._last_arrival < self.max_wait
+            self._last_arrival = now
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="query-embedder", daemon=True)
+                self._worker.start()
+        QUERY_EMBED_REQUESTS.labels(outcome="batched").inc()
+        self._queue.put((text, busy))
+        return None, future
+
+    def embed_query(self, text: str) -> List[float]:
+        vector, future = self._lookup_or_submit(text)
+        return list(vector if vector is not None else future.result())
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector, future = self._lookup_or_submit(text)
+        return list(vector if vector is not None else await asyncio.wrap_future(future))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.base.aembed_documents(texts)
+
+    # --- 2. Encoder Thread ---
+
+    def _next_batch(self) -> Tuple[List[str], bool]:
+        """Blocks for the first query, then gathers more until the batch is full or the window closes."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        text, busy = first
+        batch, stop = [text], False
+        deadline = time.monotonic() + (self.max_wait if busy else 0.0)
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Past the deadline, still take whatever queued up during the previous forward pass
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item[0])
+        return batch, stop
+
+    def _encode(self, batch: List[str]) -> None:
+        QUERY_EMBED_BATCH_SIZE.observe(len(batch))
+        try:
+            vectors = self.base.embed_documents(batch)
+        except Exception as e:
+            with self._lock:
+                futures = [self._in_flight.pop(text) for text in batch]
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            futures = [self._in_flight.pop(text) for text in batch]
+            if self.cache_size > 0:
+                for text, vector in zip(batch, vectors):
+                    self._cache[text] = vector
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        for future, vector in zip(futures, vectors):
+            future.set_result(vector)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if batch:
+                self._encode(batch)
+
+    def close(self) -> None:
+        """Stops the encoder thread once the queries already submitted are encoded."""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(_STOP)
+            worker.join()